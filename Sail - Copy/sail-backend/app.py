@@ -1,23 +1,45 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import mysql.connector
-from mysql.connector import pooling
 import pandas as pd
 from datetime import datetime, timedelta
 import os
+import sys
 import json
-from werkzeug.security import generate_password_hash, check_password_hash
 import uuid
 import random
 import jwt
+import hmac
 from functools import wraps
 
+# Shared backend modules live next to the SQLite backend in sail-backend/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'sail-backend')))
+from migrations import run_migrations
+from mysql_pool import MySQLPool, PoolExhausted
+from group_commit import GroupCommitTimeout, GroupCommitWriter
+from lead_time import lead_time_range, parse_dimension, quote_lead_time
+from stock_summary import summary_totals
+from cache import LRUCache, MISSING
+from export import DEFAULT_EXPORT_CHUNK_SIZE, EXPORT_FORMATS
+from pagination import PaginationError, decode_cursor, page_limit, parse_fields
+from serialization import JSONSerializer
+from password_pool import HasherBusy, PasswordHasher
+from etags import make_etag, not_modified, set_validators
+from metrics import RequestMetrics
+from slow_queries import SlowQueryLog
+from profiling import RequestProfiler
+from repositories import AllocationsRepo, MySQLDriver, OrdersRepo, StockRepo, UsersRepo
+
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
 
 # JWT Secret Key
 JWT_SECRET = os.environ.get('JWT_SECRET', 'your-secret-key')
 
+# Password pool workers (forkserver/spawn) import this script again as
+# __mp_main__; they must not open connections or start threads
+IS_POOL_WORKER = __name__ == '__mp_main__'
+
 # MySQL Connection Pool
 db_config = {
     'host': os.environ.get('MYSQL_HOST', 'localhost'),
@@ -27,114 +49,56 @@ db_config = {
 }
 
 try:
-    connection_pool = pooling.MySQLConnectionPool(
-        pool_name="sail_pool",
-        pool_size=5,
-        **db_config
-    )
-    print("MySQL Connection Pool created successfully")
+    if not IS_POOL_WORKER:
+        # Blocking checkout with a timeout instead of failing when all
+        # connections are in use; see mysql_pool.py
+        connection_pool = MySQLPool(
+            lambda: mysql.connector.connect(**db_config),
+            min_size=int(os.environ.get('MYSQL_POOL_MIN_SIZE', 2)),
+            max_size=int(os.environ.get('MYSQL_POOL_MAX_SIZE', 10)),
+            checkout_timeout=float(os.environ.get('MYSQL_POOL_CHECKOUT_TIMEOUT', 5)),
+            idle_timeout=float(os.environ.get('MYSQL_POOL_IDLE_TIMEOUT', 300)),
+            ping_after=float(os.environ.get('MYSQL_POOL_PING_AFTER', 30)),
+            name="sail_pool",
+        )
+        print("MySQL Connection Pool created successfully")
 except Exception as e:
     print(f"Error creating MySQL Connection Pool: {e}")
     # Create a fallback in-memory storage if database connection fails
     users_db = {}
     orders_db = {}
 
+# Data access for every route goes through the repositories; hot statements
+# run as server-side prepared statements cached per connection
+db = MySQLDriver(
+    lambda: connection_pool.get_connection(),
+    prepared=os.environ.get('MYSQL_PREPARED_STATEMENTS', 'true').lower() in ('1', 'true', 'yes'),
+    statement_cache_size=int(os.environ.get('MYSQL_STATEMENT_CACHE_SIZE', 64)),
+)
+orders_repo = OrdersRepo(db)
+stock_repo = StockRepo(db)
+users_repo = UsersRepo(db)
+allocations_repo = AllocationsRepo(db)
+
+# Reserve best-fit coils for every new order (see allocation.py)
+ORDER_ALLOCATION = os.environ.get('ORDER_ALLOCATION', 'true').lower() in ('1', 'true', 'yes')
+
 # Initialize database tables
 def init_database():
     try:
         conn = connection_pool.get_connection()
-        cursor = conn.cursor()
-        
-        # Create users table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id VARCHAR(36) PRIMARY KEY,
-                name VARCHAR(255) NOT NULL,
-                email VARCHAR(255) NOT NULL UNIQUE,
-                password VARCHAR(255) NOT NULL,
-                created_at DATETIME NOT NULL,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create orders table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                id VARCHAR(36) PRIMARY KEY,
-                user_id VARCHAR(36) NOT NULL,
-                grade VARCHAR(50) NOT NULL,
-                thickness VARCHAR(50) NOT NULL,
-                width VARCHAR(50) NOT NULL,
-                length VARCHAR(50),
-                finish VARCHAR(50),
-                quality VARCHAR(50),
-                edge VARCHAR(50),
-                b_quantity VARCHAR(50),
-                customer VARCHAR(255) NOT NULL,
-                ssp_ro_id VARCHAR(50),
-                release_date DATE,
-                required_quantity VARCHAR(50) NOT NULL,
-                mou VARCHAR(255),
-                remarks TEXT,
-                delivery_days INT NOT NULL,
-                expected_delivery_date DATETIME,
-                status VARCHAR(50) DEFAULT 'Processing',
-                created_at DATETIME NOT NULL,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        """)
-        
-        # Create stock_data table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stock_data (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                TYP VARCHAR(10),
-                DTP VARCHAR(20),
-                PKT VARCHAR(20),
-                GRD VARCHAR(20),
-                FIN VARCHAR(20),
-                THK VARCHAR(20),
-                WIDT VARCHAR(20),
-                LNGT VARCHAR(20),
-                PWT VARCHAR(20),
-                QLY VARCHAR(10),
-                EDGE VARCHAR(10),
-                ASP VARCHAR(20),
-                HRC1 VARCHAR(20),
-                BL VARCHAR(10),
-                SAL VARCHAR(50),
-                STORE VARCHAR(50),
-                NICKEL VARCHAR(20),
-                COILNO VARCHAR(20)
-            )
-        """)
         
-        # Check if stock_data table is empty
-        cursor.execute("SELECT COUNT(*) FROM stock_data")
-        count = cursor.fetchone()[0]
+        # Create or upgrade the schema to the latest version
+        run_migrations(conn, 'mysql')
         
-        if count == 0:
+        # Check if stock_data table is empty
+        if stock_repo.is_empty(conn):
             # Load stock data from CSV
             try:
+                # bulk_load_stock commits or rolls back its own transaction
                 csv_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'stock-data.csv')
-                stock_data = pd.read_csv(csv_path)
-                
-                # Insert stock data into the database
-                for _, row in stock_data.iterrows():
-                    cursor.execute("""
-                        INSERT INTO stock_data (
-                            TYP, DTP, PKT, GRD, FIN, THK, WIDT, LNGT, PWT, QLY, EDGE, 
-                            ASP, HRC1, BL, SAL, STORE, NICKEL, COILNO
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        row.get('TYP', ''), row.get('DTP', ''), row.get('PKT', ''), 
-                        row.get('GRD', ''), row.get('FIN', ''), row.get('THK', ''), 
-                        row.get('WIDT', ''), row.get('LNGT', ''), row.get('PWT', ''), 
-                        row.get('QLY', ''), row.get('EDGE', ''), row.get('ASP', ''), 
-                        row.get('HRC1', ''), row.get('BL', ''), row.get('SAL', ''), 
-                        row.get('STORE', ''), row.get('NICKEL', ''), row.get('COILNO', '')
-                    ))
+                loaded = stock_repo.bulk_load(csv_path, conn)
+                print(f"Loaded {loaded} stock rows from {csv_path}")
             except Exception as e:
                 print(f"Error loading stock data from CSV: {e}")
                 
@@ -147,24 +111,242 @@ def init_database():
                     ('C', '24/02/2024', 'FC22581', '316', '2D', '0.3', '1250', '', '2.159', 'P', 'M', 'SSP', '219930', 'FALSE', 'HRCS', '', '1.5', '219930')
                 ]
                 
-                for data in sample_data:
-                    cursor.execute("""
-                        INSERT INTO stock_data (
-                            TYP, DTP, PKT, GRD, FIN, THK, WIDT, LNGT, PWT, QLY, EDGE, 
-                            ASP, HRC1, BL, SAL, STORE, NICKEL, COILNO
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, data)
-        
-        conn.commit()
+                # Also refreshes the lead-time profiles and stock version
+                stock_repo.insert_rows(sample_data, conn)
+        
         print("Database initialized successfully")
     except Exception as e:
         print(f"Error initializing database: {e}")
     finally:
-        if 'cursor' in locals():
-            cursor.close()
         if 'conn' in locals():
             conn.close()
 
+# OrdersRepo insert values for an order payload
+def build_order_params(order_id, current_user, data, release_date, delivery_days, expected_delivery_date, created_at):
+    return (
+        order_id,
+        current_user['id'],
+        data['grade'],
+        data['thickness'],
+        data['width'],
+        data.get('length', ''),
+        data.get('finish', ''),
+        data.get('quality', ''),
+        data.get('edge', ''),
+        data.get('bQuantity', ''),
+        data['customer'],
+        data.get('sspRoId', ''),
+        release_date,
+        data['requiredQuantity'],
+        data.get('mou', ''),
+        data.get('remarks', ''),
+        delivery_days,
+        expected_delivery_date,
+        'Processing',
+        created_at
+    )
+
+# Version scopes (owning user ids) of order insert rows
+def order_scopes(order_rows):
+    return [params[1] for params in order_rows]
+
+# Orders changed: bump the versions behind the /api/orders ETags of the
+# users owning order_rows (call inside the inserting transaction)
+def bump_orders_version(cursor, order_rows):
+    orders_repo.bump_versions(cursor, order_scopes(order_rows))
+
+# Optional group commit: one writer thread batches order inserts into a
+# single transaction instead of one commit per request. Acknowledged orders
+# are durable with InnoDB's default innodb_flush_log_at_trx_commit = 1.
+order_writer = None
+ORDER_GROUP_COMMIT_TIMEOUT = float(os.environ.get('ORDER_GROUP_COMMIT_TIMEOUT', 10))
+if os.environ.get('ORDER_GROUP_COMMIT', '').lower() in ('1', 'true', 'yes') and not IS_POOL_WORKER:
+    order_writer = GroupCommitWriter(
+        lambda: connection_pool.get_connection(),
+        orders_repo.insert_sql,
+        max_batch=int(os.environ.get('ORDER_GROUP_COMMIT_MAX_BATCH', 100)),
+        max_delay_ms=float(os.environ.get('ORDER_GROUP_COMMIT_DELAY_MS', 5)),
+        name='order-writer',
+        on_batch=bump_orders_version,
+    ).start()
+
+# Fields every order payload must carry
+ORDER_REQUIRED_FIELDS = ['grade', 'thickness', 'width', 'customer', 'requiredQuantity']
+
+# Upper bound on orders accepted by one /api/orders/batch call
+MAX_BATCH_ORDERS = int(os.environ.get('MAX_BATCH_ORDERS', 500))
+
+# First problem with an order payload's required fields, or None. Their
+# columns are NOT NULL text, so each must be a string or a number
+def order_field_error(data):
+    for field in ORDER_REQUIRED_FIELDS:
+        if field not in data:
+            return f"Missing required field: {field}"
+        value = data[field]
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return f"Field {field} must be a string or a number"
+    return None
+
+# Upper bound on line items accepted by one /api/stock/check/batch call
+MAX_BATCH_QUOTES = int(os.environ.get('MAX_BATCH_QUOTES', 500))
+
+# Optional line-item fields of /api/stock/check/batch echoed in the results
+QUOTE_SPEC_FIELDS = ['thickness', 'width', 'finish']
+
+# JSON encoding and Accept-Encoding negotiated compression of read responses
+serializer = JSONSerializer(
+    encoder=os.environ.get('JSON_ENCODER', 'auto'),
+    compress_min_bytes=int(os.environ.get('COMPRESS_MIN_BYTES', 1024)),
+    compress_level=int(os.environ.get('COMPRESS_LEVEL', 1)),
+)
+
+# Rows read per fetchmany() by the streaming export endpoints
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', DEFAULT_EXPORT_CHUNK_SIZE))
+
+# Chunked response streaming an export generator's NDJSON or CSV blocks
+def export_response(rows, export_format, filename):
+    response = Response(stream_with_context(rows), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+# Lead-time profiles per grade, tagged with the stock_version they were read at
+stock_query_cache = LRUCache(
+    maxsize=int(os.environ.get('STOCK_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('STOCK_CACHE_TTL', 300)),
+)
+
+# Lead-time profiles of one grade, cached until the stock version changes
+def get_grade_profiles(grade, conn=None):
+    with db.connection(conn) as conn:
+        stock_version = stock_repo.version(conn)
+        profiles = stock_query_cache.get(grade, stock_version)
+        if profiles is MISSING:
+            profiles = stock_repo.lead_time_profiles([grade], conn)
+            stock_query_cache.set(grade, profiles, stock_version)
+    return profiles
+
+# Reserved coils in the API's camelCase shape
+def allocation_payload(allocation):
+    return {
+        "status": allocation['status'],
+        "requiredWeight": allocation['required'],
+        "allocatedWeight": allocation['allocated'],
+        "coils": [
+            {"stockId": coil['stock_id'], "pkt": coil['PKT'], "coilNo": coil['COILNO'], "weight": coil['weight']}
+            for coil in allocation['coils']
+        ]
+    }
+
+# stock_summary columns by their camelCase query parameter and payload key
+SUMMARY_FIELDS = {
+    'grade': 'grade',
+    'finish': 'finish',
+    'thicknessBand': 'thk_band',
+    'salCategory': 'sal_category',
+    'coils': 'coils',
+    'totalWeight': 'total_pwt',
+    'reservedCoils': 'reserved_coils',
+    'reservedWeight': 'reserved_pwt',
+    'availableWeight': 'available_pwt',
+}
+
+def summary_payload(row):
+    return {field: row[column] for field, column in SUMMARY_FIELDS.items() if column in row}
+
+# Reserve coils for a created order; the order stands even if this fails
+def allocate_order(order_id, data, created_at):
+    try:
+        allocation = allocations_repo.allocate(
+            order_id,
+            data['grade'],
+            data['thickness'],
+            data['width'],
+            data.get('finish'),
+            data['requiredQuantity'],
+            created_at,
+        )
+    except Exception as e:
+        print(f"Allocation error for order {order_id}: {e}")
+        return {"status": "error", "coils": []}
+    return allocation_payload(allocation)
+
+# Delivery days and message for a (min, max) lead-time range
+def calculate_delivery(lead_time):
+    min_days, max_days = lead_time
+    
+    if max_days == 0:
+        return 0, "Material Available, It will be dispatched soon"
+    
+    delivery_days = random.randint(min_days, max_days)
+    return delivery_days, f"Processing time: {delivery_days} days"
+
+# Password hashing/verification on a bounded process pool; when it is
+# saturated auth routes answer 503 instead of queueing request threads
+password_hasher = PasswordHasher(
+    max_workers=int(os.environ.get('PASSWORD_POOL_WORKERS', 2)),
+    max_pending=int(os.environ.get('PASSWORD_POOL_MAX_PENDING', 16)),
+    timeout=float(os.environ.get('PASSWORD_POOL_TIMEOUT', 10)),
+    method=os.environ.get('PASSWORD_HASH_METHOD') or None,
+)
+
+def auth_busy_response():
+    response = jsonify({"message": "Server is busy, please try again shortly"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+# Users resolved from auth tokens, keyed by (user id, token signature)
+user_cache = LRUCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', 4096)),
+    ttl=float(os.environ.get('USER_CACHE_TTL', 60)),
+)
+
+# Decode an auth token and return its user, or None if the user does not exist
+def load_token_user(token):
+    data = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+    key = (data['id'], token.rsplit('.', 1)[-1])
+    
+    user = user_cache.get(key)
+    if user is MISSING:
+        user = users_repo.get(data['id'])
+        
+        if not user:
+            return None
+        user_cache.set(key, user)
+    
+    # Handlers get their own copy of the cached row
+    return dict(user)
+
+# Drop every cached entry of one user, whichever token it was cached under
+def invalidate_cached_user(user_id):
+    user_cache.invalidate_where(lambda key: key[0] == user_id)
+
+# Per-route latency, DB and serialization time, pool wait and cache
+# counters, exposed to admins at GET /metrics
+request_metrics = RequestMetrics().init_app(app, path=None).instrument(db, serializer)
+request_metrics.register_cache('stock_query', stock_query_cache)
+request_metrics.register_cache('user', user_cache)
+request_metrics.register_stats('allocation', allocations_repo.stats, counters=('conflicts',))
+request_metrics.register_stats('password_hasher', password_hasher.stats, counters=('completed', 'rejected', 'timeouts', 'restarts'))
+if order_writer:
+    request_metrics.register_stats('order_writer', order_writer.stats, counters=('batches', 'rows', 'timeouts'))
+if 'connection_pool' in globals():
+    request_metrics.register_stats(
+        'db_pool', connection_pool.stats,
+        counters=('checkouts', 'waits', 'wait_seconds_total', 'exhausted', 'created', 'closed', 'ping_failures', 'reaped'),
+    )
+
+# Statements slower than SLOW_QUERY_MS are logged, with their EXPLAIN
+# captured the first time each query shape is seen
+slow_query_log = None
+if os.environ.get('SLOW_QUERY_LOG', 'true').lower() in ('1', 'true', 'yes'):
+    slow_query_log = SlowQueryLog(
+        'mysql',
+        threshold_ms=float(os.environ.get('SLOW_QUERY_MS', 100)),
+        max_shapes=int(os.environ.get('SLOW_QUERY_MAX_SHAPES', 500)),
+    )
+    db.observers.append(slow_query_log.observe)
+    request_metrics.register_stats('slow_queries', slow_query_log.stats, counters=('slow', 'dropped'))
+
 # Token required decorator
 def token_required(f):
     @wraps(f)
@@ -179,19 +361,14 @@ def token_required(f):
             return jsonify({'message': 'Token is missing!'}), 401
         
         try:
-            # Decode token
-            data = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-            
-            # Get user from database
-            conn = connection_pool.get_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (data['id'],))
-            current_user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            # Decode token and get user from the cache or database
+            current_user = load_token_user(token)
             
             if not current_user:
                 return jsonify({'message': 'User not found!'}), 401
+        except PoolExhausted as e:
+            print(f"Token user lookup error: {e}")
+            return jsonify({'message': 'Server is busy, please try again shortly'}), 503
         except Exception as e:
             return jsonify({'message': 'Token is invalid!'}), 401
         
@@ -199,6 +376,35 @@ def token_required(f):
     
     return decorated
 
+# Admin endpoints require the X-Admin-Token header to match ADMIN_TOKEN and
+# are disabled when it is not set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def is_admin_request():
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'message': 'Not found'}), 404
+        if not is_admin_request():
+            return jsonify({'message': 'Admin token is missing or invalid'}), 403
+        return f(*args, **kwargs)
+    
+    return decorated
+
+# Opt-in request profiling (PROFILING=true): requests sent with an X-Profile
+# header and the admin token, or sampled at PROFILE_SAMPLE_RATE, run under
+# cProfile; profiles are aggregated per route in PROFILE_DIR
+request_profiler = None
+if os.environ.get('PROFILING', '').lower() in ('1', 'true', 'yes'):
+    request_profiler = RequestProfiler(
+        os.environ.get('PROFILE_DIR', 'profiles'),
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        authorize=is_admin_request,
+    ).init_app(app)
+
 # Routes
 @app.route('/api/auth/login', methods=['POST'])
 def login():
@@ -211,16 +417,20 @@ def login():
             return jsonify({"message": "Email and password are required"}), 400
         
         # Get user from database
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        user = users_repo.get_by_email(email)
         
-        if not user or not check_password_hash(user['password'], password):
+        if not user or not password_hasher.verify(user['password'], password):
             return jsonify({"message": "Invalid email or password"}), 401
         
+        # Upgrade hashes made with older parameters while the password is known
+        if password_hasher.needs_rehash(user['password']):
+            try:
+                rehashed_password = password_hasher.hash(password)
+                users_repo.set_password(user['id'], rehashed_password)
+            except Exception as e:
+                # The login still succeeds; the next one retries the upgrade
+                print(f"Password rehash error: {e}")
+        
         # Generate JWT token
         token = jwt.encode({
             'id': user['id'],
@@ -249,6 +459,8 @@ def login():
         )
         
         return response
+    except HasherBusy:
+        return auth_busy_response()
     except Exception as e:
         print(f"Login error: {e}")
         return jsonify({"message": "An error occurred during login"}), 500
@@ -264,29 +476,18 @@ def signup():
         if not name or not email or not password:
             return jsonify({"message": "Name, email, and password are required"}), 400
         
-        # Check if user already exists
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        existing_user = cursor.fetchone()
+        # Hash before taking a connection, so none is held while waiting
+        hashed_password = password_hasher.hash(password)
         
-        if existing_user:
-            cursor.close()
-            conn.close()
+        # Check if user already exists
+        if users_repo.email_taken(email):
             return jsonify({"message": "User with this email already exists"}), 409
         
         # Create new user
         user_id = str(uuid.uuid4())
-        hashed_password = generate_password_hash(password)
         created_at = datetime.now()
         
-        cursor.execute(
-            "INSERT INTO users (id, name, email, password, created_at) VALUES (%s, %s, %s, %s, %s)",
-            (user_id, name, email, hashed_password, created_at)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        users_repo.create(user_id, name, email, hashed_password, created_at)
         
         # Generate JWT token
         token = jwt.encode({
@@ -316,6 +517,8 @@ def signup():
         )
         
         return response, 201
+    except HasherBusy:
+        return auth_busy_response()
     except Exception as e:
         print(f"Signup error: {e}")
         return jsonify({"message": "An error occurred during signup"}), 500
@@ -334,16 +537,8 @@ def get_current_user():
         return jsonify({"message": "Not authenticated"}), 401
     
     try:
-        # Decode token
-        data = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        
-        # Get user from database
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, name, email FROM users WHERE id = %s", (data['id'],))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        # Decode token and get user from the cache or database
+        user = load_token_user(token)
         
         if not user:
             return jsonify({"message": "User not found"}), 404
@@ -357,18 +552,48 @@ def get_current_user():
 @token_required
 def get_orders(current_user):
     try:
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM orders WHERE user_id = %s ORDER BY created_at DESC", (current_user['id'],))
-        orders = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        # Keyset pagination: ?limit=&cursor= and an optional ?fields= projection
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            cursor_key = decode_cursor(request.args.get('cursor'))
+            # Neither limit nor cursor: the whole listing, as before paging
+            limit = page_limit(request.args.get('limit'), cursor_key)
+        except PaginationError as e:
+            return jsonify({"message": str(e)}), 400
+        
+        with db.connection() as conn:
+            # Unchanged since the client's copy: answer 304 without reading orders
+            version, version_updated_at = orders_repo.version(current_user['id'], conn)
+            etag = make_etag(current_user['id'], version, version_updated_at, request.query_string.decode())
+            unchanged = not_modified(etag, version_updated_at, 'private, no-cache')
+            if unchanged:
+                return unchanged
+            
+            orders, page_cursor = orders_repo.page(fields, limit, cursor_key, user_id=current_user['id'], conn=conn)
         
-        return jsonify({"orders": orders})
+        response = serializer.response({"orders": orders, "nextCursor": page_cursor})
+        set_validators(response, etag, version_updated_at, 'private, no-cache')
+        if page_cursor:
+            response.headers['X-Next-Cursor'] = page_cursor
+        return response
     except Exception as e:
         print(f"Get orders error: {e}")
         return jsonify({"message": "An error occurred while fetching orders"}), 500
 
+@app.route('/api/orders/export', methods=['GET'])
+@token_required
+def export_orders(current_user):
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        fields = parse_fields(request.args.get('fields'))
+    except PaginationError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    rows = orders_repo.export(fields, export_format, EXPORT_CHUNK_SIZE, user_id=current_user['id'])
+    return export_response(rows, export_format, 'orders')
+
 @app.route('/api/orders', methods=['POST'])
 @token_required
 def create_order(current_user):
@@ -376,128 +601,200 @@ def create_order(current_user):
         data = request.json
         
         # Validate required fields
-        required_fields = ['grade', 'thickness', 'width', 'customer', 'requiredQuantity']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"message": f"Missing required field: {field}"}), 400
+        error = order_field_error(data)
+        if error:
+            return jsonify({"message": error}), 400
         
         # Create order ID
         order_id = str(uuid.uuid4())
         created_at = datetime.now()
         
-        # Check stock data for delivery days calculation
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM stock_data WHERE GRD = %s LIMIT 1", (data['grade'],))
-        stock_item = cursor.fetchone()
+        # Look up the grade's lead-time profile for delivery days calculation
+        profiles = get_grade_profiles(data['grade'])
         
         # Calculate delivery days
-        delivery_days = 0
-        if stock_item:
-            sal_value = stock_item['SAL']
-            
-            if sal_value == 'TRUE':
-                delivery_days = 0
-            elif 'KICKBACK SLAB STK' in sal_value or 'SLAB STK' in sal_value:
-                delivery_days = random.randint(60, 90)
-            elif any(store_type in sal_value for store_type in ['HRC HRM', 'HRCS', 'HRCS JOBWORK', 'HRSS', 'REMOTE HRC']):
-                delivery_days = random.randint(45, 60)
-            elif any(store_type in sal_value for store_type in ['HRC CRM', 'COIN BLANK STK', 'PACKET OPEN WIP']):
-                delivery_days = 30
-            else:
-                delivery_days = random.randint(75, 100)
-        else:
-            delivery_days = random.randint(75, 100)
+        delivery_days, _ = calculate_delivery(lead_time_range(profiles, data['grade'], data.get('finish'), data['thickness']))
         
         # Calculate expected delivery date
         release_date = datetime.strptime(data.get('releaseDate', created_at.strftime('%Y-%m-%d')), '%Y-%m-%d')
         expected_delivery_date = release_date + timedelta(days=delivery_days)
         
-        # Insert order into database
-        cursor.execute("""
-            INSERT INTO orders (
-                id, user_id, grade, thickness, width, length, finish, quality, edge, 
-                b_quantity, customer, ssp_ro_id, release_date, required_quantity, 
-                mou, remarks, delivery_days, expected_delivery_date, status, created_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """, (
-            order_id,
-            current_user['id'],
-            data['grade'],
-            data['thickness'],
-            data['width'],
-            data.get('length', ''),
-            data.get('finish', ''),
-            data.get('quality', ''),
-            data.get('edge', ''),
-            data.get('bQuantity', ''),
-            data['customer'],
-            data.get('sspRoId', ''),
-            release_date,
-            data['requiredQuantity'],
-            data.get('mou', ''),
-            data.get('remarks', ''),
-            delivery_days,
-            expected_delivery_date,
-            'Processing',
-            created_at
-        ))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        order_params = build_order_params(order_id, current_user, data, release_date, delivery_days, expected_delivery_date, created_at)
+        
+        if order_writer:
+            # Wait until the writer thread has committed this order
+            try:
+                order_writer.write(order_params, ORDER_GROUP_COMMIT_TIMEOUT)
+            except GroupCommitTimeout as e:
+                print(f"Create order error: {e}")
+                return jsonify({"message": "Server is busy, please try again shortly"}), 503
+        else:
+            # Insert order into database
+            orders_repo.insert([order_params], order_scopes([order_params]))
+        
+        order = {
+            "id": order_id,
+            "userId": current_user['id'],
+            "grade": data['grade'],
+            "thickness": data['thickness'],
+            "width": data['width'],
+            "deliveryDays": delivery_days,
+            "expectedDeliveryDate": expected_delivery_date.isoformat(),
+            "status": "Processing",
+            "createdAt": created_at.isoformat()
+        }
+        if ORDER_ALLOCATION:
+            order["allocation"] = allocate_order(order_id, data, created_at)
         
         return jsonify({
             "message": "Order created successfully",
-            "order": {
-                "id": order_id,
-                "userId": current_user['id'],
-                "grade": data['grade'],
-                "thickness": data['thickness'],
-                "width": data['width'],
-                "deliveryDays": delivery_days,
-                "expectedDeliveryDate": expected_delivery_date.isoformat(),
-                "status": "Processing",
-                "createdAt": created_at.isoformat()
-            }
+            "order": order
         }), 201
     except Exception as e:
         print(f"Create order error: {e}")
         return jsonify({"message": "An error occurred while creating the order"}), 500
 
+@app.route('/api/orders/batch', methods=['POST'])
+@token_required
+def create_orders_batch(current_user):
+    try:
+        data = request.json
+        orders = data.get('orders') if isinstance(data, dict) else data
+        
+        if not isinstance(orders, list) or not orders:
+            return jsonify({"message": "A non-empty list of orders is required"}), 400
+        if len(orders) > MAX_BATCH_ORDERS:
+            return jsonify({"message": f"At most {MAX_BATCH_ORDERS} orders can be submitted per batch"}), 413
+        
+        created_at = datetime.now()
+        results = [None] * len(orders)
+        valid = []
+        
+        # Validate every order with the same rules as create_order
+        for index, order in enumerate(orders):
+            if not isinstance(order, dict):
+                results[index] = {"index": index, "status": "error", "message": "Order must be an object"}
+                continue
+            
+            error = order_field_error(order)
+            if error:
+                results[index] = {"index": index, "status": "error", "message": error}
+                continue
+            
+            try:
+                release_date = datetime.strptime(order.get('releaseDate', created_at.strftime('%Y-%m-%d')), '%Y-%m-%d')
+            except (TypeError, ValueError):
+                results[index] = {"index": index, "status": "error", "message": "releaseDate must be YYYY-MM-DD"}
+                continue
+            
+            valid.append((index, order, release_date))
+        
+        order_rows = []
+        if valid:
+            # Resolve the lead-time profile of each distinct grade once
+            profiles = stock_repo.lead_time_profiles({order['grade'] for _, order, _ in valid})
+            
+            for index, order, release_date in valid:
+                order_id = str(uuid.uuid4())
+                delivery_days, _ = calculate_delivery(lead_time_range(profiles, order['grade'], order.get('finish'), order['thickness']))
+                expected_delivery_date = release_date + timedelta(days=delivery_days)
+                
+                order_rows.append(build_order_params(order_id, current_user, order, release_date, delivery_days, expected_delivery_date, created_at))
+                results[index] = {
+                    "index": index,
+                    "status": "created",
+                    "order": {
+                        "id": order_id,
+                        "grade": order['grade'],
+                        "deliveryDays": delivery_days,
+                        "expectedDeliveryDate": expected_delivery_date.isoformat()
+                    }
+                }
+            
+            # Insert all valid orders in one transaction; if that fails, each
+            # in its own, so only the orders the database rejects fail
+            errors = orders_repo.insert_each(order_rows, order_scopes)
+            for (index, _, _), error in zip(valid, errors):
+                if error is not None:
+                    print(f"Create orders batch insert error: {error}")
+                    results[index] = {"index": index, "status": "error", "message": "Order could not be saved"}
+            valid = [item for item, error in zip(valid, errors) if error is None]
+            
+            if ORDER_ALLOCATION:
+                # Each order is allocated in its own short transaction
+                for index, order, _ in valid:
+                    result = results[index]["order"]
+                    result["allocation"] = allocate_order(result["id"], order, created_at)
+        
+        created = len(valid)
+        failed = len(orders) - created
+        status_code = 201 if failed == 0 else 207 if created else 400
+        
+        return jsonify({
+            "message": f"{created} orders created, {failed} failed",
+            "created": created,
+            "failed": failed,
+            "results": results
+        }), status_code
+    except Exception as e:
+        print(f"Create orders batch error: {e}")
+        return jsonify({"message": "An error occurred while creating the orders"}), 500
+
 @app.route('/api/orders/<order_id>', methods=['GET'])
 @token_required
 def get_order(current_user, order_id):
     try:
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM orders WHERE id = %s AND user_id = %s", (order_id, current_user['id']))
-        order = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        with db.connection() as conn:
+            # Revalidation only needs the order's updated_at
+            if request.if_none_match or request.if_modified_since:
+                updated_at = orders_repo.updated_at(order_id, current_user['id'], conn)
+                if updated_at:
+                    unchanged = not_modified(make_etag(order_id, updated_at), updated_at, 'private, no-cache')
+                    if unchanged:
+                        return unchanged
+            
+            order = orders_repo.get(order_id, current_user['id'], conn)
         
         if not order:
             return jsonify({"message": "Order not found"}), 404
         
-        return jsonify({"order": order})
+        response = serializer.response({"order": order})
+        return set_validators(response, make_etag(order_id, order['updated_at']), order['updated_at'], 'private, no-cache')
     except Exception as e:
         print(f"Get order error: {e}")
         return jsonify({"message": "An error occurred while fetching the order"}), 500
 
+@app.route('/api/orders/<order_id>/allocation', methods=['GET'])
+@token_required
+def get_order_allocation(current_user, order_id):
+    try:
+        with db.connection() as conn:
+            if not orders_repo.get(order_id, current_user['id'], conn):
+                return jsonify({"message": "Order not found"}), 404
+            coils = allocations_repo.for_order(order_id, conn)
+        
+        return serializer.response({
+            "orderId": order_id,
+            "allocatedWeight": round(sum(coil['weight'] for coil in coils), 3),
+            "coils": [
+                {"stockId": coil['stock_id'], "pkt": coil['PKT'], "coilNo": coil['COILNO'], "weight": coil['weight'], "reservedAt": coil['created_at']}
+                for coil in coils
+            ]
+        })
+    except Exception as e:
+        print(f"Get order allocation error: {e}")
+        return jsonify({"message": "An error occurred while fetching the allocation"}), 500
+
 @app.route('/api/profile', methods=['GET'])
 @token_required
 def get_profile(current_user):
     try:
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT id, name, email, created_at FROM users WHERE id = %s", (current_user['id'],))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        user = users_repo.get_profile(current_user['id'])
         
         if not user:
             return jsonify({"message": "User not found"}), 404
         
-        return jsonify({"user": user})
+        return serializer.response({"user": user})
     except Exception as e:
         print(f"Get profile error: {e}")
         return jsonify({"message": "An error occurred while fetching profile data"}), 500
@@ -513,28 +810,17 @@ def update_profile(current_user):
         if not name or not email:
             return jsonify({"message": "Name and email are required"}), 400
         
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Check if email is already taken by another user
-        if email != current_user['email']:
-            cursor.execute("SELECT * FROM users WHERE email = %s AND id != %s", (email, current_user['id']))
-            existing_user = cursor.fetchone()
-            
-            if existing_user:
-                cursor.close()
-                conn.close()
+        with db.connection() as conn:
+            # Check if email is already taken by another user
+            if email != current_user['email'] and users_repo.email_taken(email, current_user['id'], conn):
                 return jsonify({"message": "Email is already taken"}), 409
-        
-        # Update user profile
-        cursor.execute("UPDATE users SET name = %s, email = %s WHERE id = %s", (name, email, current_user['id']))
-        conn.commit()
-        
-        # Get updated user data
-        cursor.execute("SELECT id, name, email, created_at FROM users WHERE id = %s", (current_user['id'],))
-        updated_user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+            
+            # Update user profile
+            users_repo.update_profile(current_user['id'], name, email, conn)
+            invalidate_cached_user(current_user['id'])
+            
+            # Get updated user data
+            updated_user = users_repo.get_profile(current_user['id'], conn)
         
         return jsonify({
             "message": "Profile updated successfully",
@@ -555,38 +841,56 @@ def update_password(current_user):
         if not current_password or not new_password:
             return jsonify({"message": "Current password and new password are required"}), 400
         
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        
         # Get user's current password hash
-        cursor.execute("SELECT password FROM users WHERE id = %s", (current_user['id'],))
-        user = cursor.fetchone()
+        password_hash = users_repo.get_password(current_user['id'])
         
-        if not user:
-            cursor.close()
-            conn.close()
+        if not password_hash:
             return jsonify({"message": "User not found"}), 404
         
         # Verify current password
-        if not check_password_hash(user['password'], current_password):
-            cursor.close()
-            conn.close()
+        if not password_hasher.verify(password_hash, current_password):
             return jsonify({"message": "Current password is incorrect"}), 401
         
         # Hash new password
-        hashed_password = generate_password_hash(new_password)
+        hashed_password = password_hasher.hash(new_password)
         
         # Update password
-        cursor.execute("UPDATE users SET password = %s WHERE id = %s", (hashed_password, current_user['id']))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        users_repo.set_password(current_user['id'], hashed_password)
         
         return jsonify({"message": "Password updated successfully"})
+    except HasherBusy:
+        return auth_busy_response()
     except Exception as e:
         print(f"Update password error: {e}")
         return jsonify({"message": "An error occurred while updating password"}), 500
 
+@app.route('/api/stock/export', methods=['GET'])
+@token_required
+def export_stock(current_user):
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    # Same column layout as the stock export CSV loaded by bulk_load_stock
+    rows = stock_repo.export(export_format, EXPORT_CHUNK_SIZE)
+    return export_response(rows, export_format, 'stock')
+
+@app.route('/api/stock/summary', methods=['GET'])
+@token_required
+def get_stock_summary(current_user):
+    try:
+        # Reads the maintained stock_summary table, never stock_data;
+        # ?grade=&finish=&thicknessBand=&salCategory= narrow the groups
+        groups = stock_repo.summary({column: request.args.get(field) for field, column in SUMMARY_FIELDS.items()})
+        
+        return serializer.response({
+            "groups": [summary_payload(group) for group in groups],
+            "totals": summary_payload(summary_totals(groups))
+        })
+    except Exception as e:
+        print(f"Stock summary error: {e}")
+        return jsonify({"message": "An error occurred while reading the stock summary"}), 500
+
 @app.route('/api/stock/check', methods=['GET'])
 @token_required
 def check_stock(current_user):
@@ -596,38 +900,11 @@ def check_stock(current_user):
         if not grade:
             return jsonify({"message": "Grade parameter is required"}), 400
         
-        conn = connection_pool.get_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM stock_data WHERE GRD = %s LIMIT 1", (grade,))
-        stock_item = cursor.fetchone()
-        cursor.close()
-        conn.close()
-        
-        # Calculate delivery days
-        delivery_days = 0
-        delivery_message = ""
+        profiles = get_grade_profiles(grade)
         
-        if stock_item:
-            sal_value = stock_item['SAL']
-            
-            if sal_value == 'TRUE':
-                delivery_days = 0
-                delivery_message = "Material Available, It will be dispatched soon"
-            elif 'KICKBACK SLAB STK' in sal_value or 'SLAB STK' in sal_value:
-                delivery_days = random.randint(60, 90)
-                delivery_message = f"Processing time: {delivery_days} days"
-            elif any(store_type in sal_value for store_type in ['HRC HRM', 'HRCS', 'HRCS JOBWORK', 'HRSS', 'REMOTE HRC']):
-                delivery_days = random.randint(45, 60)
-                delivery_message = f"Processing time: {delivery_days} days"
-            elif any(store_type in sal_value for store_type in ['HRC CRM', 'COIN BLANK STK', 'PACKET OPEN WIP']):
-                delivery_days = 30
-                delivery_message = f"Processing time: {delivery_days} days"
-            else:
-                delivery_days = random.randint(75, 100)
-                delivery_message = f"Processing time: {delivery_days} days"
-        else:
-            delivery_days = random.randint(75, 100)
-            delivery_message = f"Processing time: {delivery_days} days"
+        # Calculate delivery days, narrowed by finish and thickness when given
+        lead_time = lead_time_range(profiles, grade, request.args.get('finish'), request.args.get('thickness'))
+        delivery_days, delivery_message = calculate_delivery(lead_time)
         
         # Calculate expected delivery date
         expected_delivery_date = datetime.now() + timedelta(days=delivery_days)
@@ -642,6 +919,115 @@ def check_stock(current_user):
         print(f"Check stock error: {e}")
         return jsonify({"message": "An error occurred while checking stock"}), 500
 
+@app.route('/api/stock/check/batch', methods=['POST'])
+@token_required
+def check_stock_batch(current_user):
+    try:
+        data = request.json
+        items = data.get('items') if isinstance(data, dict) else data
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({"message": "A non-empty list of items is required"}), 400
+        if len(items) > MAX_BATCH_QUOTES:
+            return jsonify({"message": f"At most {MAX_BATCH_QUOTES} items can be checked per batch"}), 413
+        
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not item.get('grade'):
+                return jsonify({"message": f"Item {index}: grade is required"}), 400
+        
+        # Fetch the lead-time profiles of every requested grade in one query,
+        # and of every requested (grade, width) from the stock itself
+        with db.connection() as conn:
+            profiles = stock_repo.lead_time_profiles({item['grade'] for item in items}, conn)
+            width_specs = {(item['grade'], parse_dimension(item['width'])) for item in items if item.get('width')}
+            width_profiles = stock_repo.width_lead_time_profiles(
+                [spec for spec in width_specs if spec[1] is not None], conn
+            )
+        
+        now = datetime.now()
+        results = []
+        for index, item in enumerate(items):
+            # 'exact' when stock matches every given spec, 'grade' when the
+            # answer falls back to the grade's stock, None without any
+            lead_time, matched = quote_lead_time(
+                profiles, width_profiles, item['grade'], item.get('finish'), item.get('thickness'), item.get('width')
+            )
+            delivery_days, delivery_message = calculate_delivery(lead_time)
+            results.append({
+                "index": index,
+                "grade": item['grade'],
+                **{field: item[field] for field in QUOTE_SPEC_FIELDS if item.get(field)},
+                "matched": matched,
+                "deliveryDays": delivery_days,
+                "deliveryMessage": delivery_message,
+                "expectedDeliveryDate": (now + timedelta(days=delivery_days)).isoformat()
+            })
+        
+        return jsonify({"results": results})
+    except Exception as e:
+        print(f"Check stock batch error: {e}")
+        return jsonify({"message": "An error occurred while checking stock"}), 500
+
+# Prometheus scrapes send the admin token as an X-Admin-Token header
+@app.route('/metrics', methods=['GET'])
+@admin_required
+def get_metrics():
+    return request_metrics.metrics_view()
+
+@app.route('/api/admin/slow-queries', methods=['GET', 'DELETE'])
+@admin_required
+def slow_queries():
+    if not slow_query_log:
+        return jsonify({"message": "Slow query log is disabled"}), 404
+    
+    if request.method == 'DELETE':
+        slow_query_log.clear()
+        return jsonify({"message": "Slow query log cleared"})
+    
+    return serializer.response(slow_query_log.report())
+
+@app.route('/api/admin/profiles', methods=['GET', 'DELETE'])
+@admin_required
+def list_profiles():
+    if not request_profiler:
+        return jsonify({"message": "Profiling is disabled"}), 404
+    
+    if request.method == 'DELETE':
+        request_profiler.clear()
+        return jsonify({"message": "Profiles cleared"})
+    
+    return jsonify({"profiles": request_profiler.profiles(), **request_profiler.stats()})
+
+@app.route('/api/admin/profiles/<route>', methods=['GET'])
+@admin_required
+def get_profile_report(route):
+    if not request_profiler:
+        return jsonify({"message": "Profiling is disabled"}), 404
+    
+    try:
+        path = request_profiler.path(route)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    if not os.path.exists(path):
+        return jsonify({"message": "No profile for this route"}), 404
+    
+    # ?format=pstats downloads the aggregated pstats file
+    if request.args.get('format') == 'pstats':
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path))
+    # ?format=collapsed gives collapsed stacks for flamegraph.pl or speedscope
+    if request.args.get('format') == 'collapsed':
+        return Response(request_profiler.collapsed(route), mimetype='text/plain')
+    
+    try:
+        report = request_profiler.report(
+            route,
+            sort=request.args.get('sort', 'cumulative'),
+            limit=int(request.args.get('limit', 50)),
+        )
+    except (KeyError, ValueError) as e:
+        return jsonify({"message": f"Invalid sort or limit: {e}"}), 400
+    return Response(report, mimetype='text/plain')
+
 if __name__ == '__main__':
     # Initialize database
     init_database()
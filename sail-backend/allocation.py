@@ -0,0 +1,147 @@
+"""Coil allocation: reserving specific stock_data coils for an order.
+
+An order asks for ``required`` weight (same unit as PWT) of a grade,
+thickness, width and, optionally, finish. The candidates are unreserved
+coils of exactly that specification that are Material Available
+(SAL = 'TRUE') and have a weight. They are read through
+idx_stock_grade_thk_widt_num, lightest first.
+
+``best_fit`` chooses whole coils. If one coil covers the remaining weight,
+it takes the lightest such coil. Otherwise it takes the heaviest coil and
+repeats. An order is either covered in full or gets nothing; a shortfall
+reserves no coils.
+
+Reservations live in stock_reservations, with a UNIQUE stock_id, so the
+database itself rules out double allocation. Each coil is claimed with
+``INSERT OR IGNORE`` (``INSERT IGNORE`` on MySQL) selecting from
+stock_data. A claim inserts nothing when the coil was taken or removed
+since the candidates were read. The whole attempt is then rolled back and
+retried on fresh candidates. Every attempt is one short transaction that
+only touches the claimed rows, so concurrent orders for different coils do
+not wait on each other. On MySQL, InnoDB locks only the unique-index entries
+and the selected stock rows.
+"""
+from bisect import bisect_left
+
+# Slack when comparing weights, so 0.1 + 0.2 covers 0.3
+WEIGHT_EPSILON = 1e-9
+
+AVAILABLE_SAL = 'TRUE'
+
+ALLOCATED = 'allocated'
+UNAVAILABLE = 'unavailable'
+INVALID = 'invalid'
+CONFLICT = 'conflict'
+
+
+class AllocationConflict(Exception):
+    """A chosen coil was claimed by a concurrent allocation; retry on fresh candidates."""
+
+
+def parse_quantity(value):
+    """Float of a dimension or weight such as '1,250' or 2; None if it is not a positive number."""
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 and number != float('inf') else None
+
+
+def best_fit(candidates, required):
+    """Coils covering ``required`` weight, or None if all of them together fall short.
+
+    ``candidates`` are dicts with a ``weight``, sorted lightest first.
+    """
+    if sum(coil['weight'] for coil in candidates) < required - WEIGHT_EPSILON:
+        return None
+
+    pool = list(candidates)
+    weights = [coil['weight'] for coil in pool]
+    chosen = []
+    remaining = required
+    while remaining > WEIGHT_EPSILON:
+        position = bisect_left(weights, remaining - WEIGHT_EPSILON)
+        if position == len(pool):
+            # No single coil covers the rest: take the heaviest and go on
+            position -= 1
+        coil = pool.pop(position)
+        weights.pop(position)
+        chosen.append(coil)
+        remaining -= coil['weight']
+    return chosen
+
+
+def load_candidates(cursor, placeholder, grade, thickness, width, finish=None):
+    """Unreserved available coils of one specification, lightest first."""
+    sql = (
+        "SELECT s.id, s.PKT, s.COILNO, s.pwt_num FROM stock_data s "
+        f"WHERE s.GRD = {placeholder} AND s.thk_num = {placeholder} AND s.widt_num = {placeholder} "
+        f"AND s.SAL = {placeholder} AND s.pwt_num > 0"
+    )
+    params = [grade, thickness, width, AVAILABLE_SAL]
+    if finish:
+        sql += f" AND s.FIN = {placeholder}"
+        params.append(finish)
+    sql += " AND NOT EXISTS (SELECT 1 FROM stock_reservations r WHERE r.stock_id = s.id) ORDER BY s.pwt_num, s.id"
+
+    cursor.execute(sql, params)
+    return [
+        {'stock_id': stock_id, 'PKT': pkt, 'COILNO': coil_no, 'weight': weight}
+        for stock_id, pkt, coil_no, weight in cursor.fetchall()
+    ]
+
+
+def reserve_coils(cursor, placeholder, order_id, coils, created_at):
+    """Claim ``coils`` for ``order_id`` inside the caller's transaction.
+
+    Raises AllocationConflict when a coil is already reserved or no longer
+    available; the caller rolls back.
+    """
+    ignore = 'INSERT OR IGNORE' if placeholder == '?' else 'INSERT IGNORE'
+    sql = (
+        f"{ignore} INTO stock_reservations (stock_id, order_id, weight, created_at) "
+        f"SELECT id, {placeholder}, pwt_num, {placeholder} FROM stock_data "
+        f"WHERE id = {placeholder} AND SAL = {placeholder}"
+    )
+    for coil in coils:
+        cursor.execute(sql, (order_id, created_at, coil['stock_id'], AVAILABLE_SAL))
+        if cursor.rowcount != 1:
+            raise AllocationConflict(coil['stock_id'])
+
+
+def release_reservations(cursor, placeholder, stock_ids=None):
+    """Drop the reservations of removed stock rows (all of them when ``stock_ids`` is None)."""
+    if stock_ids is None:
+        cursor.execute("DELETE FROM stock_reservations")
+        return
+    stock_ids = [int(stock_id) for stock_id in stock_ids]
+    if stock_ids:
+        cursor.execute(
+            f"DELETE FROM stock_reservations WHERE stock_id IN ({', '.join([placeholder] * len(stock_ids))})",
+            stock_ids
+        )
+
+
+def revalidate_reservations(cursor, placeholder, stock_ids):
+    """Bring the reservations of updated stock rows in line with them.
+
+    A coil that is no longer available (SAL or weight changed) is released;
+    one that still is keeps its reservation at its current weight. Call in
+    the updating transaction, after the UPDATE.
+    """
+    stock_ids = [int(stock_id) for stock_id in stock_ids]
+    if not stock_ids:
+        return
+    in_list = ', '.join([placeholder] * len(stock_ids))
+    cursor.execute(
+        f"DELETE FROM stock_reservations WHERE stock_id IN ({in_list}) AND NOT EXISTS ("
+        "SELECT 1 FROM stock_data s WHERE s.id = stock_reservations.stock_id "
+        f"AND s.SAL = {placeholder} AND s.pwt_num > 0)",
+        stock_ids + [AVAILABLE_SAL]
+    )
+    cursor.execute(
+        "UPDATE stock_reservations SET weight = ("
+        "SELECT s.pwt_num FROM stock_data s WHERE s.id = stock_reservations.stock_id"
+        f") WHERE stock_id IN ({in_list})",
+        stock_ids
+    )
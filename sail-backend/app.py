@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
 import sqlite3
 import pandas as pd
@@ -7,85 +7,254 @@ import os
 import json
 import uuid
 import random
+import hmac
+from functools import wraps
+from stock_ingest import DEFAULT_CSV_PATH
+from migrations import run_migrations
+from sqlite_pool import SQLiteConnectionManager
+from group_commit import GroupCommitTimeout, GroupCommitWriter, synchronous_full
+from cache import LRUCache, MISSING
+from export import DEFAULT_EXPORT_CHUNK_SIZE, EXPORT_FORMATS
+from pagination import PaginationError, decode_cursor, page_limit, parse_fields
+from serialization import JSONSerializer
+from etags import ALL_ORDERS_SCOPE, make_etag, not_modified, set_validators
+from metrics import RequestMetrics
+from slow_queries import SlowQueryLog
+from profiling import RequestProfiler
+from repositories import AllocationsRepo, OrdersRepo, SQLiteDriver, StockRepo
+from stock_search import StockFilterError, filters_key, parse_stock_filters
+from stock_snapshot import StockSnapshotStore
+from stock_summary import SUMMARY_KEY, summary_totals
+from shared_snapshot import SharedStockSnapshotStore
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
 
 # SQLite database path
-DB_PATH = 'sail.db'
+DB_PATH = os.environ.get('SQLITE_DB_PATH', 'sail.db')
+
+# Per-thread connection settings
+db_manager = SQLiteConnectionManager(
+    DB_PATH,
+    journal_mode=os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    synchronous=os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    cache_size=int(os.environ.get('SQLITE_CACHE_SIZE', -65536)),  # negative = KiB
+    mmap_size=int(os.environ.get('SQLITE_MMAP_SIZE', 268435456)),
+    busy_timeout_ms=int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    busy_retries=int(os.environ.get('SQLITE_BUSY_RETRIES', 5)),
+)
+
+# Data access for every route goes through the repositories
+db = SQLiteDriver(db_manager.get_connection)
+orders_repo = OrdersRepo(db)
+stock_repo = StockRepo(db)
+allocations_repo = AllocationsRepo(db)
+
+# Reserve best-fit coils for every new order (see allocation.py)
+ORDER_ALLOCATION = os.environ.get('ORDER_ALLOCATION', 'true').lower() in ('1', 'true', 'yes')
+
+# /api/stock/check responses, keyed on the parsed filters and tagged with the
+# stock_version they were computed at
+stock_query_cache = LRUCache(
+    maxsize=int(os.environ.get('STOCK_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('STOCK_CACHE_TTL', 300)),
+)
+
+# Optional in-process columnar copy of stock_data (STOCK_SNAPSHOT=true).
+# /api/stock/check filters it with NumPy masks instead of querying SQL; it
+# is rebuilt in the background whenever stock_version moves. With
+# STOCK_SNAPSHOT_DIR set (e.g. /dev/shm/sail-stock), each generation is
+# published there once and memory-mapped by every worker process. The
+# store is created once init_database() below has migrated the schema
+stock_snapshots = None
+
+# Stock export loaded into an empty stock_data table on startup
+STOCK_CSV_PATH = os.environ.get('STOCK_CSV_PATH', DEFAULT_CSV_PATH)
+
+# JSON encoding and Accept-Encoding negotiated compression of read responses
+serializer = JSONSerializer(
+    encoder=os.environ.get('JSON_ENCODER', 'auto'),
+    compress_min_bytes=int(os.environ.get('COMPRESS_MIN_BYTES', 1024)),
+    compress_level=int(os.environ.get('COMPRESS_LEVEL', 1)),
+)
+
+# Rows read per fetchmany() by the streaming export endpoints
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', DEFAULT_EXPORT_CHUNK_SIZE))
 
 # Initialize database tables
 def init_database():
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Create orders table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS orders (
-                id TEXT PRIMARY KEY,
-                user_id TEXT NOT NULL,
-                grade TEXT NOT NULL,
-                thickness TEXT NOT NULL,
-                width TEXT NOT NULL,
-                length TEXT,
-                finish TEXT,
-                quality TEXT,
-                edge TEXT,
-                b_quantity TEXT,
-                customer TEXT NOT NULL,
-                ssp_ro_id TEXT,
-                release_date TEXT,
-                required_quantity TEXT NOT NULL,
-                mou TEXT,
-                remarks TEXT,
-                delivery_days INTEGER NOT NULL,
-                expected_delivery_date TEXT,
-                status TEXT DEFAULT 'Processing',
-                created_at TEXT NOT NULL,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create stock_data table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS stock_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                TYP TEXT,
-                DTP TEXT,
-                PKT TEXT,
-                GRD TEXT,
-                FIN TEXT,
-                THK TEXT,
-                WIDT TEXT,
-                LNGT TEXT,
-                PWT TEXT,
-                QTY TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        conn.commit()
-        print("Database tables initialized successfully")
+        with db.connection() as conn:
+            # Create or upgrade the schema to the latest version
+            run_migrations(conn, 'sqlite')
+            
+            print("Database tables initialized successfully")
+            
+            # Load the stock export if stock_data is empty
+            if stock_repo.is_empty(conn) and os.path.exists(STOCK_CSV_PATH):
+                loaded = stock_repo.bulk_load(STOCK_CSV_PATH, conn)
+                print(f"Loaded {loaded} stock rows from {STOCK_CSV_PATH}")
     except Exception as e:
         print(f"Error initializing database: {e}")
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 # Initialize database on startup
 init_database()
+if os.environ.get('STOCK_SNAPSHOT', '').lower() in ('1', 'true', 'yes'):
+    if os.environ.get('STOCK_SNAPSHOT_DIR'):
+        # Generations are filed under the database's id, set by the migrations
+        stock_snapshots = SharedStockSnapshotStore(
+            stock_repo.snapshot, os.environ['STOCK_SNAPSHOT_DIR'], database_id=stock_repo.database_id()
+        )
+    else:
+        stock_snapshots = StockSnapshotStore(stock_repo.snapshot)
+if stock_snapshots and stock_snapshots.snapshot is None:
+    stock_snapshots.refresh(wait=True)
 
-# Helper function to get a connection
+# Helper function to get the calling thread's connection; close() hands it back
 def get_db_connection():
     try:
-        return sqlite3.connect(DB_PATH)
+        return db_manager.get_connection()
     except Exception as e:
         print(f"Error getting database connection: {e}")
         return None
 
+# Fields every order payload must carry
+ORDER_REQUIRED_FIELDS = ['grade', 'thickness', 'width', 'customer', 'required_quantity', 'delivery_days']
+
+# Upper bound on orders accepted by one /api/orders/batch call
+MAX_BATCH_ORDERS = int(os.environ.get('MAX_BATCH_ORDERS', 500))
+
+# First problem with an order payload's required fields, or None. Their
+# columns are NOT NULL text, so each must be a string or a number
+def order_field_error(data):
+    for field in ORDER_REQUIRED_FIELDS:
+        if field not in data:
+            return f"Missing required field: {field}"
+        value = data[field]
+        if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+            return f"Field {field} must be a string or a number"
+    return None
+
+# OrdersRepo insert values for an order payload
+def build_order_params(order_id, data, expected_delivery_date):
+    return (
+        order_id, 
+        "anonymous", # Default user_id for anonymous users
+        data.get('grade'),
+        data.get('thickness'),
+        data.get('width'),
+        data.get('length'),
+        data.get('finish'),
+        data.get('quality'),
+        data.get('edge'),
+        data.get('b_quantity'),
+        data.get('customer'),
+        data.get('ssp_ro_id'),
+        data.get('release_date'),
+        data.get('required_quantity'),
+        data.get('mou'),
+        data.get('remarks'),
+        data.get('delivery_days'),
+        expected_delivery_date.strftime('%Y-%m-%d %H:%M:%S'),
+        'Processing',
+        get_current_timestamp()
+    )
+
+# Reserve coils for a created order; the order stands even if this fails
+def allocate_order(order_id, data):
+    try:
+        return allocations_repo.allocate(
+            order_id,
+            data.get('grade'),
+            data.get('thickness'),
+            data.get('width'),
+            data.get('finish'),
+            data.get('required_quantity'),
+            get_current_timestamp(),
+        )
+    except Exception as e:
+        print(f"Allocation error for order {order_id}: {e}")
+        return {"status": "error", "coils": []}
+
+# Orders changed: bump the version behind the /api/orders ETags (call
+# inside the inserting transaction). Every order is listed in the one
+# ALL_ORDERS_SCOPE, so which rows changed does not matter
+def bump_orders_version(cursor):
+    orders_repo.bump_versions(cursor, [ALL_ORDERS_SCOPE])
+
+# Optional group commit: one writer thread batches order inserts into a
+# single transaction instead of one commit per request. Its connection runs
+# with synchronous=FULL, so an acknowledged order survives a power loss.
+order_writer = None
+ORDER_GROUP_COMMIT_TIMEOUT = float(os.environ.get('ORDER_GROUP_COMMIT_TIMEOUT', 10))
+if os.environ.get('ORDER_GROUP_COMMIT', '').lower() in ('1', 'true', 'yes'):
+    order_writer = GroupCommitWriter(
+        synchronous_full(get_db_connection),
+        orders_repo.insert_sql,
+        max_batch=int(os.environ.get('ORDER_GROUP_COMMIT_MAX_BATCH', 100)),
+        max_delay_ms=float(os.environ.get('ORDER_GROUP_COMMIT_DELAY_MS', 5)),
+        name='order-writer',
+        on_batch=lambda cursor, order_rows: bump_orders_version(cursor),
+    ).start()
+
+# Per-route latency, DB and serialization time, pool and cache counters,
+# exposed to admins at GET /metrics
+request_metrics = RequestMetrics().init_app(app, path=None).instrument(db, serializer)
+request_metrics.register_cache('stock_query', stock_query_cache)
+request_metrics.register_stats('db_pool', db_manager.stats)
+request_metrics.register_stats('allocation', allocations_repo.stats, counters=('conflicts',))
+if stock_snapshots:
+    request_metrics.register_stats('stock_snapshot', stock_snapshots.stats, counters=('builds', 'hits', 'misses', 'errors', 'attaches', 'publishes'))
+if order_writer:
+    request_metrics.register_stats('order_writer', order_writer.stats, counters=('batches', 'rows', 'timeouts'))
+
+# Statements slower than SLOW_QUERY_MS are logged, with their plan captured
+# the first time each query shape is seen
+slow_query_log = None
+if os.environ.get('SLOW_QUERY_LOG', 'true').lower() in ('1', 'true', 'yes'):
+    slow_query_log = SlowQueryLog(
+        'sqlite',
+        threshold_ms=float(os.environ.get('SLOW_QUERY_MS', 100)),
+        max_shapes=int(os.environ.get('SLOW_QUERY_MAX_SHAPES', 500)),
+    )
+    db.observers.append(slow_query_log.observe)
+    request_metrics.register_stats('slow_queries', slow_query_log.stats, counters=('slow', 'dropped'))
+
+# Admin endpoints require the X-Admin-Token header to match ADMIN_TOKEN and
+# are disabled when it is not set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+def is_admin_request():
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN)
+
+def admin_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"error": "Not found"}), 404
+        if not is_admin_request():
+            return jsonify({"error": "Admin token is missing or invalid"}), 403
+        return f(*args, **kwargs)
+    
+    return decorated
+
+# Opt-in request profiling (PROFILING=true): requests sent with an X-Profile
+# header and the admin token, or sampled at PROFILE_SAMPLE_RATE, run under
+# cProfile; profiles are aggregated per route in PROFILE_DIR
+request_profiler = None
+if os.environ.get('PROFILING', '').lower() in ('1', 'true', 'yes'):
+    request_profiler = RequestProfiler(
+        os.environ.get('PROFILE_DIR', 'profiles'),
+        sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', 0)),
+        authorize=is_admin_request,
+    ).init_app(app)
+
+# Chunked response streaming an export generator's NDJSON or CSV blocks
+def export_response(rows, export_format, filename):
+    response = Response(stream_with_context(rows), mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
 # Helper function to generate a unique ID
 def generate_id():
     return str(uuid.uuid4())
@@ -98,28 +267,44 @@ def get_current_timestamp():
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
-            
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM orders ORDER BY created_at DESC")
-        orders = cursor.fetchall()
+        # Keyset pagination: ?limit=&cursor= and an optional ?fields= projection
+        try:
+            fields = parse_fields(request.args.get('fields'))
+            cursor_key = decode_cursor(request.args.get('cursor'))
+            # Neither limit nor cursor: the whole listing, as before paging
+            limit = page_limit(request.args.get('limit'), cursor_key)
+        except PaginationError as e:
+            return jsonify({"error": str(e)}), 400
         
-        # Convert to list of dictionaries
-        columns = [description[0] for description in cursor.description]
-        orders_list = []
-        for order in orders:
-            orders_list.append(dict(zip(columns, order)))
+        with db.connection() as conn:
+            # Unchanged since the client's copy: answer 304 without reading orders
+            version, version_updated_at = orders_repo.version(ALL_ORDERS_SCOPE, conn)
+            etag = make_etag(ALL_ORDERS_SCOPE, version, version_updated_at, request.query_string.decode())
+            unchanged = not_modified(etag, version_updated_at)
+            if unchanged:
+                return unchanged
+            
+            orders, page_cursor = orders_repo.page(fields, limit, cursor_key, conn=conn)
         
-        return jsonify(orders_list)
+        response = set_validators(serializer.response(orders), etag, version_updated_at)
+        if page_cursor:
+            response.headers['X-Next-Cursor'] = page_cursor
+        return response
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+
+@app.route('/api/orders/export', methods=['GET'])
+def export_orders():
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+        fields = parse_fields(request.args.get('fields'))
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    rows = orders_repo.export(fields, export_format, EXPORT_CHUNK_SIZE)
+    return export_response(rows, export_format, 'orders')
 
 @app.route('/api/orders', methods=['POST'])
 def create_order():
@@ -127,10 +312,9 @@ def create_order():
         data = request.json
         
         # Validate required fields
-        required_fields = ['grade', 'thickness', 'width', 'customer', 'required_quantity', 'delivery_days']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({"error": f"Missing required field: {field}"}), 400
+        error = order_field_error(data)
+        if error:
+            return jsonify({"error": error}), 400
         
         # Generate a unique ID for the order
         order_id = generate_id()
@@ -139,136 +323,245 @@ def create_order():
         delivery_days = int(data.get('delivery_days', 0))
         expected_delivery_date = datetime.now() + timedelta(days=delivery_days)
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
+        order_params = build_order_params(order_id, data, expected_delivery_date)
+        
+        if order_writer:
+            # Wait until the writer thread has committed this order
+            try:
+                order_writer.write(order_params, ORDER_GROUP_COMMIT_TIMEOUT)
+            except GroupCommitTimeout as e:
+                return jsonify({"error": str(e)}), 503
+        else:
+            # Insert the order into the database
+            orders_repo.insert([order_params], [ALL_ORDERS_SCOPE])
+        
+        response = {
+            "message": "Order created successfully",
+            "order_id": order_id
+        }
+        if ORDER_ALLOCATION:
+            response["allocation"] = allocate_order(order_id, data)
+        return jsonify(response), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/orders/batch', methods=['POST'])
+def create_orders_batch():
+    try:
+        data = request.json
+        orders = data.get('orders') if isinstance(data, dict) else data
+        
+        if not isinstance(orders, list) or not orders:
+            return jsonify({"error": "A non-empty list of orders is required"}), 400
+        if len(orders) > MAX_BATCH_ORDERS:
+            return jsonify({"error": f"At most {MAX_BATCH_ORDERS} orders can be submitted per batch"}), 413
+        
+        results = [None] * len(orders)
+        valid = []
+        order_rows = []
+        
+        # Validate every order with the same rules as create_order
+        for index, order in enumerate(orders):
+            if not isinstance(order, dict):
+                results[index] = {"index": index, "status": "error", "error": "Order must be an object"}
+                continue
+            
+            error = order_field_error(order)
+            if error:
+                results[index] = {"index": index, "status": "error", "error": error}
+                continue
             
-        cursor = conn.cursor()
+            try:
+                delivery_days = int(order.get('delivery_days', 0))
+            except (TypeError, ValueError):
+                results[index] = {"index": index, "status": "error", "error": "delivery_days must be an integer"}
+                continue
+            
+            order_id = generate_id()
+            expected_delivery_date = datetime.now() + timedelta(days=delivery_days)
+            order_rows.append(build_order_params(order_id, order, expected_delivery_date))
+            valid.append(index)
+            results[index] = {"index": index, "status": "created", "order_id": order_id}
         
-        # Insert the order into the database
-        cursor.execute("""
-            INSERT INTO orders (
-                id, user_id, grade, thickness, width, length, finish, quality, 
-                edge, b_quantity, customer, ssp_ro_id, release_date, required_quantity, 
-                mou, remarks, delivery_days, expected_delivery_date, status, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            order_id, 
-            "anonymous", # Default user_id for anonymous users
-            data.get('grade'),
-            data.get('thickness'),
-            data.get('width'),
-            data.get('length'),
-            data.get('finish'),
-            data.get('quality'),
-            data.get('edge'),
-            data.get('b_quantity'),
-            data.get('customer'),
-            data.get('ssp_ro_id'),
-            data.get('release_date'),
-            data.get('required_quantity'),
-            data.get('mou'),
-            data.get('remarks'),
-            data.get('delivery_days'),
-            expected_delivery_date.strftime('%Y-%m-%d %H:%M:%S'),
-            'Processing',
-            get_current_timestamp()
-        ))
+        if order_rows:
+            # Insert all valid orders in one transaction; if that fails, each
+            # in its own, so only the orders the database rejects fail
+            errors = orders_repo.insert_each(order_rows, lambda rows: [ALL_ORDERS_SCOPE])
+            for index, error in zip(valid, errors):
+                if error is not None:
+                    results[index] = {"index": index, "status": "error", "error": str(error)}
+            valid = [index for index, error in zip(valid, errors) if error is None]
+        
+        if ORDER_ALLOCATION:
+            # Each order is allocated in its own short transaction
+            for index in valid:
+                results[index]["allocation"] = allocate_order(results[index]["order_id"], orders[index])
         
-        conn.commit()
+        created = len(valid)
+        failed = len(orders) - created
+        status_code = 201 if failed == 0 else 207 if created else 400
         
         return jsonify({
-            "message": "Order created successfully",
-            "order_id": order_id
-        }), 201
+            "message": f"{created} orders created, {failed} failed",
+            "created": created,
+            "failed": failed,
+            "results": results
+        }), status_code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 @app.route('/api/orders/<order_id>', methods=['GET'])
 def get_order(order_id):
     try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
+        with db.connection() as conn:
+            # Revalidation only needs the order's updated_at
+            if request.if_none_match or request.if_modified_since:
+                updated_at = orders_repo.updated_at(order_id, conn=conn)
+                if updated_at:
+                    unchanged = not_modified(make_etag(order_id, updated_at), updated_at)
+                    if unchanged:
+                        return unchanged
             
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
-        order = cursor.fetchone()
+            order = orders_repo.get(order_id, conn=conn)
         
         if not order:
             return jsonify({"error": "Order not found"}), 404
-            
-        # Convert to dictionary
-        columns = [description[0] for description in cursor.description]
-        order_dict = dict(zip(columns, order))
         
-        return jsonify(order_dict)
+        return set_validators(serializer.response(order), make_etag(order_id, order['updated_at']), order['updated_at'])
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/orders/<order_id>/allocation', methods=['GET'])
+def get_order_allocation(order_id):
+    try:
+        with db.connection() as conn:
+            if not orders_repo.get(order_id, conn=conn):
+                return jsonify({"error": "Order not found"}), 404
+            coils = allocations_repo.for_order(order_id, conn)
+        
+        return serializer.response({
+            "order_id": order_id,
+            "allocated": round(sum(coil['weight'] for coil in coils), 3),
+            "coils": coils
+        })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
 
 @app.route('/api/stock/check', methods=['GET'])
 def check_stock():
     try:
-        # Get query parameters
-        grade = request.args.get('grade')
-        thickness = request.args.get('thickness')
-        width = request.args.get('width')
-        length = request.args.get('length')
-        finish = request.args.get('finish')
+        # Exact, range (thk_min=...) and tolerance (thk_tol=...) filters
+        try:
+            filters = parse_stock_filters(request.args)
+        except StockFilterError as e:
+            return jsonify({"error": str(e)}), 400
         
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({"error": "Database connection failed"}), 500
+        with db.connection() as conn:
+            # Serve repeated filter combinations from the cache until stock changes
+            cache_key = filters_key(filters)
+            stock_version = stock_repo.version(conn)
+            etag = make_etag('stock', stock_version, *cache_key)
+            unchanged = not_modified(etag)
+            if unchanged:
+                return unchanged
+            cached = stock_query_cache.get(cache_key, stock_version)
+            if cached is not MISSING:
+                return set_validators(serializer.body_response(cached), etag)
             
-        cursor = conn.cursor()
+            # Only the provided parameters filter the query. A current
+            # snapshot answers in memory; SQL does while it is rebuilt
+            snapshot = stock_snapshots.get(stock_version) if stock_snapshots else None
+            if snapshot is not None:
+                stock_list = snapshot.search(filters)
+            else:
+                stock_list = stock_repo.search(filters, conn)
         
-        # Build the query based on provided parameters
-        query = "SELECT * FROM stock_data WHERE 1=1"
-        params = []
-        
-        if grade:
-            query += " AND GRD = ?"
-            params.append(grade)
-        if thickness:
-            query += " AND THK = ?"
-            params.append(thickness)
-        if width:
-            query += " AND WIDT = ?"
-            params.append(width)
-        if length:
-            query += " AND LNGT = ?"
-            params.append(length)
-        if finish:
-            query += " AND FIN = ?"
-            params.append(finish)
-            
-        cursor.execute(query, params)
-        stock_data = cursor.fetchall()
-        
-        # Convert to list of dictionaries
-        columns = [description[0] for description in cursor.description]
-        stock_list = []
-        for stock in stock_data:
-            stock_list.append(dict(zip(columns, stock)))
-        
-        return jsonify(stock_list)
+        # Cache the encoded body; compression is negotiated per request
+        body = serializer.dumps(stock_list)
+        stock_query_cache.set(cache_key, body, stock_version)
+        return set_validators(serializer.body_response(body), etag)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/stock/summary', methods=['GET'])
+def get_stock_summary():
+    try:
+        # Reads the maintained stock_summary table, never stock_data;
+        # ?grade=&finish=&thk_band=&sal_category= narrow the groups
+        groups = stock_repo.summary({column: request.args.get(column) for column in SUMMARY_KEY})
+        return serializer.response({"groups": groups, "totals": summary_totals(groups)})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+
+@app.route('/api/stock/export', methods=['GET'])
+def export_stock():
+    export_format = request.args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    # Same column layout as the stock export CSV loaded by bulk_load_stock
+    rows = stock_repo.export(export_format, EXPORT_CHUNK_SIZE)
+    return export_response(rows, export_format, 'stock')
+
+# Prometheus scrapes send the admin token as an X-Admin-Token header
+@app.route('/metrics', methods=['GET'])
+@admin_required
+def get_metrics():
+    return request_metrics.metrics_view()
+
+@app.route('/api/admin/slow-queries', methods=['GET', 'DELETE'])
+@admin_required
+def slow_queries():
+    if not slow_query_log:
+        return jsonify({"error": "Slow query log is disabled"}), 404
+    
+    if request.method == 'DELETE':
+        slow_query_log.clear()
+        return jsonify({"message": "Slow query log cleared"})
+    
+    return serializer.response(slow_query_log.report())
+
+@app.route('/api/admin/profiles', methods=['GET', 'DELETE'])
+@admin_required
+def list_profiles():
+    if not request_profiler:
+        return jsonify({"error": "Profiling is disabled"}), 404
+    
+    if request.method == 'DELETE':
+        request_profiler.clear()
+        return jsonify({"message": "Profiles cleared"})
+    
+    return jsonify({"profiles": request_profiler.profiles(), **request_profiler.stats()})
+
+@app.route('/api/admin/profiles/<route>', methods=['GET'])
+@admin_required
+def get_profile_report(route):
+    if not request_profiler:
+        return jsonify({"error": "Profiling is disabled"}), 404
+    
+    try:
+        path = request_profiler.path(route)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not os.path.exists(path):
+        return jsonify({"error": "No profile for this route"}), 404
+    
+    # ?format=pstats downloads the aggregated pstats file
+    if request.args.get('format') == 'pstats':
+        return send_file(os.path.abspath(path), as_attachment=True, download_name=os.path.basename(path))
+    # ?format=collapsed gives collapsed stacks for flamegraph.pl or speedscope
+    if request.args.get('format') == 'collapsed':
+        return Response(request_profiler.collapsed(route), mimetype='text/plain')
+    
+    try:
+        report = request_profiler.report(
+            route,
+            sort=request.args.get('sort', 'cumulative'),
+            limit=int(request.args.get('limit', 50)),
+        )
+    except (KeyError, ValueError) as e:
+        return jsonify({"error": f"Invalid sort or limit: {e}"}), 400
+    return Response(report, mimetype='text/plain')
 
 if __name__ == '__main__':
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,126 @@
+"""Query plans and latency of the hot queries before and after the index migration.
+
+Builds a throwaway SQLite database at schema version 2 (no secondary
+indexes), fills it with synthetic stock and orders, times the check_stock
+and get_orders queries, applies the remaining migrations and times them
+again.
+
+    python benchmarks/bench_indexes.py --stock-rows 200000 --orders 100000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from migrations import run_migrations  # noqa: E402
+from stock_ingest import STOCK_COLUMNS  # noqa: E402
+
+GRADES = ['201', '202', '204CU', '304', '304L', '316', '316L', '409', '410', '430']
+FINISHES = ['2D', '2B', 'BA', 'NO1', 'HRAP']
+THICKNESSES = ['0.3', '0.4', '0.5', '0.8', '1', '1.2', '1.5', '2', '3', '4']
+WIDTHS = ['1000', '1219', '1240', '1250', '1500']
+SAL_VALUES = ['TRUE', 'HRC HRM', 'HRCS', 'REMOTE HRC', 'HRC CRM', 'SLAB STK', 'PACKET OPEN WIP']
+
+QUERIES = {
+    'check_stock': (
+        "SELECT * FROM stock_data WHERE 1=1 AND GRD = ? AND THK = ? AND WIDT = ? AND FIN = ?",
+        ('316', '2', '1250', '2D'),
+    ),
+    'check_stock (grade only)': (
+        "SELECT * FROM stock_data WHERE 1=1 AND GRD = ?",
+        ('410',),
+    ),
+    'get_orders (per user)': (
+        "SELECT * FROM orders WHERE user_id = ? ORDER BY created_at DESC",
+        ('user-7',),
+    ),
+    'get_orders (all)': (
+        "SELECT * FROM orders ORDER BY created_at DESC LIMIT 50",
+        (),
+    ),
+}
+
+
+def populate(conn, stock_rows, order_rows, users):
+    rng = np.random.default_rng(42)
+    stock = pd.DataFrame({column: '' for column in STOCK_COLUMNS}, index=range(stock_rows))
+    stock['TYP'] = 'C'
+    stock['PKT'] = [f'PK{i}' for i in range(stock_rows)]
+    stock['COILNO'] = [f'CO{i}' for i in range(stock_rows)]
+    stock['GRD'] = rng.choice(GRADES, stock_rows)
+    stock['FIN'] = rng.choice(FINISHES, stock_rows)
+    stock['THK'] = rng.choice(THICKNESSES, stock_rows)
+    stock['WIDT'] = rng.choice(WIDTHS, stock_rows)
+    stock['PWT'] = rng.uniform(0.2, 25, stock_rows).round(3).astype(str)
+    stock['SAL'] = rng.choice(SAL_VALUES, stock_rows)
+
+    # Plain inserts of the export columns: insert_stock_frame also writes
+    # columns and tables of later migrations, which the backfills of those
+    # migrations fill in here
+    cursor = conn.cursor()
+    cursor.executemany(
+        f"INSERT INTO stock_data ({', '.join(STOCK_COLUMNS)}) VALUES ({', '.join(['?'] * len(STOCK_COLUMNS))})",
+        stock.to_numpy(dtype=object).tolist()
+    )
+
+    created = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, order_rows), unit='s')
+    cursor.executemany(
+        "INSERT INTO orders (id, user_id, grade, thickness, width, customer, required_quantity, delivery_days, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (f'order-{i}', f'user-{i % users}', '316', '2', '1250', 'ACME', '10', 30, ts.strftime('%Y-%m-%d %H:%M:%S'))
+            for i, ts in enumerate(created)
+        ]
+    )
+    conn.commit()
+    cursor.close()
+
+
+def measure(conn, repeat):
+    results = {}
+    for name, (sql, params) in QUERIES.items():
+        plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stock-rows', type=int, default=200000)
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        run_migrations(conn, 'sqlite', target=2)
+        populate(conn, args.stock_rows, args.orders, args.users)
+        before = measure(conn, args.repeat)
+
+        run_migrations(conn, 'sqlite')
+        conn.execute("ANALYZE")
+        after = measure(conn, args.repeat)
+        conn.close()
+
+    for name in QUERIES:
+        print(f"\n{name}")
+        for label, (plan, median_ms) in (('before', before[name]), ('after', after[name])):
+            print(f"  {label:<6} {median_ms:9.3f} ms  | {' / '.join(plan)}")
+        print(f"  speedup {before[name][1] / after[name][1]:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
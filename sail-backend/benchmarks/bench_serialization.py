@@ -0,0 +1,113 @@
+"""Throughput of a 10k-row get_orders response, old path vs the serialization layer.
+
+Fills a throwaway SQLite database with synthetic orders and times building
+the full response body:
+
+* baseline: dict(zip(columns, row)) per row, then Flask's jsonify
+* layout + json: RowLayout row factory, standard-library encoder
+* layout + orjson: RowLayout row factory, orjson (if installed)
+* ... + gzip: the same with gzip negotiated through Accept-Encoding
+
+    python benchmarks/bench_serialization.py --orders 10000 --repeat 20
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from flask import Flask, jsonify
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from migrations import run_migrations  # noqa: E402
+from serialization import ENCODERS, JSONSerializer, use_layout  # noqa: E402
+
+QUERY = "SELECT * FROM orders ORDER BY created_at DESC"
+
+
+def populate(conn, order_rows):
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(order_rows):
+        created_at = start + timedelta(minutes=i)
+        rows.append((
+            str(uuid.uuid4()), f'user-{i % 50}', '316L', '1.5', '1250', '2500', '2B', 'S', 'M', '10',
+            f'Customer {i % 200}', f'SSP{i}', '2024-02-01', '12.5', 'MT', 'Urgent order',
+            45, (created_at + timedelta(days=45)).strftime('%Y-%m-%d %H:%M:%S'), 'Processing',
+            created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        ))
+    conn.executemany(
+        "INSERT INTO orders (id, user_id, grade, thickness, width, length, finish, quality, edge, "
+        "b_quantity, customer, ssp_ro_id, release_date, required_quantity, mou, remarks, delivery_days, "
+        "expected_delivery_date, status, created_at) VALUES (" + ', '.join(['?'] * 20) + ")",
+        rows
+    )
+    conn.commit()
+
+
+def baseline(conn):
+    cursor = conn.cursor()
+    cursor.execute(QUERY)
+    orders = cursor.fetchall()
+    columns = [description[0] for description in cursor.description]
+    orders_list = []
+    for order in orders:
+        orders_list.append(dict(zip(columns, order)))
+    return jsonify(orders_list).get_data()
+
+
+def layout_path(serializer):
+    def run(conn):
+        cursor = conn.cursor()
+        cursor.execute(QUERY)
+        use_layout(cursor)
+        return serializer.response(cursor.fetchall()).get_data()
+    return run
+
+
+def measure(app, conn, run, repeat, headers):
+    timings = []
+    with app.test_request_context(headers=headers):
+        size = len(run(conn))
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(conn)
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, 'bench.db'))
+        run_migrations(conn, 'sqlite')
+        populate(conn, args.orders)
+
+        cases = [('baseline (dict(zip) + jsonify)', baseline, {})]
+        for name in ENCODERS:
+            plain = JSONSerializer(encoder=name, compress_min_bytes=None)
+            compressed = JSONSerializer(encoder=name)
+            cases.append((f'layout + {name}', layout_path(plain), {}))
+            cases.append((f'layout + {name} + gzip', layout_path(compressed), {'Accept-Encoding': 'gzip'}))
+
+        base_seconds = None
+        print(f"{args.orders} orders, median of {args.repeat} runs")
+        for name, run, headers in cases:
+            seconds, size = measure(app, conn, run, args.repeat, headers)
+            base_seconds = base_seconds or seconds
+            print(f"  {name:34s} {seconds * 1000:8.1f} ms  {1 / seconds:7.1f} resp/s  "
+                  f"{size / 1024:8.0f} KiB  x{base_seconds / seconds:.2f}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
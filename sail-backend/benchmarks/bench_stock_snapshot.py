@@ -0,0 +1,106 @@
+"""/api/stock/check searches: SQL vs the columnar StockSnapshot.
+
+Fills a throwaway SQLite database (latest schema, all indexes) with
+synthetic stock, builds a StockSnapshot from it, and times each search
+through StockRepo.search (SQL, rows to dicts) and StockSnapshot.search
+(NumPy masks, matching rows to dicts). Both return the same rows.
+
+    python benchmarks/bench_stock_snapshot.py --stock-rows 1000000 --repeat 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from migrations import run_migrations  # noqa: E402
+from repositories import SQLiteDriver, StockRepo  # noqa: E402
+from sqlite_pool import SQLiteConnectionManager  # noqa: E402
+from stock_ingest import STOCK_COLUMNS, insert_stock_frame  # noqa: E402
+from stock_search import parse_stock_filters  # noqa: E402
+
+GRADES = ['201', '202', '204CU', '304', '304L', '316', '316L', '409', '410', '430']
+FINISHES = ['2D', '2B', 'BA', 'NO1', 'HRAP']
+QUALITIES = ['S', 'M', 'R']
+EDGES = ['M', 'T']
+THICKNESSES = ['0.3', '0.4', '0.5', '0.8', '1', '1.2', '1.5', '2', '3', '4']
+WIDTHS = ['1000', '1219', '1240', '1250', '1500']
+SAL_VALUES = ['TRUE', 'HRC HRM', 'HRCS', 'REMOTE HRC', 'HRC CRM', 'SLAB STK', 'PACKET OPEN WIP']
+
+SEARCHES = {
+    'exact (grade, thickness, width, finish)': {'grade': '316', 'thickness': '2', 'width': '1250', 'finish': '2D'},
+    'grade only': {'grade': '410'},
+    'thickness tolerance + width range': {'thickness': '1.2', 'thk_tol': '0.2', 'width_min': '1219', 'width_max': '1250'},
+    'grade + pwt range (unindexed)': {'grade': '304', 'pwt_min': '20', 'pwt_max': '21'},
+}
+
+
+def populate(conn, stock_rows):
+    rng = np.random.default_rng(42)
+    stock = pd.DataFrame({column: '' for column in STOCK_COLUMNS}, index=range(stock_rows))
+    stock['TYP'] = 'C'
+    stock['PKT'] = [f'PK{i}' for i in range(stock_rows)]
+    stock['COILNO'] = [f'CO{i}' for i in range(stock_rows)]
+    stock['GRD'] = rng.choice(GRADES, stock_rows)
+    stock['FIN'] = rng.choice(FINISHES, stock_rows)
+    stock['QLY'] = rng.choice(QUALITIES, stock_rows)
+    stock['EDGE'] = rng.choice(EDGES, stock_rows)
+    stock['THK'] = rng.choice(THICKNESSES, stock_rows)
+    stock['WIDT'] = rng.choice(WIDTHS, stock_rows)
+    stock['PWT'] = rng.uniform(0.2, 25, stock_rows).round(3).astype(str)
+    stock['SAL'] = rng.choice(SAL_VALUES, stock_rows)
+
+    cursor = conn.cursor()
+    insert_stock_frame(cursor, stock)
+    cursor.execute("UPDATE stock_meta SET value = value + 1 WHERE name = 'stock_version'")
+    conn.commit()
+    cursor.close()
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stock-rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = SQLiteConnectionManager(os.path.join(tmp, 'bench.db'))
+        conn = manager.get_connection()
+        run_migrations(conn, 'sqlite')
+        populate(conn, args.stock_rows)
+        conn.execute("ANALYZE")
+        conn.close()
+
+        stock_repo = StockRepo(SQLiteDriver(manager.get_connection))
+        started = time.perf_counter()
+        snapshot = stock_repo.snapshot()
+        print(f"{snapshot.rows} rows, snapshot built in {time.perf_counter() - started:.2f}s, "
+              f"{snapshot.nbytes / 2 ** 20:.1f} MiB")
+
+        for name, search_args in SEARCHES.items():
+            filters = parse_stock_filters(search_args)
+            sql_rows, sql_ms = timed(lambda: stock_repo.search(filters), args.repeat)
+            snapshot_rows, snapshot_ms = timed(lambda: snapshot.search(filters), args.repeat)
+            # Without a tolerance the SQL order follows whichever index it used
+            same = sorted(sql_rows, key=lambda row: row['id']) == sorted(snapshot_rows, key=lambda row: row['id'])
+            print(f"\n{name}: {len(sql_rows)} rows{'' if same else ' (RESULTS DIFFER)'}")
+            print(f"  sql      {sql_ms:9.3f} ms")
+            print(f"  snapshot {snapshot_ms:9.3f} ms  ({sql_ms / snapshot_ms:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Conditional GET support: order version counters and ETag validators.
+
+Every write to orders bumps a counter in order_versions inside the same
+transaction, per scope: a user id in the MySQL backend, ALL_ORDERS_SCOPE in
+the SQLite backend, whose listing is not per user. A list ETag is derived
+from the scope's (version, updated_at) and the query string, so answering
+a matching If-None-Match only costs a primary-key read of order_versions:
+no rows are queried or serialized.
+
+ETags are strong, so the gzip and deflate encodings of a body each get
+their own: set_validators suffixes the ETag with the Content-Encoding
+(``"<hash>-gzip"``), and not_modified accepts every suffixed form.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+from werkzeug.http import is_resource_modified
+
+from serialization import COMPRESSIBLE_ENCODINGS
+
+ALL_ORDERS_SCOPE = '*'
+
+
+def bump_order_version(cursor, scope, placeholder='?'):
+    """Increment ``scope``'s order version inside the caller's transaction."""
+    if placeholder == '?':
+        upsert = ("ON CONFLICT (scope) DO UPDATE SET version = version + 1, "
+                  "updated_at = CURRENT_TIMESTAMP")
+    else:
+        upsert = "ON DUPLICATE KEY UPDATE version = version + 1, updated_at = CURRENT_TIMESTAMP"
+    cursor.execute(
+        f"INSERT INTO order_versions (scope, version, updated_at) VALUES ({placeholder}, 1, CURRENT_TIMESTAMP) {upsert}",
+        (scope,)
+    )
+
+
+def bump_order_versions(cursor, scopes, placeholder='?'):
+    for scope in sorted(set(scopes)):
+        bump_order_version(cursor, scope, placeholder)
+
+
+def to_datetime(value):
+    """UTC datetime for a DATETIME/TEXT timestamp column value (or None)."""
+    if value is None or isinstance(value, datetime):
+        return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+    try:
+        return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def make_etag(*parts):
+    """Strong ETag value for the given version parts."""
+    digest = hashlib.sha1('\x1f'.join(str(part) for part in parts).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def encoded_etag(etag, encoding=None):
+    """ETag of the ``encoding`` (e.g. 'gzip') representation; ``etag`` itself for identity."""
+    return f"{etag}-{encoding}" if encoding else etag
+
+
+def not_modified(etag, last_modified=None, cache_control='no-cache'):
+    """304 response if the request's If-None-Match/If-Modified-Since match, else None.
+
+    If-None-Match may name the identity ETag or any encoded one.
+    """
+    last_modified = to_datetime(last_modified)
+    for encoding in [None] + COMPRESSIBLE_ENCODINGS:
+        candidate = encoded_etag(etag, encoding)
+        if not is_resource_modified(request.environ, etag=candidate, last_modified=last_modified):
+            response = Response(status=304)
+            response.vary.add('Accept-Encoding')
+            return set_validators(response, candidate, last_modified, cache_control)
+    return None
+
+
+def set_validators(response, etag, last_modified=None, cache_control='no-cache'):
+    # A compressed body is a different representation with its own ETag
+    response.set_etag(encoded_etag(etag, response.headers.get('Content-Encoding')))
+    last_modified = to_datetime(last_modified)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients may keep the body but must revalidate it before each use
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,84 @@
+"""Streaming NDJSON/CSV export of query results.
+
+``iter_export`` returns a generator that runs a query, reads the result
+with ``fetchmany`` and yields one encoded text block per chunk, so only one
+chunk of rows is in memory at a time and the first bytes go out as soon as
+the first chunk is read. The generator owns its cursor and connection and
+closes them when it finishes or when the client disconnects.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+DEFAULT_EXPORT_CHUNK_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def encode_ndjson(columns, rows):
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), default=_json_default, separators=(',', ':')) + '\n'
+        for row in rows
+    )
+
+
+class _CSVEncoder:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, lineterminator='\n')
+
+    def __call__(self, rows):
+        self.writer.writerows(rows)
+        text = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return text
+
+
+def iter_export(get_connection, sql, params=(), export_format='ndjson', chunk_size=DEFAULT_EXPORT_CHUNK_SIZE):
+    """Return a generator of text blocks for ``sql`` in ``export_format``.
+
+    The connection is only taken from ``get_connection()`` once the first
+    block is requested, so a response that is never iterated holds none.
+    Its cursors must return plain tuples.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+
+    def generate():
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            if export_format == 'csv':
+                encode = _CSVEncoder()
+                yield encode([columns])
+            else:
+                encode = lambda rows: encode_ndjson(columns, rows)
+
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield encode(rows)
+        finally:
+            cursor.close()
+            conn.close()
+
+    return generate()
@@ -0,0 +1,186 @@
+"""Group commit for single-row inserts.
+
+Request handlers hand their INSERT parameters to a GroupCommitWriter and
+wait for their row with ``write(params, timeout)``. A single writer thread
+gathers pending rows for up to ``max_delay_ms`` milliseconds or
+``max_batch`` rows, whichever comes first, and writes them with one
+``executemany`` and one commit. A burst of N orders then costs one commit
+(and one log flush) instead of N, and every caller is acknowledged only
+after the commit of its row.
+
+How much a commit guarantees is up to the connection: SQLite in WAL mode
+with synchronous=NORMAL can lose the last commits on power failure, so
+callers that acknowledge writes as durable must give the writer a
+synchronous=FULL connection (see synchronous_full).
+
+If a batch fails, its rows are retried one by one, so a single bad row
+only fails its own caller. An optional ``on_batch(cursor, params_list)``
+hook runs inside each batch's transaction, just before its commit, for
+writes that must commit together with the rows (e.g. version counters).
+
+A caller whose row is not committed within its timeout gets
+GroupCommitTimeout; the row is withdrawn if the writer has not picked it
+up yet, so a stalled or dead writer thread never blocks a handler forever.
+"""
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+_STOP = object()
+
+
+class GroupCommitTimeout(Exception):
+    """A row was not committed within the caller's timeout."""
+
+
+def synchronous_full(get_connection):
+    """Wrap a SQLite ``get_connection`` so commits are flushed to disk before they return."""
+    def get_full_connection():
+        conn = get_connection()
+        # Only allowed outside a transaction; pooled connections are handed
+        # out with none open
+        conn.execute("PRAGMA synchronous = FULL")
+        return conn
+    return get_full_connection
+
+
+class GroupCommitWriter:
+    def __init__(self, get_connection, sql, max_batch=100, max_delay_ms=5, name='group-commit-writer', on_batch=None):
+        # get_connection() is called once per batch, and the connection is
+        # close()d afterwards, so pooled connections are only held while writing
+        self.get_connection = get_connection
+        self.sql = sql
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self.name = name
+        self.on_batch = on_batch
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.timeouts = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+                atexit.register(self.stop)
+        return self
+
+    def submit(self, params):
+        """Queue one row; the future resolves to None once it is committed."""
+        if self._thread is None:
+            self.start()
+        future = Future()
+        self._queue.put((params, future))
+        return future
+
+    def write(self, params, timeout=None):
+        """Queue one row and wait until it is committed.
+
+        Raises GroupCommitTimeout after ``timeout`` seconds. The row is then
+        dropped unless the writer is already writing it, in which case it
+        may still be committed.
+        """
+        future = self.submit(params)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self.timeouts += 1
+            raise GroupCommitTimeout(f"{self.name} did not commit the row within {timeout:g}s")
+
+    def stop(self, timeout=5):
+        """Flush pending rows and stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            self._write(self._collect(item))
+
+    def _write(self, batch):
+        # Rows whose caller gave up waiting are skipped
+        batch = [(params, future) for params, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        conn = None
+        try:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            try:
+                params_list = [params for params, _ in batch]
+                cursor.executemany(self.sql, params_list)
+                if self.on_batch:
+                    self.on_batch(cursor, params_list)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                self._write_individually(conn, cursor, batch)
+                return
+            finally:
+                cursor.close()
+
+            self.batches += 1
+            self.rows += len(batch)
+            for _, future in batch:
+                future.set_result(None)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _write_individually(self, conn, cursor, batch):
+        for params, future in batch:
+            try:
+                cursor.execute(self.sql, params)
+                if self.on_batch:
+                    self.on_batch(cursor, [params])
+                conn.commit()
+                self.rows += 1
+                future.set_result(None)
+            except Exception as e:
+                conn.rollback()
+                future.set_exception(e)
+        self.batches += 1
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'pending': self._queue.qsize(),
+            'timeouts': self.timeouts,
+            'avg_batch_size': round(self.rows / self.batches, 2) if self.batches else 0,
+        }
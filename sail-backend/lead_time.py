@@ -0,0 +1,266 @@
+"""Per-grade lead-time profile derived from stock_data.
+
+Delivery estimates depend on where matching material sits, which is
+encoded in the SAL column. Instead of string-matching SAL on a single
+stock row per request, the profile classifies every stock row with
+vectorized pandas when stock is ingested. It stores the best (shortest)
+lead time per (grade, finish, thickness band) in lead_time_profile.
+
+Stock rows are banded by thk_num, THK as ingest parses it, like the bands
+of stock_summary; a requested thickness is parsed the same way.
+
+Each grade is stored at three levels, so a lookup can fall back from the
+most specific match:
+
+    (grade, finish, band)   e.g. ('316', '2D', '0.5-1')
+    (grade, finish, '*')
+    (grade, '*', '*')
+
+Writers to stock_data call ``refresh_lead_time_profile`` with the grades
+they touched, inside their own transaction.
+
+The stored profile has no width. Quotes for a width build the same levels
+on the fly from the stock of that (grade, width) with ``load_width_profiles``.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+ANY = '*'
+
+# Delivery-day range when nothing in stock matches
+NO_STOCK_DELIVERY_RANGE = (75, 100)
+
+# SAL (stock location) rules in priority order: substrings -> (min, max) days
+SAL_RULES = [
+    (['KICKBACK SLAB STK', 'SLAB STK'], (60, 90)),
+    (['HRC HRM', 'HRCS', 'HRCS JOBWORK', 'HRSS', 'REMOTE HRC'], (45, 60)),
+    (['HRC CRM', 'COIN BLANK STK', 'PACKET OPEN WIP'], (30, 30)),
+]
+
+# Upper edges (mm) of the thickness bands
+THICKNESS_BAND_EDGES = [0.5, 1.0, 2.0, 3.0, 6.0, math.inf]
+
+# Grades per IN (...) list when reading or clearing part of the profile
+GRADE_BATCH_SIZE = 500
+
+# (grade, width) pairs per statement when reading stock for width quotes
+WIDTH_BATCH_SIZE = 250
+
+
+@lru_cache(maxsize=4096)
+def classify_sal(sal_value):
+    """Return the (min, max) delivery days for one SAL value."""
+    sal_value = sal_value or ''
+    if sal_value == 'TRUE':
+        return (0, 0)
+    for substrings, days in SAL_RULES:
+        if any(substring in sal_value for substring in substrings):
+            return days
+    return NO_STOCK_DELIVERY_RANGE
+
+
+def sal_rule_conditions(sal):
+    """Boolean arrays per rule, in classify_sal's priority order: 'TRUE' first, then SAL_RULES."""
+    sal = pd.Series(sal, dtype=object).fillna('').astype(str)
+    return [(sal == 'TRUE').to_numpy()] + [
+        sal.str.contains('|'.join(substrings), regex=True).to_numpy() for substrings, _ in SAL_RULES
+    ]
+
+
+def classify_sal_series(sal):
+    """Vectorized classify_sal: returns (min_days, max_days) integer arrays."""
+    conditions = sal_rule_conditions(sal)
+    min_days = np.select(conditions, [0] + [days[0] for _, days in SAL_RULES], NO_STOCK_DELIVERY_RANGE[0])
+    max_days = np.select(conditions, [0] + [days[1] for _, days in SAL_RULES], NO_STOCK_DELIVERY_RANGE[1])
+    return min_days, max_days
+
+
+def _band_labels():
+    labels, lower = [], 0
+    for upper in THICKNESS_BAND_EDGES:
+        labels.append(f"{lower:g}+" if math.isinf(upper) else f"{lower:g}-{upper:g}")
+        lower = upper
+    return labels
+
+
+THICKNESS_BANDS = _band_labels()
+
+
+def thickness_bands(thickness):
+    """Vectorized thickness band labels of parsed thicknesses (thk_num); NaN and None map to ANY."""
+    values = pd.to_numeric(thickness, errors='coerce').to_numpy(dtype=float)
+    positions = np.searchsorted(THICKNESS_BAND_EDGES, values, side='left')
+    labels = np.array(THICKNESS_BANDS + [ANY], dtype=object)
+    positions[np.isnan(values)] = len(THICKNESS_BANDS)
+    return labels[positions]
+
+
+def parse_dimension(value):
+    """A single dimension such as ' 1,250' as ingest parses THK/WIDT, or None if not numeric."""
+    number = pd.to_numeric(pd.Series([str(value).replace(',', '').strip()]), errors='coerce')[0]
+    return None if pd.isna(number) else float(number)
+
+
+def thickness_band(thickness):
+    """Band label for a single thickness, text such as ' 0.4' parsed as ingest parses THK."""
+    return thickness_bands(pd.Series([parse_dimension(thickness)]))[0]
+
+
+def build_profile(stock):
+    """Build profile rows from a DataFrame with GRD, FIN, thk_num and SAL columns."""
+    min_days, max_days = classify_sal_series(stock['SAL'])
+    rows = pd.DataFrame({
+        'grade': stock['GRD'].fillna('').to_numpy(),
+        'finish': stock['FIN'].fillna('').to_numpy(),
+        'thk_band': thickness_bands(stock['thk_num']),
+        'min_days': min_days,
+        'max_days': max_days,
+    })
+    rows['available'] = rows['max_days'] == 0
+
+    levels = pd.concat([
+        # Rows with a non-numeric thickness only count at the coarser levels
+        rows.loc[rows['thk_band'] != ANY],
+        rows.assign(thk_band=ANY),
+        rows.assign(finish=ANY, thk_band=ANY),
+    ], ignore_index=True)
+
+    levels = levels.sort_values(['max_days', 'min_days'], kind='stable')
+    groups = levels.groupby(['grade', 'finish', 'thk_band'], sort=False)
+    profile = groups[['min_days', 'max_days']].first()
+    profile['coil_count'] = groups.size()
+    profile['available_count'] = groups['available'].sum()
+    return profile.reset_index()
+
+
+def _read_stock(cursor, placeholder, grades):
+    columns = ['GRD', 'FIN', 'thk_num', 'SAL']
+    if grades is None:
+        cursor.execute("SELECT GRD, FIN, thk_num, SAL FROM stock_data")
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    frames = []
+    for start in range(0, len(grades), GRADE_BATCH_SIZE):
+        batch = grades[start:start + GRADE_BATCH_SIZE]
+        cursor.execute(
+            f"SELECT GRD, FIN, thk_num, SAL FROM stock_data WHERE GRD IN ({', '.join([placeholder] * len(batch))})",
+            batch
+        )
+        frames.append(pd.DataFrame(cursor.fetchall(), columns=columns))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def refresh_lead_time_profile(cursor, placeholder='?', grades=None):
+    """Recompute the profile for ``grades`` (all grades if None).
+
+    Runs inside the caller's transaction and does not commit. Returns the
+    number of profile rows written.
+    """
+    if grades is not None:
+        grades = sorted({grade if grade is not None else '' for grade in grades})
+        if not grades:
+            return 0
+
+    profile = build_profile(_read_stock(cursor, placeholder, grades))
+
+    if grades is None:
+        cursor.execute("DELETE FROM lead_time_profile")
+    else:
+        for start in range(0, len(grades), GRADE_BATCH_SIZE):
+            batch = grades[start:start + GRADE_BATCH_SIZE]
+            cursor.execute(
+                f"DELETE FROM lead_time_profile WHERE grade IN ({', '.join([placeholder] * len(batch))})",
+                batch
+            )
+
+    if len(profile):
+        cursor.executemany(
+            "INSERT INTO lead_time_profile (grade, finish, thk_band, min_days, max_days, coil_count, available_count) "
+            f"VALUES ({', '.join([placeholder] * 7)})",
+            profile[['grade', 'finish', 'thk_band', 'min_days', 'max_days', 'coil_count', 'available_count']]
+            .astype(object).to_numpy().tolist()
+        )
+    return len(profile)
+
+
+def load_profiles(cursor, placeholder, grades):
+    """Return {(grade, finish, thk_band): (min_days, max_days)} for ``grades``.
+
+    ``cursor`` must return plain tuples (not a dictionary cursor).
+    """
+    grades = sorted(set(grades))
+    profiles = {}
+    for start in range(0, len(grades), GRADE_BATCH_SIZE):
+        batch = grades[start:start + GRADE_BATCH_SIZE]
+        cursor.execute(
+            "SELECT grade, finish, thk_band, min_days, max_days FROM lead_time_profile "
+            f"WHERE grade IN ({', '.join([placeholder] * len(batch))})",
+            batch
+        )
+        for grade, finish, thk_band, min_days, max_days in cursor.fetchall():
+            profiles[(grade, finish, thk_band)] = (min_days, max_days)
+    return profiles
+
+
+def load_width_profiles(cursor, placeholder, specs):
+    """Return {(grade, width, finish, thk_band): (min_days, max_days)} for (grade, width) ``specs``.
+
+    Widths are parsed numbers matched against widt_num; the levels are those
+    of the stored profile. ``cursor`` must return plain tuples.
+    """
+    specs = sorted(set(specs))
+    columns = ['GRD', 'widt_num', 'FIN', 'thk_num', 'SAL']
+    profiles = {}
+    for start in range(0, len(specs), WIDTH_BATCH_SIZE):
+        batch = specs[start:start + WIDTH_BATCH_SIZE]
+        cursor.execute(
+            "SELECT GRD, widt_num, FIN, thk_num, SAL FROM stock_data WHERE "
+            + ' OR '.join([f"(GRD = {placeholder} AND widt_num = {placeholder})"] * len(batch)),
+            [value for spec in batch for value in spec]
+        )
+        stock = pd.DataFrame(cursor.fetchall(), columns=columns)
+        for width, rows in stock.groupby('widt_num'):
+            for row in build_profile(rows).itertuples(index=False):
+                profiles[(row.grade, float(width), row.finish, row.thk_band)] = (int(row.min_days), int(row.max_days))
+    return profiles
+
+
+def quote_lead_time(profiles, width_profiles, grade, finish=None, thickness=None, width=None):
+    """(min, max) delivery days for a quote line and how it matched.
+
+    'exact' when stock of the grade matches every given spec (thickness by
+    band, width by value); otherwise the lead_time_range answer, 'grade'
+    when the grade has any stock and None when it has none. A thickness
+    without a finish has no profile level of its own, so it never matches
+    exactly.
+    """
+    band = thickness_band(thickness) if thickness else ANY
+    if not (thickness and (not finish or band == ANY)):
+        key = (grade, finish or ANY, band)
+        if width:
+            number = parse_dimension(width)
+            matched = width_profiles.get((grade, number) + key[1:]) if number is not None else None
+        else:
+            matched = profiles.get(key)
+        if matched is not None:
+            return matched, 'exact'
+
+    return lead_time_range(profiles, grade, finish, thickness), 'grade' if (grade, ANY, ANY) in profiles else None
+
+
+def lead_time_range(profiles, grade, finish=None, thickness=None):
+    """Best (min, max) delivery days from ``profiles``, most specific level first."""
+    keys = []
+    if finish:
+        if thickness:
+            keys.append((grade, finish, thickness_band(thickness)))
+        keys.append((grade, finish, ANY))
+    keys.append((grade, ANY, ANY))
+
+    for key in keys:
+        if key in profiles:
+            return profiles[key]
+    return NO_STOCK_DELIVERY_RANGE
@@ -0,0 +1,275 @@
+"""Request metrics in the Prometheus text exposition format.
+
+RequestMetrics times every request from before_request to after_request.
+Per route (the Flask endpoint name) it keeps:
+
+* a latency histogram, with p50/p95/p99 estimated from its buckets,
+* histograms of the time spent in database calls and in JSON
+  serialization,
+* request counts by method and status.
+
+Database and serialization time are reported by the observer hooks of the
+repository drivers and of JSONSerializer. They are summed per thread for
+the request in flight. Pool and cache figures come from their ``stats()``
+and are only read when /metrics is scraped. Recording a request costs a
+few perf_counter() calls, a bisect per histogram and one short lock.
+
+Streaming responses (the exports) are timed up to their first byte.
+"""
+import math
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+# LRUCache.stats() keys exported per cache
+CACHE_COUNTERS = ('hits', 'misses', 'evictions', 'expirations', 'invalidations')
+CACHE_GAUGES = ('size', 'maxsize', 'hit_ratio')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        if math.isnan(value):
+            return 'NaN'
+    return repr(value)
+
+
+def _family(name, metric_type, help_text):
+    return [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+
+
+class Histogram:
+    """Cumulative-bucket histogram; callers serialize access."""
+
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate the q-quantile, interpolating linearly inside its bucket."""
+        if not self.count:
+            return float('nan')
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                if index == len(self.buckets):
+                    # Beyond the last bound: the bound is the best estimate
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{_labels(labels + (("le", _number(float(bound))),))} {cumulative}'
+        yield f'{name}_sum{_labels(labels)} {_number(self.sum)}'
+        yield f'{name}_count{_labels(labels)} {self.count}'
+
+
+class _RouteStats:
+    __slots__ = ('latency', 'db', 'serialization', 'db_queries')
+
+    def __init__(self, buckets):
+        self.latency = Histogram(buckets)
+        self.db = Histogram(buckets)
+        self.serialization = Histogram(buckets)
+        self.db_queries = 0
+
+
+# (attribute, metric suffix, help) of the per-route histograms
+_ROUTE_HISTOGRAMS = (
+    ('latency', 'http_request_duration_seconds', 'Request latency up to the first response byte.'),
+    ('db', 'http_request_db_seconds', 'Time spent in database calls per request.'),
+    ('serialization', 'http_request_serialization_seconds', 'Time spent encoding and compressing response bodies per request.'),
+)
+
+
+class RequestMetrics:
+    def __init__(self, prefix='sail', buckets=DEFAULT_BUCKETS, quantiles=QUANTILES):
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.quantiles = tuple(quantiles)
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._routes = {}
+        # (route, method, status) -> count
+        self._requests = {}
+        self._caches = []
+        self._stats = []
+
+    def init_app(self, app, path='/metrics'):
+        """Time ``app``'s requests; with a ``path``, also serve metrics_view there unprotected.
+
+        Pass ``path=None`` and route to metrics_view yourself to put it
+        behind authentication.
+        """
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        if path:
+            app.add_url_rule(path, 'metrics', self.metrics_view, methods=['GET'])
+        return self
+
+    def instrument(self, driver=None, serializer=None):
+        """Attach to a repositories driver and/or a JSONSerializer."""
+        if driver is not None:
+            driver.observers.append(self.observe_query)
+        if serializer is not None:
+            serializer.observers.append(self.observe_serialization)
+        return self
+
+    def register_cache(self, name, cache):
+        """Export an LRUCache's hit/miss counters and hit ratio under ``cache=name``."""
+        self._caches.append((name, cache))
+
+    def register_stats(self, name, stats, counters=()):
+        """Export the numeric values of a ``stats()`` dict as <prefix>_<name>_<key>.
+
+        Keys listed in ``counters`` are exported as counters, the rest as gauges.
+        """
+        self._stats.append((name, stats, frozenset(counters)))
+
+    # Per-request accumulation
+
+    def _start(self):
+        local = self._local
+        local.db = 0.0
+        local.db_queries = 0
+        local.serialization = 0.0
+        local.started = time.perf_counter()
+
+    def observe_query(self, statement, params, seconds, conn=None):
+        local = self._local
+        if getattr(local, 'started', None) is not None:
+            local.db += seconds
+            local.db_queries += 1
+
+    def observe_serialization(self, seconds):
+        local = self._local
+        if getattr(local, 'started', None) is not None:
+            local.serialization += seconds
+
+    def _finish(self, response):
+        local = self._local
+        started = getattr(local, 'started', None)
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        local.started = None
+
+        route = request.endpoint or 'unmatched'
+        key = (route, request.method, response.status_code)
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _RouteStats(self.buckets)
+            stats.latency.observe(elapsed)
+            stats.db.observe(local.db)
+            stats.serialization.observe(local.serialization)
+            stats.db_queries += local.db_queries
+            self._requests[key] = self._requests.get(key, 0) + 1
+        return response
+
+    # Exposition
+
+    def render(self):
+        prefix = self.prefix
+        lines = []
+        with self._lock:
+            requests = sorted(self._requests.items())
+            lines += _family(f'{prefix}_http_requests_total', 'counter', 'Requests by route, method and status.')
+            for (route, method, status), count in requests:
+                labels = (('route', route), ('method', method), ('status', status))
+                lines.append(f'{prefix}_http_requests_total{_labels(labels)} {count}')
+
+            routes = sorted(self._routes.items())
+            for attribute, suffix, help_text in _ROUTE_HISTOGRAMS:
+                name = f'{prefix}_{suffix}'
+                lines += _family(name, 'histogram', help_text)
+                for route, stats in routes:
+                    lines.extend(getattr(stats, attribute).samples(name, (('route', route),)))
+
+                quantile_name = name.replace('_seconds', '_quantile_seconds')
+                lines += _family(quantile_name, 'gauge', f'{help_text[:-1]}, quantiles estimated from the histogram.')
+                for route, stats in routes:
+                    histogram = getattr(stats, attribute)
+                    for q in self.quantiles:
+                        labels = (('route', route), ('quantile', q))
+                        lines.append(f'{quantile_name}{_labels(labels)} {_number(histogram.quantile(q))}')
+
+            lines += _family(f'{prefix}_http_request_db_queries_total', 'counter', 'Database statements run by requests, per route.')
+            for route, stats in routes:
+                lines.append(f'{prefix}_http_request_db_queries_total{_labels((("route", route),))} {stats.db_queries}')
+
+        lines += self._render_caches()
+        lines += self._render_stats()
+        return '\n'.join(lines) + '\n'
+
+    def _render_caches(self):
+        if not self._caches:
+            return []
+        prefix = self.prefix
+        snapshots = [(name, cache.stats()) for name, cache in self._caches]
+        lines = []
+        for key in CACHE_COUNTERS:
+            name = f'{prefix}_cache_{key}_total'
+            lines += _family(name, 'counter', f'Cache {key}.')
+            lines += [f'{name}{_labels((("cache", cache),))} {stats[key]}' for cache, stats in snapshots]
+        for key in CACHE_GAUGES:
+            name = f'{prefix}_cache_{key}'
+            lines += _family(name, 'gauge', f'Cache {key.replace("_", " ")}.')
+            lines += [f'{name}{_labels((("cache", cache),))} {_number(stats[key])}' for cache, stats in snapshots]
+        return lines
+
+    def _render_stats(self):
+        lines = []
+        for group, stats, counters in self._stats:
+            for key, value in stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{self.prefix}_{group}_{key}'
+                if key in counters:
+                    if not name.endswith('_total'):
+                        name += '_total'
+                    lines += _family(name, 'counter', f'{group} {key}.')
+                else:
+                    lines += _family(name, 'gauge', f'{group} {key}.')
+                lines.append(f'{name} {_number(value)}')
+        return lines
+
+    def metrics_view(self):
+        return Response(self.render(), mimetype=None, content_type=CONTENT_TYPE)
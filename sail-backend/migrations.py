@@ -0,0 +1,578 @@
+"""Versioned schema migrations for the SQLite and MySQL backends.
+
+Each migration is a function ``(cursor, dialect)`` registered in MIGRATIONS
+with a version number. ``run_migrations`` records applied versions in the
+schema_migrations table and applies the pending ones in order, each in its
+own transaction. Migrations are never edited once released; schema changes
+are made by appending a new one.
+
+Migrations do not call into the application modules. Column lists and
+backfills are frozen copies of the logic as it was when each migration was
+released, so later changes to ingest, lead-time or summary code never
+change what an old migration does.
+"""
+import math
+import secrets
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+SQLITE = 'sqlite'
+MYSQL = 'mysql'
+
+# Serializes migration runs from concurrently starting MySQL workers
+MYSQL_LOCK_NAME = 'sail_schema_migrations'
+MYSQL_LOCK_TIMEOUT = 60
+
+
+def _placeholder(dialect):
+    return '?' if dialect == SQLITE else '%s'
+
+
+def column_exists(cursor, dialect, table, column):
+    if dialect == SQLITE:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in cursor.fetchall())
+
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.COLUMNS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+        (table, column)
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def add_column_if_missing(cursor, dialect, table, column, definition):
+    # Databases created by init_database() before migrations existed may
+    # already have the column
+    if not column_exists(cursor, dialect, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _v1_base_tables(cursor, dialect):
+    # The schema as originally created by init_database()
+    if dialect == SQLITE:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS orders (
+                id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                grade TEXT NOT NULL,
+                thickness TEXT NOT NULL,
+                width TEXT NOT NULL,
+                length TEXT,
+                finish TEXT,
+                quality TEXT,
+                edge TEXT,
+                b_quantity TEXT,
+                customer TEXT NOT NULL,
+                ssp_ro_id TEXT,
+                release_date TEXT,
+                required_quantity TEXT NOT NULL,
+                mou TEXT,
+                remarks TEXT,
+                delivery_days INTEGER NOT NULL,
+                expected_delivery_date TEXT,
+                status TEXT DEFAULT 'Processing',
+                created_at TEXT NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stock_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                TYP TEXT,
+                DTP TEXT,
+                PKT TEXT,
+                GRD TEXT,
+                FIN TEXT,
+                THK TEXT,
+                WIDT TEXT,
+                LNGT TEXT,
+                PWT TEXT,
+                QTY TEXT,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        return
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id VARCHAR(36) PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL UNIQUE,
+            password VARCHAR(255) NOT NULL,
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id VARCHAR(36) PRIMARY KEY,
+            user_id VARCHAR(36) NOT NULL,
+            grade VARCHAR(50) NOT NULL,
+            thickness VARCHAR(50) NOT NULL,
+            width VARCHAR(50) NOT NULL,
+            length VARCHAR(50),
+            finish VARCHAR(50),
+            quality VARCHAR(50),
+            edge VARCHAR(50),
+            b_quantity VARCHAR(50),
+            customer VARCHAR(255) NOT NULL,
+            ssp_ro_id VARCHAR(50),
+            release_date DATE,
+            required_quantity VARCHAR(50) NOT NULL,
+            mou VARCHAR(255),
+            remarks TEXT,
+            delivery_days INT NOT NULL,
+            expected_delivery_date DATETIME,
+            status VARCHAR(50) DEFAULT 'Processing',
+            created_at DATETIME NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS stock_data (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            TYP VARCHAR(10),
+            DTP VARCHAR(20),
+            PKT VARCHAR(20),
+            GRD VARCHAR(20),
+            FIN VARCHAR(20),
+            THK VARCHAR(20),
+            WIDT VARCHAR(20),
+            LNGT VARCHAR(20),
+            PWT VARCHAR(20),
+            QLY VARCHAR(10),
+            EDGE VARCHAR(10),
+            ASP VARCHAR(20),
+            HRC1 VARCHAR(20),
+            BL VARCHAR(10),
+            SAL VARCHAR(50),
+            STORE VARCHAR(50),
+            NICKEL VARCHAR(20),
+            COILNO VARCHAR(20)
+        )
+    """)
+
+
+_V2_STOCK_COLUMNS = [
+    'TYP', 'DTP', 'PKT', 'GRD', 'FIN', 'THK', 'WIDT', 'LNGT', 'PWT', 'QLY',
+    'EDGE', 'ASP', 'HRC1', 'BL', 'SAL', 'STORE', 'NICKEL', 'COILNO'
+]
+
+
+def _v2_stock_export_columns(cursor, dialect):
+    # Full stock export layout plus the content hash used by delta imports
+    if dialect == SQLITE:
+        for column in _V2_STOCK_COLUMNS:
+            add_column_if_missing(cursor, dialect, 'stock_data', column, 'TEXT')
+        add_column_if_missing(cursor, dialect, 'stock_data', 'row_hash', 'INTEGER')
+    else:
+        add_column_if_missing(cursor, dialect, 'stock_data', 'row_hash', 'BIGINT')
+
+
+def _v3_query_indexes(cursor, dialect):
+    # check_stock filters on grade first, then dimensions and finish
+    cursor.execute("CREATE INDEX idx_stock_grade_dims ON stock_data (GRD, THK, WIDT, FIN)")
+    # Delta imports match snapshot rows on packet/coil number
+    cursor.execute("CREATE INDEX idx_stock_pkt_coil ON stock_data (PKT, COILNO)")
+    # get_orders: WHERE user_id = ? ORDER BY created_at DESC
+    cursor.execute("CREATE INDEX idx_orders_user_created ON orders (user_id, created_at)")
+    # get_orders in the SQLite backend lists every order by created_at
+    cursor.execute("CREATE INDEX idx_orders_created ON orders (created_at)")
+
+
+# Lead-time classification as released with migration 4
+_V4_SAL_RULES = [
+    (['KICKBACK SLAB STK', 'SLAB STK'], (60, 90)),
+    (['HRC HRM', 'HRCS', 'HRCS JOBWORK', 'HRSS', 'REMOTE HRC'], (45, 60)),
+    (['HRC CRM', 'COIN BLANK STK', 'PACKET OPEN WIP'], (30, 30)),
+]
+_V4_NO_STOCK_DAYS = (75, 100)
+_V4_BAND_EDGES = [0.5, 1.0, 2.0, 3.0, 6.0, math.inf]
+
+
+def _v4_sal_conditions(sal):
+    sal = pd.Series(sal, dtype=object).fillna('').astype(str)
+    return [(sal == 'TRUE').to_numpy()] + [
+        sal.str.contains('|'.join(substrings), regex=True).to_numpy() for substrings, _ in _V4_SAL_RULES
+    ]
+
+
+def _v4_thickness_bands(values):
+    # '*' for values that are not numbers
+    labels, lower = [], 0
+    for upper in _V4_BAND_EDGES:
+        labels.append(f"{lower:g}+" if math.isinf(upper) else f"{lower:g}-{upper:g}")
+        lower = upper
+    values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=float)
+    positions = np.searchsorted(_V4_BAND_EDGES, values, side='left')
+    positions[np.isnan(values)] = len(labels)
+    return np.array(labels + ['*'], dtype=object)[positions]
+
+
+def _v4_backfill_lead_time_profile(cursor, placeholder):
+    cursor.execute("SELECT GRD, FIN, THK, SAL FROM stock_data")
+    stock = pd.DataFrame(cursor.fetchall(), columns=['GRD', 'FIN', 'THK', 'SAL'])
+    if not len(stock):
+        return
+
+    conditions = _v4_sal_conditions(stock['SAL'])
+    rows = pd.DataFrame({
+        'grade': stock['GRD'].fillna('').to_numpy(),
+        'finish': stock['FIN'].fillna('').to_numpy(),
+        'thk_band': _v4_thickness_bands(stock['THK']),
+        'min_days': np.select(conditions, [0] + [days[0] for _, days in _V4_SAL_RULES], _V4_NO_STOCK_DAYS[0]),
+        'max_days': np.select(conditions, [0] + [days[1] for _, days in _V4_SAL_RULES], _V4_NO_STOCK_DAYS[1]),
+    })
+    rows['available'] = rows['max_days'] == 0
+
+    # Best lead time per (grade, finish, band), (grade, finish, '*') and (grade, '*', '*')
+    levels = pd.concat([
+        rows.loc[rows['thk_band'] != '*'],
+        rows.assign(thk_band='*'),
+        rows.assign(finish='*', thk_band='*'),
+    ], ignore_index=True).sort_values(['max_days', 'min_days'], kind='stable')
+    groups = levels.groupby(['grade', 'finish', 'thk_band'], sort=False)
+    profile = groups[['min_days', 'max_days']].first()
+    profile['coil_count'] = groups.size()
+    profile['available_count'] = groups['available'].sum()
+    profile = profile.reset_index()
+
+    cursor.executemany(
+        "INSERT INTO lead_time_profile (grade, finish, thk_band, min_days, max_days, coil_count, available_count) "
+        f"VALUES ({', '.join([placeholder] * 7)})",
+        profile[['grade', 'finish', 'thk_band', 'min_days', 'max_days', 'coil_count', 'available_count']]
+        .astype(object).to_numpy().tolist()
+    )
+
+
+def _v4_lead_time_profile(cursor, dialect):
+    if dialect == SQLITE:
+        cursor.execute("""
+            CREATE TABLE lead_time_profile (
+                grade TEXT NOT NULL,
+                finish TEXT NOT NULL,
+                thk_band TEXT NOT NULL,
+                min_days INTEGER NOT NULL,
+                max_days INTEGER NOT NULL,
+                coil_count INTEGER NOT NULL,
+                available_count INTEGER NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (grade, finish, thk_band)
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE lead_time_profile (
+                grade VARCHAR(20) NOT NULL,
+                finish VARCHAR(20) NOT NULL,
+                thk_band VARCHAR(10) NOT NULL,
+                min_days INT NOT NULL,
+                max_days INT NOT NULL,
+                coil_count INT NOT NULL,
+                available_count INT NOT NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (grade, finish, thk_band)
+            )
+        """)
+    # Backfill from the stock already loaded
+    _v4_backfill_lead_time_profile(cursor, _placeholder(dialect))
+
+
+def _v5_stock_version(cursor, dialect):
+    # Counter bumped by every stock_data write; caches compare against it
+    if dialect == SQLITE:
+        cursor.execute("CREATE TABLE stock_meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+    else:
+        cursor.execute("CREATE TABLE stock_meta (name VARCHAR(50) PRIMARY KEY, value BIGINT NOT NULL)")
+    cursor.execute("INSERT INTO stock_meta (name, value) VALUES ('stock_version', 1)")
+
+
+def _v6_orders_keyset_indexes(cursor, dialect):
+    # Keyset pagination orders by (created_at, id); with id in the index the
+    # tie-break needs no sort. The new indexes are created first because
+    # MySQL keeps an index on orders.user_id for its foreign key.
+    cursor.execute("CREATE INDEX idx_orders_user_created_id ON orders (user_id, created_at, id)")
+    cursor.execute("CREATE INDEX idx_orders_created_id ON orders (created_at, id)")
+    for old_index in ('idx_orders_user_created', 'idx_orders_created'):
+        if dialect == SQLITE:
+            cursor.execute(f"DROP INDEX {old_index}")
+        else:
+            cursor.execute(f"DROP INDEX {old_index} ON orders")
+
+
+def _v7_order_versions(cursor, dialect):
+    # Per-scope counter bumped by every orders write; conditional GETs build
+    # their ETags from it
+    if dialect == SQLITE:
+        cursor.execute("""
+            CREATE TABLE order_versions (
+                scope TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE order_versions (
+                scope VARCHAR(36) PRIMARY KEY,
+                version BIGINT NOT NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+
+# Text column -> typed column, as released with migration 8
+_V8_NUMERIC_COLUMNS = {
+    'THK': 'thk_num',
+    'WIDT': 'widt_num',
+    'LNGT': 'lngt_num',
+    'PWT': 'pwt_num',
+    'NICKEL': 'nickel_num',
+}
+
+
+def _v8_backfill_numeric_columns(cursor, placeholder):
+    text_columns = list(_V8_NUMERIC_COLUMNS)
+    cursor.execute(f"SELECT id, {', '.join(text_columns)} FROM stock_data")
+    frame = pd.DataFrame(cursor.fetchall(), columns=['id'] + text_columns)
+    if not len(frame):
+        return
+
+    # '1,250' -> 1250.0; NULL where the text is not a number
+    numbers = np.column_stack([
+        pd.to_numeric(
+            frame[column].astype(object).astype(str).str.replace(',', '', regex=False).str.strip(), errors='coerce'
+        ).to_numpy(dtype=float)
+        for column in text_columns
+    ])
+    values = numbers.astype(object)
+    values[np.isnan(numbers)] = None
+
+    assignments = ', '.join(f"{column} = {placeholder}" for column in _V8_NUMERIC_COLUMNS.values())
+    cursor.executemany(
+        f"UPDATE stock_data SET {assignments} WHERE id = {placeholder}",
+        [row + [stock_id] for row, stock_id in zip(values.tolist(), frame['id'].astype(int).tolist())]
+    )
+
+
+def _v8_stock_numeric_columns(cursor, dialect):
+    # Typed dimensions for range/tolerance searches; THK, WIDT, ... stay the
+    # text of the export
+    column_type = 'REAL' if dialect == SQLITE else 'DOUBLE'
+    for column in _V8_NUMERIC_COLUMNS.values():
+        add_column_if_missing(cursor, dialect, 'stock_data', column, column_type)
+    _v8_backfill_numeric_columns(cursor, _placeholder(dialect))
+    # Grade first as in idx_stock_grade_dims, then thickness and width ranges
+    cursor.execute("CREATE INDEX idx_stock_grade_thk_widt_num ON stock_data (GRD, thk_num, widt_num)")
+    # Searches by dimension without a grade
+    cursor.execute("CREATE INDEX idx_stock_thk_widt_num ON stock_data (thk_num, widt_num)")
+
+
+def _v9_stock_reservations(cursor, dialect):
+    # Coils reserved for orders; the unique stock_id is what rules out
+    # allocating one coil twice
+    if dialect == SQLITE:
+        cursor.execute("""
+            CREATE TABLE stock_reservations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                stock_id INTEGER NOT NULL UNIQUE,
+                order_id TEXT NOT NULL,
+                weight REAL NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE stock_reservations (
+                id BIGINT AUTO_INCREMENT PRIMARY KEY,
+                stock_id INT NOT NULL,
+                order_id VARCHAR(36) NOT NULL,
+                weight DOUBLE NOT NULL,
+                created_at DATETIME NOT NULL,
+                UNIQUE KEY uq_stock_reservations_stock (stock_id)
+            )
+        """)
+    cursor.execute("CREATE INDEX idx_stock_reservations_order ON stock_reservations (order_id)")
+
+
+# SAL categories as released with migration 10, per _v4_sal_conditions entry
+_V10_SAL_CATEGORIES = ['AVAILABLE', 'SLAB', 'HRC', 'WIP']
+
+
+def _v10_backfill_stock_summary(cursor, placeholder):
+    cursor.execute(
+        "SELECT s.GRD, s.FIN, s.SAL, s.thk_num, s.pwt_num, r.stock_id IS NOT NULL FROM stock_data s "
+        "LEFT JOIN stock_reservations r ON r.stock_id = s.id"
+    )
+    stock = pd.DataFrame(cursor.fetchall(), columns=['GRD', 'FIN', 'SAL', 'thk_num', 'pwt_num', 'reserved'])
+    if not len(stock):
+        return
+
+    weights = pd.to_numeric(stock['pwt_num'], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    reserved = stock['reserved'].fillna(False).to_numpy(dtype=bool)
+    rows = pd.DataFrame({
+        'grade': stock['GRD'].fillna('').to_numpy(dtype=object),
+        'finish': stock['FIN'].fillna('').to_numpy(dtype=object),
+        'thk_band': _v4_thickness_bands(stock['thk_num']),
+        'sal_category': np.select(_v4_sal_conditions(stock['SAL']), _V10_SAL_CATEGORIES, 'OTHER').astype(object),
+        'coils': 1,
+        'total_pwt': weights,
+        'reserved_coils': reserved.astype(int),
+        'reserved_pwt': np.where(reserved, weights, 0.0),
+    })
+    key = ['grade', 'finish', 'thk_band', 'sal_category']
+    values = ['coils', 'total_pwt', 'reserved_coils', 'reserved_pwt']
+    summary = rows.groupby(key, sort=True)[values].sum().reset_index()
+
+    cursor.executemany(
+        f"INSERT INTO stock_summary ({', '.join(key + values)}, updated_at) "
+        f"VALUES ({', '.join([placeholder] * len(key + values))}, CURRENT_TIMESTAMP)",
+        summary[key + values].astype(object).to_numpy().tolist()
+    )
+
+
+def _v10_stock_summary(cursor, dialect):
+    # Coil counts and weights per group, kept up to date by every stock and
+    # reservation write (see stock_summary.py)
+    if dialect == SQLITE:
+        cursor.execute("""
+            CREATE TABLE stock_summary (
+                grade TEXT NOT NULL,
+                finish TEXT NOT NULL,
+                thk_band TEXT NOT NULL,
+                sal_category TEXT NOT NULL,
+                coils INTEGER NOT NULL,
+                total_pwt REAL NOT NULL,
+                reserved_coils INTEGER NOT NULL,
+                reserved_pwt REAL NOT NULL,
+                updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (grade, finish, thk_band, sal_category)
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE stock_summary (
+                grade VARCHAR(20) NOT NULL,
+                finish VARCHAR(20) NOT NULL,
+                thk_band VARCHAR(10) NOT NULL,
+                sal_category VARCHAR(20) NOT NULL,
+                coils INT NOT NULL,
+                total_pwt DOUBLE NOT NULL,
+                reserved_coils INT NOT NULL,
+                reserved_pwt DOUBLE NOT NULL,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (grade, finish, thk_band, sal_category)
+            )
+        """)
+    # The only full scan: later writes adjust it incrementally
+    _v10_backfill_stock_summary(cursor, _placeholder(dialect))
+
+
+def _v11_database_id(cursor, dialect):
+    # Random identity of this database, so files derived from it (shared
+    # stock snapshots) are never mistaken for another database's with the
+    # same stock_version
+    cursor.execute(
+        f"INSERT INTO stock_meta (name, value) VALUES ('database_id', {_placeholder(dialect)})",
+        (secrets.randbits(62),)
+    )
+
+
+MIGRATIONS = [
+    (1, 'base tables', _v1_base_tables),
+    (2, 'stock export columns', _v2_stock_export_columns),
+    (3, 'query indexes', _v3_query_indexes),
+    (4, 'lead time profile', _v4_lead_time_profile),
+    (5, 'stock version counter', _v5_stock_version),
+    (6, 'orders keyset indexes', _v6_orders_keyset_indexes),
+    (7, 'order version counters', _v7_order_versions),
+    (8, 'stock numeric dimension columns', _v8_stock_numeric_columns),
+    (9, 'stock reservations', _v9_stock_reservations),
+    (10, 'stock summary', _v10_stock_summary),
+    (11, 'database identity', _v11_database_id),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _ensure_version_table(cursor, dialect):
+    if dialect == SQLITE:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        """)
+    else:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at DATETIME NOT NULL
+            )
+        """)
+
+
+def current_version(cursor):
+    cursor.execute("SELECT MAX(version) FROM schema_migrations")
+    return cursor.fetchone()[0] or 0
+
+
+def run_migrations(conn, dialect, target=None):
+    """Apply pending migrations up to ``target`` (default: latest).
+
+    Returns the list of versions applied by this call.
+    """
+    target = LATEST_VERSION if target is None else target
+    cursor = conn.cursor()
+    applied = []
+    locked = False
+    try:
+        _ensure_version_table(cursor, dialect)
+        conn.commit()
+
+        if dialect == MYSQL:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", (MYSQL_LOCK_NAME, MYSQL_LOCK_TIMEOUT))
+            # 0 on timeout, NULL on error; never migrate without the lock
+            if cursor.fetchone()[0] != 1:
+                raise RuntimeError(
+                    f"Could not acquire the {MYSQL_LOCK_NAME} lock within {MYSQL_LOCK_TIMEOUT}s; "
+                    "is another migration run stuck?"
+                )
+            locked = True
+
+        for version, name, migrate in MIGRATIONS:
+            if version > target:
+                break
+
+            # Re-read inside the loop so a concurrent runner's work is seen
+            if dialect == SQLITE:
+                cursor.execute("BEGIN IMMEDIATE")
+            if version <= current_version(cursor):
+                conn.rollback()
+                continue
+
+            # MySQL commits DDL implicitly, so only the SQLite steps are atomic
+            migrate(cursor, dialect)
+            cursor.execute(
+                f"INSERT INTO schema_migrations (version, name, applied_at) VALUES ({', '.join([_placeholder(dialect)] * 3)})",
+                (version, name, datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            )
+            conn.commit()
+            applied.append(version)
+            print(f"Applied schema migration {version}: {name}")
+
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if locked:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MYSQL_LOCK_NAME,))
+            cursor.fetchone()
+        cursor.close()
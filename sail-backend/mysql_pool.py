@@ -0,0 +1,243 @@
+"""Blocking, self-sizing MySQL connection pool.
+
+mysql.connector's MySQLConnectionPool raises PoolError as soon as all of
+its connections are checked out. MySQLPool queues instead. It keeps
+between ``min_size`` and ``max_size`` connections:
+
+* ``get_connection`` reuses an idle connection or opens a new one up to
+  ``max_size``. Otherwise it waits up to ``checkout_timeout`` seconds for
+  one to be returned, then raises PoolExhausted.
+* A connection that has sat idle for longer than ``ping_after`` seconds is
+  pinged before it is handed out. Dead ones are dropped and replaced.
+* A reaper thread closes connections idle for longer than
+  ``idle_timeout``, down to ``min_size``.
+
+Handlers keep the ``conn = pool.get_connection() ... conn.close()`` shape:
+``close()`` rolls back any open transaction and returns the connection.
+"""
+import threading
+import time
+from collections import deque
+
+
+class PoolExhausted(Exception):
+    """No connection became available within the checkout timeout."""
+
+
+class PooledConnection:
+    """Checked-out connection; ``close()`` hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise AttributeError(f"Connection already returned to the pool ({name})")
+        return getattr(raw, name)
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw)
+
+    def __del__(self):
+        # A handler that forgot close() must not leak its pool slot
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class MySQLPool:
+    def __init__(self, connect, min_size=2, max_size=10, checkout_timeout=5, idle_timeout=300,
+                 ping_after=30, reap_interval=30, name='mysql-pool'):
+        self.connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.reap_interval = reap_interval
+        self.name = name
+
+        self._cond = threading.Condition()
+        # (connection, returned_at); most recently returned on the right
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.exhausted = 0
+        self.created = 0
+        self.closed = 0
+        self.ping_failures = 0
+        self.reaped = 0
+
+        # Fail fast, like MySQLConnectionPool, when the server is unreachable
+        for _ in range(min_size):
+            self._idle.append((self._open(), time.monotonic()))
+
+        self._reaper = None
+        if idle_timeout and reap_interval:
+            self._reaper = threading.Thread(target=self._reap_loop, name=f'{name}-reaper', daemon=True)
+            self._reaper.start()
+
+    def _open(self):
+        raw = self.connect()
+        with self._cond:
+            self._size += 1
+            self.created += 1
+        return raw
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.closed += 1
+            self._cond.notify()
+
+    def _alive(self, raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            with self._cond:
+                self.ping_failures += 1
+            return False
+
+    def get_connection(self, timeout=None):
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            raw = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolExhausted(f"{self.name} is closed")
+                    if self._idle:
+                        raw, returned_at = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        # Reserve the slot; the connection is opened outside the lock
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.exhausted += 1
+                        raise PoolExhausted(
+                            f"No connection available from {self.name} within {timeout:g}s "
+                            f"({self.max_size} in use)"
+                        )
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if raw is None:
+                try:
+                    raw = self.connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.created += 1
+            elif time.monotonic() - returned_at > self.ping_after and not self._alive(raw):
+                self._discard(raw)
+                continue
+
+            self._record_checkout(time.monotonic() - started, waited)
+            return PooledConnection(self, raw)
+
+    def _record_checkout(self, wait, waited):
+        with self._cond:
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+            self.wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def _release(self, raw):
+        try:
+            # Never hand out a connection with an open transaction (or a stale
+            # REPEATABLE READ snapshot)
+            if getattr(raw, 'in_transaction', True):
+                raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._cond:
+            if self._closed:
+                closed = True
+            else:
+                closed = False
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+        if closed:
+            self._discard(raw)
+
+    def reap_idle(self):
+        """Close connections idle past idle_timeout, keeping min_size open."""
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            # Oldest returns sit on the left
+            while self._idle and self._size - len(expired) > self.min_size:
+                raw, returned_at = self._idle[0]
+                if now - returned_at <= self.idle_timeout:
+                    break
+                self._idle.popleft()
+                expired.append(raw)
+            self.reaped += len(expired)
+        for raw in expired:
+            self._discard(raw)
+        return len(expired)
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(self.reap_interval)
+            if self._closed:
+                return
+            try:
+                self.reap_idle()
+            except Exception as e:
+                print(f"{self.name} reaper error: {e}")
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'in_use': self._size - idle,
+                'idle': idle,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'checkouts': self.checkouts,
+                'waits': self.waits,
+                'wait_seconds_total': round(self.wait_seconds, 6),
+                'wait_seconds_max': round(self.max_wait_seconds, 6),
+                'exhausted': self.exhausted,
+                'created': self.created,
+                'closed': self.closed,
+                'ping_failures': self.ping_failures,
+                'reaped': self.reaped,
+            }
+
+    def close_all(self):
+        with self._cond:
+            self._closed = True
+            idle = [raw for raw, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for raw in idle:
+            self._discard(raw)
@@ -0,0 +1,122 @@
+"""Keyset pagination and column projection for order listings.
+
+Pages are ordered by (created_at, id) descending. The cursor handed to the
+client encodes the (created_at, id) of the last row of a page, and the next
+page starts strictly after it:
+
+    WHERE created_at <= :created_at AND (created_at < :created_at OR id < :id)
+
+(the leading ``created_at <=`` gives both engines a plain index range).
+
+With the (created_at, id) indexes from migration 6 every page is an index
+range scan of ``limit`` rows, however deep into the listing it is, unlike
+OFFSET paging which reads and discards every earlier row.
+
+Paging is opt-in: a request with neither ``limit`` nor ``cursor`` gets the
+whole listing, as before pagination existed. A cursor without a limit
+continues with DEFAULT_PAGE_SIZE rows.
+"""
+import base64
+import json
+
+# Columns of the orders table, in table order
+ORDER_COLUMNS = [
+    'id', 'user_id', 'grade', 'thickness', 'width', 'length', 'finish', 'quality', 'edge',
+    'b_quantity', 'customer', 'ssp_ro_id', 'release_date', 'required_quantity', 'mou',
+    'remarks', 'delivery_days', 'expected_delivery_date', 'status', 'created_at', 'updated_at',
+]
+
+# Always selected, since the next cursor is built from them
+KEY_COLUMNS = ['created_at', 'id']
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed limit, cursor or fields parameter."""
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """The page size of ``limit=``; ``default`` (None for no limit) when it is empty."""
+    if value is None or value == '':
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer")
+    if limit < 1:
+        raise PaginationError("limit must be at least 1")
+    return min(limit, maximum)
+
+
+def parse_fields(value, columns=ORDER_COLUMNS):
+    """Columns requested by ``fields=a,b,c`` (all columns if empty)."""
+    if not value:
+        return list(columns)
+    requested = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in requested if field not in columns]
+    if unknown:
+        raise PaginationError(f"Unknown fields: {', '.join(unknown)}")
+    # Keep table order and add the key columns the cursor needs
+    wanted = set(requested) | set(KEY_COLUMNS)
+    return [column for column in columns if column in wanted]
+
+
+def encode_cursor(created_at, order_id):
+    payload = json.dumps([str(created_at), order_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(value):
+    """Return (created_at, id) from a cursor, or None when ``value`` is empty."""
+    if not value:
+        return None
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    # Only what encode_cursor produces: a [created_at, id] pair of strings
+    if not isinstance(key, list) or len(key) != 2 or not all(isinstance(part, str) for part in key):
+        raise PaginationError("Invalid cursor")
+    return key[0], key[1]
+
+
+def page_limit(limit_value, cursor_key):
+    """Page size for a ``limit=`` value and decoded cursor; None for the whole listing."""
+    return parse_limit(limit_value, default=DEFAULT_PAGE_SIZE if cursor_key is not None else None)
+
+
+def orders_page_query(fields, placeholder, limit, cursor=None, user_id=None):
+    """Build (sql, params) for one page, optionally limited to one user's orders.
+
+    Fetches ``limit + 1`` rows so the caller can tell whether another page
+    follows; every row when ``limit`` is None.
+    """
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append(f"user_id = {placeholder}")
+        params.append(user_id)
+    if cursor is not None:
+        conditions.append(
+            f"created_at <= {placeholder} AND (created_at < {placeholder} OR id < {placeholder})"
+        )
+        params.extend([cursor[0], cursor[0], cursor[1]])
+
+    sql = f"SELECT {', '.join(fields)} FROM orders"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY created_at DESC, id DESC"
+    if limit is not None:
+        sql += f" LIMIT {placeholder}"
+        params.append(limit + 1)
+    return sql, params
+
+
+def next_cursor(rows, limit, key=lambda row: (row['created_at'], row['id'])):
+    """Trim the look-ahead row; returns (page_rows, cursor or None)."""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,167 @@
+"""Password hashing and verification on a bounded process pool.
+
+werkzeug's password hashes are deliberately slow KDFs. Run inline, a burst
+of logins occupies every request thread and stalls unrelated traffic.
+PasswordHasher runs them on a small ProcessPoolExecutor instead. At most
+``max_pending`` calls may be queued or running at once. Beyond that,
+``hash``/``verify`` raise HasherBusy immediately, and the route answers 503
+rather than letting requests pile up behind the pool.
+
+Workers are started with forkserver (spawn where that is unavailable),
+never forked from the threaded server. A pool whose worker died is
+replaced on the next call. Both start methods import the main script again
+in the worker as ``__mp_main__``, so a script using PasswordHasher must not
+open connections or start threads in that import.
+
+``needs_rehash`` tells whether a stored hash was made with other parameters
+than the current ``method``, so login can upgrade it transparently.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# werkzeug's default method and scrypt parameters (n, r, p)
+DEFAULT_HASH_METHOD = 'scrypt'
+DEFAULT_SCRYPT_PARAMS = (2 ** 15, 8, 1)
+
+
+class HasherBusy(Exception):
+    """The pool is saturated, or a call did not finish within the timeout."""
+
+
+def _hash_password(password, method):
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+def _verify_password(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+def _hash_params(method):
+    # The parameter prefix werkzeug writes for ``method``, parsed as
+    # generate_password_hash does but without running the KDF
+    name, *args = (method or DEFAULT_HASH_METHOD).split(':')
+    if name == 'scrypt':
+        try:
+            n, r, p = map(int, args) if args else DEFAULT_SCRYPT_PARAMS
+        except ValueError:
+            raise ValueError("'scrypt' takes 3 arguments.") from None
+        return f"scrypt:{n}:{r}:{p}"
+    if name == 'pbkdf2':
+        if len(args) > 2:
+            raise ValueError("'pbkdf2' takes 2 arguments.")
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Invalid hash method '{name}'.")
+
+
+def _start_method():
+    # Forking a process with live request threads copies their locks in
+    # whatever state they are in
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return 'forkserver'
+    return 'spawn'
+
+
+class PasswordHasher:
+    def __init__(self, max_workers=2, max_pending=16, timeout=10, method=None):
+        # max_workers=0 hashes inline on the calling thread (no pool)
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.method = method
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        # Parameter prefix (e.g. 'scrypt:32768:8:1') of newly generated hashes
+        self._current_params = _hash_params(method)
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context(_start_method()),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        # Only the first caller to see a broken pool replaces it
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, function, *args):
+        if not self.max_workers:
+            return function(*args)
+
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy("Password hashing queue is full")
+        executor = self._get_executor()
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_executor(executor)
+            raise HasherBusy("Password hashing pool restarted")
+        except Exception:
+            self._slots.release()
+            raise
+        # The slot is held until the work finishes, even if the caller gives up
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            result = future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.timeouts += 1
+            raise HasherBusy("Password hashing timed out")
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); the next call gets a new pool
+            self._discard_executor(executor)
+            raise HasherBusy("Password hashing pool restarted")
+        self.completed += 1
+        return result
+
+    def hash(self, password):
+        return self._run(_hash_password, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(_verify_password, pwhash, password)
+
+    def current_params(self):
+        """Parameter prefix (e.g. 'scrypt:32768:8:1') of newly generated hashes."""
+        return self._current_params
+
+    def needs_rehash(self, pwhash):
+        return pwhash.split('$', 1)[0] != self.current_params()
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'restarts': self.restarts,
+        }
@@ -0,0 +1,208 @@
+"""Opt-in cProfile profiling of individual requests.
+
+RequestProfiler is only attached when an app enables it (PROFILING=true),
+so a disabled profiler registers no hooks and costs nothing. Once
+attached, a request is profiled when:
+
+* it carries the ``X-Profile`` header and ``authorize()`` accepts it
+  (the apps require the admin token), or
+* it is drawn at ``sample_rate``.
+
+Profiles are aggregated per route (Flask endpoint) into
+``<directory>/<route>.pstats``. The files load with ``pstats.Stats`` and
+snakeviz, and survive restarts. Next to each one, ``<route>.collapsed``
+holds the same profile as collapsed stacks (``a;b;c <microseconds>`` per
+line), the input of flamegraph.pl, speedscope and inferno. cProfile keeps
+caller/callee edges rather than whole stacks, so a function's time is
+split between its callers in proportion to each caller's share.
+
+Only one request is profiled at a time, which also bounds the overhead. A
+request that would be profiled while another one is runs unprofiled.
+From Python 3.12, cProfile records every thread of the process, not just
+the request's. A per-request profile then also contains whatever other
+requests and background threads (pool reaper, group-commit writer) ran
+meanwhile. ``stats()`` reports this as ``process_wide``. Profile under
+light concurrent load, or sample, for clean per-route numbers.
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+from datetime import datetime
+
+from flask import g, request
+
+PROFILE_SUFFIX = '.pstats'
+COLLAPSED_SUFFIX = '.collapsed'
+
+# Whether cProfile records all threads while a request is profiled
+PROCESS_WIDE = sys.version_info >= (3, 12)
+
+# Deepest stack, and least time of a subtree, written to the collapsed output
+MAX_STACK_DEPTH = 128
+MIN_STACK_SECONDS = 5e-7
+
+_ROUTE_NAME = re.compile(r'^[A-Za-z0-9_.-]+$')
+
+
+def _frame_name(function):
+    filename, line, name = function
+    if filename == '~':
+        # Built-ins, e.g. "<built-in method time.sleep>"
+        return name.replace(';', ',')
+    return f"{name} ({os.path.basename(filename)}:{line})".replace(';', ',')
+
+
+def collapsed_stacks(stats):
+    """Collapsed stack lines of a ``pstats.Stats``, with microseconds of own time.
+
+    Time reaches each callee through the caller edges cProfile recorded,
+    scaled by the share of the callee's total time that the caller's call
+    path accounts for. Recursive calls are folded into their first frame.
+    """
+    callees = {}
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((function, edge[3]))
+
+    totals = {}
+
+    def walk(function, stack, seconds, path):
+        own, cumulative = stats.stats[function][2], stats.stats[function][3]
+        share = min(seconds / cumulative, 1.0) if cumulative else 0.0
+        stack = stack + [_frame_name(function)]
+        key = ';'.join(stack)
+        totals[key] = totals.get(key, 0.0) + own * share
+        if len(stack) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_seconds in callees.get(function, ()):
+            # Subtrees that would round to 0us are not written anyway
+            if callee in path or edge_seconds * share < MIN_STACK_SECONDS:
+                continue
+            walk(callee, stack, edge_seconds * share, path | {callee})
+
+    for function, (_, _, _, cumulative, callers) in stats.stats.items():
+        if not any(caller in stats.stats for caller in callers):
+            walk(function, [], cumulative, {function})
+
+    lines = [f"{key} {round(seconds * 1e6)}" for key, seconds in sorted(totals.items()) if round(seconds * 1e6) > 0]
+    return '\n'.join(lines) + '\n' if lines else ''
+
+
+class RequestProfiler:
+    def __init__(self, directory, sample_rate=0.0, header='X-Profile', authorize=None):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.header = header
+        self.authorize = authorize
+
+        self._busy = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.profiled = 0
+        self.skipped = 0
+
+    def init_app(self, app):
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.teardown_request(self._finish)
+        return self
+
+    def _wanted(self):
+        if request.headers.get(self.header):
+            return self.authorize is None or self.authorize()
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self):
+        if request.endpoint is None or not self._wanted():
+            return
+        if not self._busy.acquire(blocking=False):
+            self.skipped += 1
+            return
+        profile = cProfile.Profile()
+        g._request_profile = profile
+        profile.enable()
+
+    def _finish(self, exc=None):
+        profile = g.pop('_request_profile', None)
+        if profile is None:
+            return
+        profile.disable()
+        self._busy.release()
+        try:
+            self._save(request.endpoint, profile)
+            self.profiled += 1
+        except Exception as e:
+            print(f"Request profile error: {e}")
+
+    def path(self, route, suffix=PROFILE_SUFFIX):
+        """Aggregated profile file of ``route``; ValueError for unsafe names."""
+        if not _ROUTE_NAME.match(route or ''):
+            raise ValueError(f"Invalid route name: {route!r}")
+        return os.path.join(self.directory, route + suffix)
+
+    def _save(self, route, profile):
+        path = self.path(route)
+        with self._write_lock:
+            stats = pstats.Stats(profile)
+            if os.path.exists(path):
+                stats.add(path)
+            temporary = f'{path}.{os.getpid()}.tmp'
+            stats.dump_stats(temporary)
+            os.replace(temporary, path)
+
+            collapsed_path = self.path(route, COLLAPSED_SUFFIX)
+            temporary = f'{collapsed_path}.{os.getpid()}.tmp'
+            with open(temporary, 'w') as collapsed:
+                collapsed.write(collapsed_stacks(stats))
+            os.replace(temporary, collapsed_path)
+
+    def profiles(self):
+        """Routes with an aggregated profile, most recently updated first."""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(PROFILE_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            stat = os.stat(path)
+            profiles.append({
+                'route': name[:-len(PROFILE_SUFFIX)],
+                'size': stat.st_size,
+                'updated_at': datetime.fromtimestamp(stat.st_mtime).isoformat(timespec='seconds'),
+                'function_calls': pstats.Stats(path).total_calls,
+            })
+        return sorted(profiles, key=lambda profile: profile['updated_at'], reverse=True)
+
+    def report(self, route, sort='cumulative', limit=50):
+        """Text report of ``route``'s aggregated profile, as printed by pstats."""
+        stream = io.StringIO()
+        pstats.Stats(self.path(route), stream=stream).sort_stats(sort).print_stats(limit)
+        return stream.getvalue()
+
+    def collapsed(self, route):
+        """``route``'s aggregated profile as collapsed stacks, for flame graphs."""
+        path = self.path(route, COLLAPSED_SUFFIX)
+        if not os.path.exists(path):
+            # Saved before collapsed stacks were written alongside
+            return collapsed_stacks(pstats.Stats(self.path(route)))
+        with open(path) as collapsed:
+            return collapsed.read()
+
+    def clear(self):
+        with self._write_lock:
+            for profile in self.profiles():
+                for suffix in (PROFILE_SUFFIX, COLLAPSED_SUFFIX):
+                    path = self.path(profile['route'], suffix)
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def stats(self):
+        return {
+            'profiled': self.profiled,
+            'skipped': self.skipped,
+            'sample_rate': self.sample_rate,
+            'process_wide': PROCESS_WIDE,
+        }
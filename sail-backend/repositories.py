@@ -0,0 +1,655 @@
+"""Data-access layer shared by the SQLite and MySQL backends.
+
+Routes talk to OrdersRepo, StockRepo, AllocationsRepo and UsersRepo instead
+of writing SQL.
+The repos hold every statement once, written with ``?`` placeholders. A
+driver adapts them to its engine:
+
+* SQLiteDriver runs the statements on the thread's pooled connection. Each
+  statement text is rendered once, so sqlite3's per-connection statement
+  cache prepares it only once per connection.
+* MySQLDriver renders ``?`` as ``%s`` once per statement (outside string
+  literals and quoted identifiers; see format_placeholders). With
+  ``prepared=True`` it also keeps a per-connection LRU of server-side
+  prepared cursors, so a hot statement is prepared once per connection
+  and then only executed.
+
+Rows come back as dicts built from a cached per-query column layout.
+Repo methods check out their own connection. Pass ``conn`` to run several
+calls on one connection, or inside a ``driver.transaction()``.
+
+Callables in ``driver.observers`` are called after every statement as
+``observer(sql, params, seconds, conn)``; with none registered, statements
+are not timed at all.
+"""
+import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import pandas as pd
+
+from allocation import (
+    ALLOCATED, CONFLICT, INVALID, UNAVAILABLE, AllocationConflict, best_fit, load_candidates, parse_quantity,
+    reserve_coils,
+)
+from etags import bump_order_versions
+from export import iter_export
+from lead_time import load_profiles, load_width_profiles, refresh_lead_time_profile
+from pagination import next_cursor, orders_page_query
+from serialization import layout_for
+from stock_ingest import (
+    NUMERIC_SHADOW_COLUMNS, STOCK_COLUMNS, bulk_load_stock, bump_stock_version, insert_stock_frame,
+)
+from stock_search import STOCK_RESULT_COLUMNS, stock_search_query
+from stock_snapshot import StockSnapshot
+from stock_summary import SUMMARY_KEY, reserve_in_stock_summary
+
+# String literals, quoted identifiers, placeholders and format markers
+_SQL_TOKENS = re.compile(r"""'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`|\?|%[s(]""", re.S)
+
+# Rendered statements kept per driver; dynamic statements (field
+# projections, filter combinations) beyond this start the cache over
+STATEMENT_CACHE_SIZE = 1024
+
+# Rows per fetchmany() while reading stock_data into a StockSnapshot
+SNAPSHOT_FETCH_SIZE = 50000
+
+# Table scans tried before giving up on a snapshot that keeps racing imports
+SNAPSHOT_ATTEMPTS = 3
+
+# Allocation attempts before an order losing every race is given up on
+ALLOCATION_ATTEMPTS = 5
+
+ORDER_INSERT_COLUMNS = [
+    'id', 'user_id', 'grade', 'thickness', 'width', 'length', 'finish', 'quality', 'edge',
+    'b_quantity', 'customer', 'ssp_ro_id', 'release_date', 'required_quantity', 'mou',
+    'remarks', 'delivery_days', 'expected_delivery_date', 'status', 'created_at',
+]
+
+
+def format_placeholders(statement):
+    """``statement`` with its ``?`` placeholders rewritten as ``%s``.
+
+    A ``?`` inside a string literal or quoted identifier is left alone.
+    mysql-connector substitutes every ``%s`` it finds, quoted or not, and
+    never unescapes ``%%``, so a statement containing ``%s`` or ``%(`` of
+    its own is rejected rather than escaped. Any other ``%``, e.g. in
+    ``LIKE 'a%'``, reaches the server unchanged.
+    """
+    def render(match):
+        token = match.group()
+        if token == '?':
+            return '%s'
+        if token.startswith('%') or '%s' in token or '%(' in token:
+            raise ValueError(f"mysql-connector would substitute the %s or %( in this statement; pass the value as a parameter: {statement}")
+        return token
+
+    return _SQL_TOKENS.sub(render, statement)
+
+
+class Driver:
+    dialect = None
+    placeholder = '?'
+
+    def __init__(self, get_connection):
+        self.get_connection = get_connection
+        self.observers = []
+        self._statements = {}
+
+    def sql(self, statement):
+        """The statement in this driver's placeholder style (rendered once)."""
+        rendered = self._statements.get(statement)
+        if rendered is None:
+            if len(self._statements) >= STATEMENT_CACHE_SIZE:
+                self._statements.clear()
+            rendered = self._render(statement)
+            self._statements[statement] = rendered
+        return rendered
+
+    def _render(self, statement):
+        return statement
+
+    @contextmanager
+    def connection(self, conn=None):
+        """Yield ``conn`` if given, else a pooled connection closed afterwards."""
+        if conn is not None:
+            yield conn
+            return
+        conn = self.get_connection()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def transaction(self, conn=None):
+        """Like connection(), committing on success and rolling back on error.
+
+        A passed ``conn`` is committed too, so callers composing several repo
+        writes open the transaction once and pass its connection down.
+        """
+        with self.connection(conn) as conn:
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def cursor(self, conn):
+        """Plain cursor returning tuples, for the shared cursor-level helpers."""
+        if self.observers:
+            return _ObservedCursor(self, conn, conn.cursor())
+        return conn.cursor()
+
+    def _observe(self, sql, params, seconds, conn):
+        for observer in self.observers:
+            observer(sql, params, seconds, conn)
+
+    def _execute(self, conn, statement, params):
+        if not self.observers:
+            return self._run(conn, statement, params)
+        started = time.perf_counter()
+        try:
+            return self._run(conn, statement, params)
+        finally:
+            self._observe(self.sql(statement), params, time.perf_counter() - started, conn)
+
+    def _run(self, conn, statement, params):
+        cursor = conn.cursor()
+        try:
+            cursor.execute(self.sql(statement), params)
+            if cursor.description is None:
+                return None, cursor.rowcount
+            columns = tuple(column[0] for column in cursor.description)
+            return columns, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def fetch_all(self, statement, params=(), conn=None):
+        with self.connection(conn) as conn:
+            columns, rows = self._execute(conn, statement, params)
+        return layout_for(columns).to_dicts(rows)
+
+    def fetch_one(self, statement, params=(), conn=None):
+        rows = self.fetch_all(statement, params, conn)
+        return rows[0] if rows else None
+
+    def fetch_value(self, statement, params=(), conn=None, default=None):
+        with self.connection(conn) as conn:
+            _, rows = self._execute(conn, statement, params)
+        return rows[0][0] if rows else default
+
+    def execute(self, statement, params=(), conn=None):
+        """Run a write inside its own transaction (or ``conn``'s); returns rowcount."""
+        with self.transaction(conn) as conn:
+            _, rowcount = self._execute(conn, statement, params)
+        return rowcount
+
+    def execute_many(self, conn, statement, seq_of_params):
+        cursor = self.cursor(conn)
+        try:
+            cursor.executemany(self.sql(statement), seq_of_params)
+        finally:
+            cursor.close()
+
+
+class _ObservedCursor:
+    """Cursor wrapper reporting each execute/executemany to the driver's observers.
+
+    A statement returning rows is reported once they have all been read, or
+    at the next execute or close(), with the fetch time included: on an
+    unbuffered MySQL cursor that is where the work happens, and observers
+    may only run further statements on the connection once it is free.
+    """
+
+    def __init__(self, driver, conn, cursor):
+        self._driver = driver
+        self._conn = conn
+        self._cursor = cursor
+        # [sql, params, seconds] of a statement whose rows are still unread
+        self._pending = None
+
+    def _flush(self):
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._driver._observe(*pending, self._conn)
+
+    def _report(self, sql, params, seconds):
+        if self._cursor.description is None:
+            self._driver._observe(sql, params, seconds, self._conn)
+        else:
+            self._pending = [sql, params, seconds]
+
+    def _fetch(self, fetch, *args):
+        started = time.perf_counter()
+        try:
+            return fetch(*args)
+        finally:
+            if self._pending is not None:
+                self._pending[2] += time.perf_counter() - started
+
+    def execute(self, sql, params=()):
+        self._flush()
+        started = time.perf_counter()
+        try:
+            result = self._cursor.execute(sql, params)
+        except Exception:
+            self._driver._observe(sql, params, time.perf_counter() - started, self._conn)
+            raise
+        self._report(sql, params, time.perf_counter() - started)
+        return result
+
+    def executemany(self, sql, seq_of_params):
+        self._flush()
+        # Observers see the first parameter row as representative of the batch
+        seq_of_params = list(seq_of_params)
+        params = seq_of_params[0] if seq_of_params else ()
+        started = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_of_params)
+        finally:
+            self._driver._observe(sql, params, time.perf_counter() - started, self._conn)
+
+    def fetchone(self):
+        row = self._fetch(self._cursor.fetchone)
+        if row is None:
+            self._flush()
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._fetch(self._cursor.fetchmany, *([] if size is None else [size]))
+        if not rows:
+            self._flush()
+        return rows
+
+    def fetchall(self):
+        rows = self._fetch(self._cursor.fetchall)
+        self._flush()
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def close(self):
+        try:
+            self._cursor.close()
+        finally:
+            self._flush()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class SQLiteDriver(Driver):
+    dialect = 'sqlite'
+    placeholder = '?'
+
+
+class MySQLDriver(Driver):
+    dialect = 'mysql'
+    placeholder = '%s'
+
+    def __init__(self, get_connection, prepared=True, statement_cache_size=64):
+        super().__init__(get_connection)
+        self.prepared = prepared
+        self.statement_cache_size = statement_cache_size
+        self.prepares = 0
+
+    def _render(self, statement):
+        return format_placeholders(statement)
+
+    def _prepared_cursor(self, conn, sql):
+        # Prepared cursors live with the physical connection, so they survive
+        # being returned to and checked out of the pool
+        raw = getattr(conn, '_raw', conn)
+        statements = getattr(raw, '_sail_statements', None)
+        if statements is None:
+            statements = OrderedDict()
+            raw._sail_statements = statements
+
+        cursor = statements.get(sql)
+        if cursor is not None:
+            statements.move_to_end(sql)
+            return cursor
+
+        cursor = raw.cursor(prepared=True)
+        statements[sql] = cursor
+        self.prepares += 1
+        if len(statements) > self.statement_cache_size:
+            _, evicted = statements.popitem(last=False)
+            try:
+                evicted.close()
+            except Exception:
+                pass
+        return cursor
+
+    def _run(self, conn, statement, params):
+        if not self.prepared:
+            return super()._run(conn, statement, params)
+
+        sql = self.sql(statement)
+        cursor = self._prepared_cursor(conn, sql)
+        try:
+            cursor.execute(sql, tuple(params))
+        except Exception:
+            # Drop the cursor; it is prepared again on the next use
+            getattr(getattr(conn, '_raw', conn), '_sail_statements', {}).pop(sql, None)
+            raise
+        if cursor.description is None:
+            return None, cursor.rowcount
+        columns = tuple(column[0] for column in cursor.description)
+        # Always read the whole result so the connection is free for the next statement
+        return columns, cursor.fetchall()
+
+
+class OrdersRepo:
+    INSERT = (
+        f"INSERT INTO orders ({', '.join(ORDER_INSERT_COLUMNS)}) "
+        f"VALUES ({', '.join(['?'] * len(ORDER_INSERT_COLUMNS))})"
+    )
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    @property
+    def insert_sql(self):
+        """INSERT statement for one row of ORDER_INSERT_COLUMNS values."""
+        return self.driver.sql(self.INSERT)
+
+    def page(self, fields, limit, cursor_key=None, user_id=None, conn=None):
+        """One keyset page; returns (orders, next cursor or None)."""
+        statement, params = orders_page_query(fields, '?', limit, cursor_key, user_id=user_id)
+        rows = self.driver.fetch_all(statement, params, conn)
+        return next_cursor(rows, limit)
+
+    def get(self, order_id, user_id=None, conn=None):
+        if user_id is None:
+            return self.driver.fetch_one("SELECT * FROM orders WHERE id = ?", (order_id,), conn)
+        return self.driver.fetch_one("SELECT * FROM orders WHERE id = ? AND user_id = ?", (order_id, user_id), conn)
+
+    def updated_at(self, order_id, user_id=None, conn=None):
+        """The order's updated_at, or None if it does not exist."""
+        if user_id is None:
+            return self.driver.fetch_value("SELECT updated_at FROM orders WHERE id = ?", (order_id,), conn)
+        return self.driver.fetch_value(
+            "SELECT updated_at FROM orders WHERE id = ? AND user_id = ?", (order_id, user_id), conn
+        )
+
+    def version(self, scope, conn=None):
+        """(version, updated_at) behind the scope's list ETags; (0, None) before any order."""
+        row = self.driver.fetch_one("SELECT version, updated_at FROM order_versions WHERE scope = ?", (scope,), conn)
+        if row is None:
+            return 0, None
+        return row['version'], row['updated_at']
+
+    def bump_versions(self, cursor, scopes):
+        """Bump order versions inside the caller's transaction (cursor level)."""
+        bump_order_versions(cursor, scopes, self.driver.placeholder)
+
+    def insert(self, rows, scopes, conn=None):
+        """Insert order rows and bump their scopes' versions in one transaction."""
+        with self.driver.transaction(conn) as conn:
+            self.driver.execute_many(conn, self.INSERT, rows)
+            cursor = self.driver.cursor(conn)
+            try:
+                self.bump_versions(cursor, scopes)
+            finally:
+                cursor.close()
+
+    def insert_each(self, rows, scopes):
+        """Insert order rows in one transaction, or each in its own if that fails.
+
+        ``scopes(rows)`` gives the version scopes to bump for a list of rows.
+        Returns one entry per row: None if it was inserted, else the error, so
+        a bad row fails alone (as in GroupCommitWriter).
+        """
+        try:
+            self.insert(rows, scopes(rows))
+            return [None] * len(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                return [e]
+        errors = []
+        for row in rows:
+            try:
+                self.insert([row], scopes([row]))
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+
+    def export(self, fields, export_format, chunk_size, user_id=None):
+        """Generator streaming orders as NDJSON/CSV text blocks."""
+        statement = f"SELECT {', '.join(fields)} FROM orders"
+        params = ()
+        if user_id is not None:
+            statement += " WHERE user_id = ?"
+            params = (user_id,)
+        statement += " ORDER BY created_at DESC, id DESC"
+        return iter_export(self.driver.get_connection, self.driver.sql(statement), params, export_format, chunk_size)
+
+
+class StockRepo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def count(self, conn=None):
+        return self.driver.fetch_value("SELECT COUNT(*) FROM stock_data", conn=conn, default=0)
+
+    def is_empty(self, conn=None):
+        """Whether stock_data has no rows; reads at most one, unlike count."""
+        return self.driver.fetch_value("SELECT 1 FROM stock_data LIMIT 1", conn=conn) is None
+
+    def version(self, conn=None):
+        """Current stock_version; every stock_data write bumps it."""
+        return self.driver.fetch_value(
+            "SELECT value FROM stock_meta WHERE name = 'stock_version'", conn=conn, default=0
+        )
+
+    def database_id(self, conn=None):
+        """Random identity of this database (migration 11); None before it."""
+        return self.driver.fetch_value("SELECT value FROM stock_meta WHERE name = 'database_id'", conn=conn)
+
+    def search(self, filters, conn=None):
+        """Stock rows matching parsed /api/stock/check filters (see stock_search)."""
+        statement, params = stock_search_query(filters)
+        return self.driver.fetch_all(statement, params, conn)
+
+    def snapshot(self, conn=None):
+        """StockSnapshot of stock_data, tagged with the stock_version it holds.
+
+        stock_version is read before and after the table scan. Every stock
+        write bumps it, so equal reads mean no import landed in between;
+        otherwise the scan is repeated.
+        """
+        # Result columns plus the typed ones the filters use
+        selected = STOCK_RESULT_COLUMNS + list(NUMERIC_SHADOW_COLUMNS.values())
+        statement = self.driver.sql(f"SELECT {', '.join(selected)} FROM stock_data ORDER BY id")
+        with self.driver.connection(conn) as conn:
+            for _ in range(SNAPSHOT_ATTEMPTS):
+                version = self.version(conn)
+                cursor = self.driver.cursor(conn)
+                try:
+                    cursor.execute(statement)
+                    columns = [column[0] for column in cursor.description]
+                    rows = []
+                    chunk = cursor.fetchmany(SNAPSHOT_FETCH_SIZE)
+                    while chunk:
+                        rows += chunk
+                        chunk = cursor.fetchmany(SNAPSHOT_FETCH_SIZE)
+                finally:
+                    cursor.close()
+                if self.version(conn) == version:
+                    # object dtype keeps the text columns exactly as stored
+                    frame = pd.DataFrame(rows, columns=columns, dtype=object)
+                    return StockSnapshot.from_frame(frame, version)
+        raise RuntimeError("stock_data changed during every snapshot attempt")
+
+    def lead_time_profiles(self, grades, conn=None):
+        """{(grade, finish, thk_band): (min_days, max_days)} for ``grades``."""
+        with self.driver.connection(conn) as conn:
+            cursor = self.driver.cursor(conn)
+            try:
+                return load_profiles(cursor, self.driver.placeholder, grades)
+            finally:
+                cursor.close()
+
+    def width_lead_time_profiles(self, specs, conn=None):
+        """{(grade, width, finish, thk_band): (min_days, max_days)} for (grade, parsed width) ``specs``."""
+        with self.driver.connection(conn) as conn:
+            cursor = self.driver.cursor(conn)
+            try:
+                return load_width_profiles(cursor, self.driver.placeholder, specs)
+            finally:
+                cursor.close()
+
+    def summary(self, filters=None, conn=None):
+        """stock_summary groups, narrowed by equality ``filters`` on SUMMARY_KEY columns.
+
+        Each group carries its ``available_pwt``: the weight not reserved
+        for an order.
+        """
+        filters = {column: value for column, value in (filters or {}).items() if column in SUMMARY_KEY and value}
+        statement = (
+            f"SELECT {', '.join(SUMMARY_KEY)}, coils, ROUND(total_pwt, 3) AS total_pwt, reserved_coils, "
+            "ROUND(reserved_pwt, 3) AS reserved_pwt FROM stock_summary"
+        )
+        # Fixed column order, so each filter combination renders one statement
+        columns = [column for column in SUMMARY_KEY if column in filters]
+        if columns:
+            statement += " WHERE " + " AND ".join(f"{column} = ?" for column in columns)
+        statement += f" ORDER BY {', '.join(SUMMARY_KEY)}"
+        groups = self.driver.fetch_all(statement, [filters[column] for column in columns], conn)
+        for group in groups:
+            group['available_pwt'] = round(group['total_pwt'] - group['reserved_pwt'], 3)
+        return groups
+
+    def insert_rows(self, rows, conn=None):
+        """Insert stock rows (values in STOCK_COLUMNS order), refresh the
+        lead-time profiles and bump stock_version in one transaction.
+
+        Rows go through the ingest path, so they get their row hash and
+        numeric dimension columns too.
+        """
+        frame = pd.DataFrame(list(rows), columns=STOCK_COLUMNS)
+        with self.driver.transaction(conn) as conn:
+            cursor = self.driver.cursor(conn)
+            try:
+                insert_stock_frame(cursor, frame, self.driver.placeholder)
+                refresh_lead_time_profile(cursor, self.driver.placeholder)
+                bump_stock_version(cursor)
+            finally:
+                cursor.close()
+
+    def bulk_load(self, csv_path, conn=None):
+        """Load a stock export CSV (bulk_load_stock commits its own transaction)."""
+        with self.driver.connection(conn) as conn:
+            return bulk_load_stock(conn, csv_path, placeholder=self.driver.placeholder)
+
+    def export(self, export_format, chunk_size):
+        """Generator streaming stock_data in the stock export column layout."""
+        statement = f"SELECT {', '.join(STOCK_COLUMNS)} FROM stock_data ORDER BY id"
+        return iter_export(self.driver.get_connection, self.driver.sql(statement), (), export_format, chunk_size)
+
+
+class AllocationsRepo:
+    def __init__(self, driver, attempts=ALLOCATION_ATTEMPTS):
+        self.driver = driver
+        self.attempts = attempts
+        self.conflicts = 0
+
+    def allocate(self, order_id, grade, thickness, width, finish, required, created_at):
+        """Reserve best-fit coils for an order (see allocation.py).
+
+        Returns a dict with the ``status`` (allocated, unavailable, invalid
+        or conflict), the ``required`` and ``allocated`` weights and the
+        reserved ``coils``. Each attempt is its own short transaction, which
+        also moves the coils into stock_summary's reserved totals.
+        """
+        result = {'status': INVALID, 'required': None, 'allocated': 0.0, 'coils': []}
+        required = parse_quantity(required)
+        thickness = parse_quantity(thickness)
+        width = parse_quantity(width)
+        if required is None or thickness is None or width is None:
+            return result
+        result['required'] = required
+
+        for _ in range(self.attempts):
+            try:
+                with self.driver.transaction() as conn:
+                    cursor = self.driver.cursor(conn)
+                    try:
+                        candidates = load_candidates(cursor, self.driver.placeholder, grade, thickness, width, finish)
+                        coils = best_fit(candidates, required)
+                        if coils is None:
+                            result['status'] = UNAVAILABLE
+                            return result
+                        reserve_coils(cursor, self.driver.placeholder, order_id, coils, created_at)
+                        reserve_in_stock_summary(cursor, self.driver.placeholder, [coil['stock_id'] for coil in coils])
+                    finally:
+                        cursor.close()
+            except AllocationConflict:
+                # A concurrent order claimed a chosen coil; retry on fresh candidates
+                self.conflicts += 1
+                continue
+
+            result['status'] = ALLOCATED
+            result['allocated'] = round(sum(coil['weight'] for coil in coils), 3)
+            result['coils'] = coils
+            return result
+
+        result['status'] = CONFLICT
+        return result
+
+    def for_order(self, order_id, conn=None):
+        """Coils reserved for ``order_id``."""
+        return self.driver.fetch_all(
+            "SELECT r.stock_id, s.PKT, s.COILNO, r.weight, r.created_at FROM stock_reservations r "
+            "JOIN stock_data s ON s.id = r.stock_id WHERE r.order_id = ? ORDER BY r.id",
+            (order_id,), conn
+        )
+
+    def stats(self):
+        return {'conflicts': self.conflicts}
+
+
+class UsersRepo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def get(self, user_id, conn=None):
+        return self.driver.fetch_one("SELECT id, name, email FROM users WHERE id = ?", (user_id,), conn)
+
+    def get_profile(self, user_id, conn=None):
+        return self.driver.fetch_one("SELECT id, name, email, created_at FROM users WHERE id = ?", (user_id,), conn)
+
+    def get_by_email(self, email, conn=None):
+        return self.driver.fetch_one("SELECT * FROM users WHERE email = ?", (email,), conn)
+
+    def email_taken(self, email, exclude_user_id=None, conn=None):
+        if exclude_user_id is None:
+            return self.driver.fetch_value("SELECT 1 FROM users WHERE email = ?", (email,), conn) is not None
+        return self.driver.fetch_value(
+            "SELECT 1 FROM users WHERE email = ? AND id != ?", (email, exclude_user_id), conn
+        ) is not None
+
+    def get_password(self, user_id, conn=None):
+        return self.driver.fetch_value("SELECT password FROM users WHERE id = ?", (user_id,), conn)
+
+    def create(self, user_id, name, email, password, created_at, conn=None):
+        self.driver.execute(
+            "INSERT INTO users (id, name, email, password, created_at) VALUES (?, ?, ?, ?, ?)",
+            (user_id, name, email, password, created_at), conn
+        )
+
+    def update_profile(self, user_id, name, email, conn=None):
+        self.driver.execute("UPDATE users SET name = ?, email = ? WHERE id = ?", (name, email, user_id), conn)
+
+    def set_password(self, user_id, password, conn=None):
+        self.driver.execute("UPDATE users SET password = ? WHERE id = ?", (password, user_id), conn)
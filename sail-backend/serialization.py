@@ -0,0 +1,153 @@
+"""JSON serialization for read handlers.
+
+Handlers used to rebuild the column list from ``cursor.description`` and
+run ``dict(zip(columns, row))`` in a Python loop. Then ``jsonify`` sorted
+every object's keys and encoded the result with the standard library.
+This module replaces that path with three pieces:
+
+* ``RowLayout``: the column layout of a query, built once per distinct
+  column list and cached. Its ``row_factory`` lets a SQLite cursor return
+  dicts directly from ``fetchall``.
+* A pluggable encoder. It uses orjson when installed and falls back to the
+  standard library. Dates are written in the HTTP-date format Flask's
+  jsonify uses, so responses keep their shape.
+* ``JSONSerializer.response``: encodes a payload and compresses it with
+  gzip or deflate when the client's Accept-Encoding allows it.
+"""
+import gzip
+import json
+import time
+import zlib
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+
+from flask import Response, request
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+COMPRESSIBLE_ENCODINGS = ['gzip', 'deflate']
+
+
+def _default(value):
+    # Same representations as Flask's default JSON provider
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, bytes):
+        return value.decode('utf-8', 'replace')
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(payload):
+    return json.dumps(payload, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _orjson_dumps(payload):
+    # Passthrough hands datetimes to _default instead of orjson's ISO format
+    return orjson.dumps(payload, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+ENCODERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    ENCODERS['orjson'] = _orjson_dumps
+
+
+def get_encoder(name='auto'):
+    """Return a ``payload -> bytes`` encoder by name; 'auto' prefers orjson."""
+    if callable(name):
+        return name
+    if name == 'auto':
+        return ENCODERS.get('orjson', _stdlib_dumps)
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown JSON encoder {name!r}; available: {', '.join(ENCODERS)}")
+    return ENCODERS[name]
+
+
+class RowLayout:
+    """Column layout of one query's result rows."""
+
+    __slots__ = ('columns',)
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def row_factory(self, cursor, row):
+        return dict(zip(self.columns, row))
+
+    def to_dicts(self, rows):
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in rows]
+
+
+@lru_cache(maxsize=256)
+def layout_for(columns):
+    """Shared RowLayout for a tuple of column names."""
+    return RowLayout(columns)
+
+
+def layout_from_description(description):
+    return layout_for(tuple(column[0] for column in description))
+
+
+def use_layout(cursor, layout=None):
+    """Make an executed SQLite cursor return dicts; returns the layout."""
+    layout = layout or layout_from_description(cursor.description)
+    cursor.row_factory = layout.row_factory
+    return layout
+
+
+def compress(body, encoding, level=1):
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'deflate':
+        return zlib.compress(body, level)
+    return body
+
+
+class JSONSerializer:
+    def __init__(self, encoder='auto', compress_min_bytes=1024, compress_level=1):
+        self.encode = get_encoder(encoder)
+        self.compress_min_bytes = compress_min_bytes
+        self.compress_level = compress_level
+        # Called as observer(seconds) after each encode and each compression
+        self.observers = []
+
+    def _observe(self, started):
+        elapsed = time.perf_counter() - started
+        for observer in self.observers:
+            observer(elapsed)
+
+    def dumps(self, payload):
+        if not self.observers:
+            return self.encode(payload)
+        started = time.perf_counter()
+        try:
+            return self.encode(payload)
+        finally:
+            self._observe(started)
+
+    def response(self, payload, status=200):
+        return self.body_response(self.dumps(payload), status)
+
+    def body_response(self, body, status=200):
+        """Response for already encoded JSON, compressed if the client accepts it."""
+        response = Response(body, status=status, mimetype='application/json')
+        if self.compress_min_bytes is None:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if len(body) < self.compress_min_bytes:
+            return response
+        encoding = request.accept_encodings.best_match(COMPRESSIBLE_ENCODINGS)
+        if encoding:
+            started = time.perf_counter()
+            response.set_data(compress(body, encoding, self.compress_level))
+            self._observe(started)
+            response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,274 @@
+"""StockSnapshot generations shared by every worker process.
+
+Under a pre-forking server, every worker keeping its own StockSnapshot
+holds a private copy of the same arrays and rebuilds it from the database
+after each import. SharedStockSnapshotStore publishes each generation once,
+as a file in ``directory``, and every worker maps that file read-only. The
+arrays are views straight into the mapping, so the pages are shared through
+the OS page cache and memory stays flat as workers are added. On Linux,
+point ``directory`` at /dev/shm to keep the files in RAM.
+
+File layout, all fixed-width:
+
+* 8-byte magic, then the little-endian uint64 length of a JSON header,
+* the header: database id, stock_version, row count, result columns, and
+  the dtype, shape and offset of each array,
+* the arrays (ids, codes, dictionaries, numbers), each starting on a
+  64-byte boundary. Dictionaries of text are fixed-width unicode arrays.
+  A dictionary of mixed types (e.g. text and integers) is stored as a JSON
+  list, which keeps each value's type; one holding values JSON cannot
+  represent is not shared, and the building worker keeps a private copy.
+
+A generation is written to a temporary file and renamed into place. The
+``current`` pointer file is then replaced to name it. Workers read the
+pointer when their snapshot is stale and map the new file; the swap is one
+reference assignment, as in StockSnapshotStore. Older files are unlinked
+once the pointer moves; workers that still map them keep their pages until
+they swap.
+
+stock_version alone does not identify a generation: another database
+(a restored backup, a second deployment pointed at the same directory)
+counts its own versions from 1. Stores given a ``database_id`` (the
+random id migration 11 stores next to stock_version) keep their files in a
+subdirectory named after it. Attaching also checks the id in the header,
+and a file of another database is rebuilt rather than served.
+
+One worker builds a new generation at a time, holding an flock on
+``build.lock``. The others keep answering from SQL and attach the new
+generation once it is published. A worker starting up attaches the current
+generation instead of reading stock_data into a snapshot of its own (the
+app's startup check only reads whether stock_data has any row). Without
+fcntl (Windows) builds are not coordinated, so several workers may build
+the same generation.
+"""
+import json
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+
+from stock_snapshot import StockSnapshot, StockSnapshotStore
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+SNAPSHOT_MAGIC = b'SAILSTK2'
+ALIGNMENT = 64
+
+POINTER_NAME = 'current'
+LOCK_NAME = 'build.lock'
+
+_GENERATION_NAME = re.compile(r'^stock-\d+\.snap$')
+
+# Prefix of each array's key in the header, per StockSnapshot attribute
+_GROUPS = ('codes', 'dictionaries', 'numbers')
+
+# Value types a JSON-encoded dictionary restores unchanged
+_JSON_TYPES = (str, int, float, bool)
+
+
+def _json_array(array):
+    """Object array as UTF-8 JSON bytes; ValueError if a value would not round-trip."""
+    values = array.tolist()
+    for value in values:
+        if type(value) not in _JSON_TYPES:
+            raise ValueError(f"Cannot share a dictionary holding {type(value).__name__} values")
+    return np.frombuffer(json.dumps(values).encode('utf-8'), dtype=np.uint8)
+
+
+def _object_array(data):
+    values = json.loads(bytes(data))
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(snapshot, path, database_id=None):
+    """Write ``snapshot`` of database ``database_id`` to ``path`` in the shared fixed-width layout."""
+    arrays = {'ids': snapshot.ids}
+    encoded = set()
+    for group in _GROUPS:
+        for column, array in getattr(snapshot, group).items():
+            if array.dtype == object:
+                array = _json_array(array)
+                encoded.add(f'{group}/{column}')
+            arrays[f'{group}/{column}'] = np.ascontiguousarray(array)
+
+    layout = {}
+    size = 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': size}
+        if name in encoded:
+            layout[name]['encoding'] = 'json'
+        size = _align(size + array.nbytes)
+
+    header = json.dumps({
+        'database_id': database_id,
+        'version': int(snapshot.version),
+        'rows': snapshot.rows,
+        'columns': list(snapshot.columns),
+        'arrays': layout,
+    }).encode('utf-8')
+    data_start = _align(len(SNAPSHOT_MAGIC) + 8 + len(header))
+
+    with open(path, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC + struct.pack('<Q', len(header)) + header)
+        for name, array in arrays.items():
+            f.seek(data_start + layout[name]['offset'])
+            f.write(array.view(np.uint8).data if array.size else b'')
+        f.truncate(data_start + size)
+
+
+def attach_snapshot(path, database_id=None):
+    """Map a file written by write_snapshot; the arrays are read-only views of it.
+
+    With a ``database_id``, a file written for another database raises ValueError.
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError(f"{path} is not a stock snapshot")
+    (header_length,) = struct.unpack_from('<Q', buffer, len(SNAPSHOT_MAGIC))
+    header_start = len(SNAPSHOT_MAGIC) + 8
+    header = json.loads(buffer[header_start:header_start + header_length])
+    if database_id is not None and header.get('database_id') != database_id:
+        raise ValueError(f"{path} holds database {header.get('database_id')}, not {database_id}")
+    data_start = _align(header_start + header_length)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        count = int(np.prod(spec['shape']))
+        array = np.frombuffer(buffer, dtype=spec['dtype'], count=count, offset=data_start + spec['offset'])
+        if spec.get('encoding') == 'json':
+            # Decoded into a private object array; only these are not shared
+            arrays[name] = _object_array(array)
+        else:
+            arrays[name] = array.reshape(spec['shape'])
+
+    groups = {group: {} for group in _GROUPS}
+    for name, array in arrays.items():
+        group, _, column = name.partition('/')
+        if group in groups:
+            groups[group][column] = array
+    return StockSnapshot(header['version'], header['columns'], arrays['ids'], **groups)
+
+
+def _lock(lock_file, wait):
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        return True
+    except BlockingIOError:
+        return False
+
+
+class SharedStockSnapshotStore(StockSnapshotStore):
+    """StockSnapshotStore whose generations are memory-mapped files shared by all workers."""
+
+    def __init__(self, load, directory, retry_after=30.0, database_id=None):
+        super().__init__(load, retry_after)
+        self.database_id = database_id
+        if database_id is not None:
+            directory = os.path.join(directory, str(database_id))
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._pointer_path = os.path.join(directory, POINTER_NAME)
+        self._lock_path = os.path.join(directory, LOCK_NAME)
+
+        # File name of the generation self.snapshot maps
+        self._attached = None
+        # stock_version the last stale request asked for
+        self._wanted = None
+        self.attaches = 0
+        self.publishes = 0
+
+        # Start from the published generation, if any, without touching the database
+        self.snapshot = self._attach_published()
+
+    def get(self, version):
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != version:
+            # Another worker may already have published this generation
+            published = self._attach_published()
+            if published is not None and published.version == version:
+                self.snapshot = published
+        self._wanted = version
+        return super().get(version)
+
+    def _attach_published(self):
+        """The generation ``current`` names, mapped; None if there is none yet."""
+        try:
+            with open(self._pointer_path) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        if name == self._attached and self.snapshot is not None:
+            return self.snapshot
+        try:
+            snapshot = attach_snapshot(os.path.join(self.directory, name), self.database_id)
+        except FileNotFoundError:
+            # Superseded and unlinked since the pointer was read; the next call sees the new one
+            return None
+        except ValueError as e:
+            # Written in an older layout or for another database; the next build replaces it
+            print(f"Stock snapshot {name} not attached: {e}")
+            return None
+        self._attached = name
+        self.attaches += 1
+        return snapshot
+
+    def _rebuild(self, wait):
+        with open(self._lock_path, 'a') as lock_file:
+            if not _lock(lock_file, wait):
+                # Another worker is building; attach its generation once published
+                return None
+            # The flock is released when lock_file closes
+            published = self._attach_published()
+            if published is not None and (self._wanted is None or published.version >= self._wanted):
+                return published
+
+            snapshot = super()._rebuild(wait)
+            try:
+                name = self._publish(snapshot)
+            except ValueError as e:
+                # Not representable in the shared layout; serve this worker's copy
+                print(f"Stock snapshot not shared: {e}")
+                return snapshot
+            # Serve from the mapping too, so the builder's private copy is freed
+            shared = attach_snapshot(os.path.join(self.directory, name), self.database_id)
+            self._attached = name
+            return shared
+
+    def _publish(self, snapshot):
+        name = f'stock-{int(snapshot.version)}.snap'
+        path = os.path.join(self.directory, name)
+        temporary = f'{path}.{os.getpid()}.tmp'
+        write_snapshot(snapshot, temporary, self.database_id)
+        os.replace(temporary, path)
+
+        pointer = f'{self._pointer_path}.{os.getpid()}.tmp'
+        with open(pointer, 'w') as f:
+            f.write(name)
+        os.replace(pointer, self._pointer_path)
+        self.publishes += 1
+
+        for old in os.listdir(self.directory):
+            if old != name and _GENERATION_NAME.match(old):
+                try:
+                    os.remove(os.path.join(self.directory, old))
+                except OSError:
+                    # Still mapped on platforms that forbid unlinking open files
+                    pass
+        return name
+
+    def stats(self):
+        return dict(super().stats(), attaches=self.attaches, publishes=self.publishes)
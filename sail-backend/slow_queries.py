@@ -0,0 +1,147 @@
+"""Slow-query log with query plans captured from real traffic.
+
+SlowQueryLog is a repositories driver observer (see ``Driver.observers``).
+Statements that take longer than ``threshold_ms`` are grouped by shape,
+which is the SQL text with whitespace collapsed and ``IN (?, ?, ...)``
+lists folded. Each shape keeps its count, total and maximum time, and the
+shapes of the bound parameters (their types, never the values).
+
+The first time a shape turns up slow, its plan is captured on the same
+connection with the same parameters: ``EXPLAIN QUERY PLAN`` on SQLite,
+``EXPLAIN`` on MySQL. That shows which filter combinations of
+/api/stock/check, or which order listings, miss an index. Observers are
+called once a statement's rows have been read (see repositories), so the
+EXPLAIN never runs while a MySQL result is still unread.
+
+Each slow execution is also logged as a warning on the ``slow_queries``
+logger; ``stats()`` counts them for /metrics.
+"""
+import logging
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+# Statement kinds whose plan is worth capturing
+EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+# Distinct parameter shapes remembered per query shape
+MAX_PARAM_SHAPES = 5
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+_IN_LIST = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)')
+
+
+def query_shape(sql):
+    """Normalized statement text used to group executions."""
+    return _IN_LIST.sub('(...)', _WHITESPACE.sub(' ', sql).strip())
+
+
+def params_shape(params):
+    """Type names of the bound parameters, e.g. 'str, int, NoneType'."""
+    if isinstance(params, dict):
+        return ', '.join(f'{name}: {type(value).__name__}' for name, value in params.items())
+    return ', '.join(type(value).__name__ for value in params or ())
+
+
+class SlowQueryLog:
+    def __init__(self, dialect, threshold_ms=100, max_shapes=500, explain=True):
+        self.dialect = dialect
+        self.threshold = threshold_ms / 1000
+        self.max_shapes = max_shapes
+        self.explain = explain
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.slow = 0
+        self.dropped = 0
+
+    def observe(self, sql, params, seconds, conn=None):
+        if seconds < self.threshold:
+            return
+
+        shape = query_shape(sql)
+        param_shape = params_shape(params)
+        now = datetime.now().isoformat(timespec='seconds')
+        logger.warning("Slow query (%.1f ms, params: %s): %s", seconds * 1000, param_shape or 'none', shape)
+
+        with self._lock:
+            self.slow += 1
+            entry = self._entries.get(shape)
+            first_sighting = entry is None
+            if first_sighting:
+                if len(self._entries) >= self.max_shapes:
+                    self.dropped += 1
+                    return
+                entry = self._entries[shape] = {
+                    'query': shape,
+                    'count': 0,
+                    'total_ms': 0.0,
+                    'max_ms': 0.0,
+                    'first_seen': now,
+                    'last_seen': now,
+                    'param_shapes': [],
+                    'plan': None,
+                    'plan_error': None,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += seconds * 1000
+            entry['max_ms'] = max(entry['max_ms'], seconds * 1000)
+            entry['last_seen'] = now
+            if param_shape not in entry['param_shapes'] and len(entry['param_shapes']) < MAX_PARAM_SHAPES:
+                entry['param_shapes'].append(param_shape)
+
+        if first_sighting and self.explain and conn is not None:
+            plan, error = self._explain(conn, sql, params)
+            with self._lock:
+                entry['plan'] = plan
+                entry['plan_error'] = error
+
+    def _explain(self, conn, sql, params):
+        if not sql.lstrip().upper().startswith(EXPLAINABLE):
+            return None, None
+        prefix = 'EXPLAIN QUERY PLAN ' if self.dialect == 'sqlite' else 'EXPLAIN '
+        cursor = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+            if self.dialect == 'sqlite':
+                # (id, parent, notused, detail)
+                return [row[-1] for row in rows], None
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in rows], None
+        except Exception as e:
+            return None, str(e)
+        finally:
+            if cursor is not None:
+                cursor.close()
+
+    def entries(self):
+        """Logged shapes, slowest in total first."""
+        with self._lock:
+            entries = [dict(entry, param_shapes=list(entry['param_shapes'])) for entry in self._entries.values()]
+        for entry in entries:
+            entry['avg_ms'] = round(entry['total_ms'] / entry['count'], 3)
+            entry['total_ms'] = round(entry['total_ms'], 3)
+            entry['max_ms'] = round(entry['max_ms'], 3)
+        return sorted(entries, key=lambda entry: entry['total_ms'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.dropped = 0
+
+    def stats(self):
+        with self._lock:
+            return {'shapes': len(self._entries), 'slow': self.slow, 'dropped': self.dropped}
+
+    def report(self):
+        return {
+            'threshold_ms': self.threshold * 1000,
+            'shapes': len(self._entries),
+            'dropped': self.dropped,
+            'queries': self.entries(),
+        }
@@ -0,0 +1,194 @@
+"""Long-lived per-thread SQLite connections.
+
+Every thread gets its own connection, opened once and configured with WAL
+journaling and the given synchronous level, page cache size, mmap size and
+busy timeout. Under WAL, readers no longer wait behind the writer, and the
+busy timeout lets concurrent writers queue instead of failing at once.
+
+Handlers keep the usual ``conn = get_connection() ... conn.close()``
+shape: ``close()`` rolls back any unfinished transaction and hands the
+connection back rather than closing it. When a thread exits, its
+connection moves to an idle list and is reused by the next new thread.
+
+Connections are tied to the process that opened them. A forked child
+(e.g. a pre-forking server worker) opens its own on first use and never
+touches, or closes, the ones it inherited.
+
+A statement that fails with "database is locked" is retried only when it
+ran outside a transaction, i.e. in autocommit or as the statement that
+opens the transaction. Inside a transaction the error is raised: replaying
+one statement would not redo the ones before it, so the caller must roll
+back and retry the whole transaction.
+"""
+import os
+import random
+import sqlite3
+import threading
+import time
+import weakref
+
+
+def _is_busy_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def _retry_busy(operation, retries, backoff):
+    # busy_timeout already waits inside SQLite; this covers the cases it
+    # gives up on (e.g. a lock held longer than the timeout)
+    for attempt in range(retries + 1):
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            if attempt == retries or not _is_busy_error(e):
+                raise
+            time.sleep(backoff * (2 ** attempt) * (0.5 + random.random()))
+
+
+def _retry_outside_transaction(conn, operation):
+    if conn.in_transaction:
+        return operation()
+
+    def attempt():
+        try:
+            return operation()
+        except sqlite3.OperationalError as e:
+            # Drop the transaction the statement opened, so the retry
+            # starts from a fresh snapshot
+            if _is_busy_error(e) and conn.in_transaction:
+                conn.rollback()
+            raise
+
+    return _retry_busy(attempt, conn.manager.busy_retries, conn.manager.retry_backoff)
+
+
+class RetryingCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return _retry_outside_transaction(self.connection, lambda: super(RetryingCursor, self).execute(sql, parameters))
+
+    def executemany(self, sql, seq_of_parameters):
+        # Materialize so a retry can replay generators
+        seq_of_parameters = list(seq_of_parameters)
+        return _retry_outside_transaction(
+            self.connection, lambda: super(RetryingCursor, self).executemany(sql, seq_of_parameters)
+        )
+
+
+class PooledSQLiteConnection(sqlite3.Connection):
+    manager = None
+    # Process that opened the connection
+    pid = None
+    closed = False
+
+    def cursor(self, factory=RetryingCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        _retry_busy(super().commit, self.manager.busy_retries, self.manager.retry_backoff)
+
+    def close(self):
+        # Return to the manager instead of closing
+        if self.in_transaction:
+            self.rollback()
+
+    def close_connection(self):
+        self.closed = True
+        super().close()
+
+
+class SQLiteConnectionManager:
+    def __init__(self, db_path, journal_mode='WAL', synchronous='NORMAL', cache_size=-65536,
+                 mmap_size=268435456, busy_timeout_ms=5000, busy_retries=5, retry_backoff=0.02):
+        self.db_path = db_path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.busy_retries = busy_retries
+        self.retry_backoff = retry_backoff
+
+        self._reset()
+        # Connections inherited across a fork; kept referenced so they are
+        # never closed (and their WAL never checkpointed) from the child
+        self._inherited = []
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle = []
+        self._all = weakref.WeakSet()
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            # The lock may have been held by a parent thread at fork time,
+            # so it is replaced rather than acquired
+            self._inherited.extend(self._all)
+            self._reset()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            factory=PooledSQLiteConnection,
+            # A connection only ever serves one thread at a time, but moves to
+            # another thread once its owner has exited
+            check_same_thread=False,
+            cached_statements=256,
+        )
+        conn.manager = self
+        conn.pid = os.getpid()
+        conn.execute(f"PRAGMA journal_mode = {self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        self._all.add(conn)
+        return conn
+
+    def get_connection(self):
+        """Return the calling thread's connection, opening it on first use."""
+        self._check_fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._connect()
+
+        self._local.conn = conn
+        weakref.finalize(threading.current_thread(), self._release, conn)
+        return conn
+
+    def _release(self, conn):
+        # Closed by close_all, or opened by the parent of a forked process
+        if conn.closed or conn.pid != os.getpid():
+            return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._idle.append(conn)
+
+    def stats(self):
+        self._check_fork()
+        with self._lock:
+            idle = len(self._idle)
+        total = len(self._all)
+        return {'open': total, 'idle': idle, 'attached': total - idle}
+
+    def close_all(self):
+        self._check_fork()
+        with self._lock:
+            self._idle.clear()
+        for conn in list(self._all):
+            conn.close_connection()
+        self._local = threading.local()
@@ -0,0 +1,218 @@
+"""Incremental import of a stock export snapshot into stock_data.
+
+Rows are keyed by (PKT, COILNO). The snapshot is diffed against the stored
+keys and row hashes, and only the inserts, updates and deletes are written,
+so a refresh costs in proportion to the churn rather than the table size.
+The export is not unique on (PKT, COILNO), and some rows leave both empty.
+A repeated pair is matched occurrence by occurrence, so every snapshot row
+keeps a stored row of its own; the report counts such rows.
+
+All diffing happens before the write transaction is opened, and the writes
+themselves are applied in one short transaction. Readers of stock_data
+(e.g. /api/stock/check) are therefore never held behind the import.
+
+Command line usage:
+
+    python stock_delta.py path/to/stock-data.csv --backend sqlite --db sail.db
+"""
+import argparse
+import os
+import time
+
+import pandas as pd
+
+from allocation import release_reservations, revalidate_reservations
+from lead_time import refresh_lead_time_profile
+from stock_summary import adjust_stock_summary_by_id
+
+from stock_ingest import (
+    DEFAULT_CHUNKSIZE, INSERT_COLUMNS, ROW_HASH_COLUMN, STOCK_COLUMNS, bump_stock_version, connect_backend,
+    insert_stock_frame, read_stock_chunks, stock_insert_values, stock_row_hashes,
+)
+
+# Ids per DELETE ... WHERE id IN (...) statement
+DELETE_BATCH_SIZE = 500
+
+
+def _stock_keys(frame):
+    return frame['PKT'].str.cat(frame['COILNO'], sep='\x1f')
+
+
+def _row_keys(keys, occurrences):
+    # The n-th row of a (PKT, COILNO) pair in the snapshot is the n-th stored
+    # one, so repeated and empty pairs keep one stored row per snapshot row
+    return keys.str.cat(occurrences.astype(str), sep='\x1f')
+
+
+def load_existing_keys(cursor):
+    """Return a DataFrame of id, key, GRD and row_hash for every stored stock row."""
+    cursor.execute(f"SELECT id, PKT, COILNO, GRD, {ROW_HASH_COLUMN} FROM stock_data ORDER BY id")
+    existing = pd.DataFrame(cursor.fetchall(), columns=['id', 'PKT', 'COILNO', 'GRD', ROW_HASH_COLUMN])
+    keys = _stock_keys(existing.fillna({'PKT': '', 'COILNO': ''}))
+    existing['key'] = _row_keys(keys, keys.groupby(keys).cumcount())
+    # Rows loaded before hashing existed have no hash and always compare as changed
+    existing[ROW_HASH_COLUMN] = existing[ROW_HASH_COLUMN].astype('Int64')
+    return existing[['id', 'key', 'GRD', ROW_HASH_COLUMN]]
+
+
+def diff_snapshot(existing, csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Diff a CSV snapshot against ``existing`` (see load_existing_keys).
+
+    Returns ``(inserts, updates, delete_ids, stats)``. ``inserts`` and
+    ``updates`` are DataFrames of changed rows only; ``updates`` carries the
+    id of the row to overwrite. Rows are matched on (PKT, COILNO) and, when
+    a pair occurs more than once, on its occurrence: the n-th row of the
+    pair in the snapshot against the n-th stored one. Applying the diff
+    therefore leaves stock_data holding exactly the snapshot's rows, as a
+    truncating bulk load would. ``stats`` counts the rows of a repeated pair
+    (``duplicates``) and those with an empty PKT or COILNO (``empty_keys``).
+    """
+    stats = {'snapshot_rows': 0, 'duplicates': 0, 'empty_keys': 0, 'unchanged': 0}
+    existing = existing.set_index('key')
+
+    changed = []
+    snapshot_keys = []
+    # Rows seen so far per (PKT, COILNO), across chunks
+    seen = pd.Series(dtype='int64')
+    for chunk in read_stock_chunks(csv_path, chunksize):
+        keys = _stock_keys(chunk)
+        occurrences = keys.groupby(keys).cumcount() + seen.reindex(keys).fillna(0).astype('int64').to_numpy()
+        seen = seen.add(keys.value_counts(), fill_value=0).astype('int64')
+        chunk = chunk.assign(key=_row_keys(keys, occurrences))
+        stats['snapshot_rows'] += len(chunk)
+        stats['empty_keys'] += int(((chunk['PKT'] == '') | (chunk['COILNO'] == '')).sum())
+        snapshot_keys.append(chunk['key'])
+
+        stored = existing.reindex(chunk['key'])
+        is_unchanged = stored[ROW_HASH_COLUMN].eq(stock_row_hashes(chunk)).fillna(False).to_numpy(dtype=bool)
+        stats['unchanged'] += int(is_unchanged.sum())
+
+        chunk = chunk.loc[~is_unchanged]
+        if len(chunk):
+            changed.append(chunk.assign(id=stored.loc[~is_unchanged, 'id'].to_numpy()))
+
+    stats['duplicates'] = int((seen[seen > 1]).sum())
+    snapshot_keys = pd.concat(snapshot_keys) if snapshot_keys else pd.Series(dtype=object)
+    changed = pd.concat(changed) if changed else pd.DataFrame(columns=STOCK_COLUMNS + ['key', 'id'])
+
+    inserts = changed.loc[changed['id'].isna()]
+    updates = changed.loc[changed['id'].notna()]
+    delete_ids = existing.loc[~existing.index.isin(snapshot_keys), 'id'].tolist()
+    return inserts, updates, delete_ids, stats
+
+
+def affected_grades(existing, inserts, updates, delete_ids):
+    """Grades whose stock rows a diff adds, changes or removes."""
+    changed_ids = set(updates['id']) | set(delete_ids)
+    old_grades = existing.loc[existing['id'].isin(changed_ids), 'GRD']
+    return set(inserts['GRD']) | set(updates['GRD']) | set(old_grades)
+
+
+def apply_delta(conn, inserts, updates, delete_ids, placeholder='?', grades=None):
+    """Apply a diff from diff_snapshot in one transaction.
+
+    ``grades`` are the grades the diff touches (see affected_grades); their
+    lead-time profile is refreshed in the same transaction. stock_summary
+    is adjusted by the changed rows only. Reservations of updated coils are
+    revalidated (see revalidate_reservations) before they are added back.
+    """
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(delete_ids), DELETE_BATCH_SIZE):
+            batch = delete_ids[start:start + DELETE_BATCH_SIZE]
+            # Subtracted as stored, reservations included, before they go
+            adjust_stock_summary_by_id(cursor, placeholder, batch, -1)
+            cursor.execute(
+                f"DELETE FROM stock_data WHERE id IN ({', '.join([placeholder] * len(batch))})",
+                [int(stock_id) for stock_id in batch]
+            )
+            # Coils gone from the snapshot can no longer be allocated
+            release_reservations(cursor, placeholder, batch)
+
+        if len(updates):
+            assignments = ', '.join(f"{column} = {placeholder}" for column in INSERT_COLUMNS)
+            values = stock_insert_values(updates).tolist()
+            ids = [int(stock_id) for stock_id in updates['id']]
+            adjust_stock_summary_by_id(cursor, placeholder, ids, -1)
+            cursor.executemany(
+                f"UPDATE stock_data SET {assignments} WHERE id = {placeholder}",
+                [row + [stock_id] for row, stock_id in zip(values, ids)]
+            )
+            # A coil whose SAL or weight changed may no longer cover its reservation
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                revalidate_reservations(cursor, placeholder, ids[start:start + DELETE_BATCH_SIZE])
+            adjust_stock_summary_by_id(cursor, placeholder, ids)
+
+        if len(inserts):
+            insert_stock_frame(cursor, inserts, placeholder)
+
+        if grades:
+            refresh_lead_time_profile(cursor, placeholder, grades)
+        if len(delete_ids) or len(updates) or len(inserts):
+            bump_stock_version(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def import_stock_delta(conn, csv_path, placeholder='?', chunksize=DEFAULT_CHUNKSIZE, dry_run=False):
+    """Bring stock_data in line with the snapshot at ``csv_path``.
+
+    Returns a report of inserted, updated, deleted, unchanged, duplicate
+    and empty-key row counts plus the time spent diffing and writing.
+    """
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        existing = load_existing_keys(cursor)
+    finally:
+        cursor.close()
+    # End the read so the diff below holds no snapshot or lock open
+    conn.rollback()
+
+    inserts, updates, delete_ids, stats = diff_snapshot(existing, csv_path, chunksize)
+    diffed = time.perf_counter()
+
+    grades = affected_grades(existing, inserts, updates, delete_ids)
+    if not dry_run:
+        apply_delta(conn, inserts, updates, delete_ids, placeholder, grades)
+
+    return {
+        'inserted': len(inserts),
+        'updated': len(updates),
+        'deleted': len(delete_ids),
+        'unchanged': stats['unchanged'],
+        'duplicates': stats['duplicates'],
+        'empty_keys': stats['empty_keys'],
+        'snapshot_rows': stats['snapshot_rows'],
+        'affected_grades': len(grades),
+        'diff_seconds': round(diffed - started, 3),
+        'write_seconds': round(time.perf_counter() - diffed, 3),
+        'dry_run': dry_run,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a stock export snapshot to stock_data as a delta")
+    parser.add_argument('csv_path')
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--db', default=os.environ.get('SQLITE_DB_PATH', 'sail.db'), help="SQLite database path")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--dry-run', action='store_true', help="Report the changes without writing them")
+    args = parser.parse_args(argv)
+
+    conn, placeholder = connect_backend(args.backend, args.db)
+    try:
+        report = import_stock_delta(conn, args.csv_path, placeholder, args.chunksize, args.dry_run)
+    finally:
+        conn.close()
+
+    for name, value in report.items():
+        print(f"{name}: {value}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+"""Bulk ingestion of the stock export CSV into the stock_data table.
+
+The CSV is read in bounded-memory chunks with explicit dtypes and written
+with multi-row INSERT statements inside a single transaction. The same code
+path serves the SQLite backend (sqlite3, ``?`` params) and the MySQL backend
+(mysql-connector, ``%s`` params). The stock_data table must already exist;
+it is created by ``init_database()`` in the backend apps.
+
+Command line usage:
+
+    python stock_ingest.py --backend sqlite --db sail.db
+    python stock_ingest.py path/to/stock-data.csv --backend mysql --truncate
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+
+from allocation import release_reservations
+from lead_time import refresh_lead_time_profile
+from stock_summary import adjust_stock_summary, clear_stock_summary
+
+# Column order of the stock export and of the stock_data table
+STOCK_COLUMNS = [
+    'TYP', 'DTP', 'PKT', 'GRD', 'FIN', 'THK', 'WIDT', 'LNGT', 'PWT', 'QLY',
+    'EDGE', 'ASP', 'HRC1', 'BL', 'SAL', 'STORE', 'NICKEL', 'COILNO'
+]
+
+# Every stock column is stored as text. Reading them as str skips pandas'
+# type inference, so '2' stays '2' and 'FALSE' never becomes a bool.
+STOCK_DTYPES = {column: str for column in STOCK_COLUMNS}
+
+# Content hash of the export columns, used by the delta importer to spot
+# changed rows without comparing every column
+ROW_HASH_COLUMN = 'row_hash'
+
+# Typed copies of the numeric export columns, for range and tolerance
+# searches (NULL where the text is not a number)
+NUMERIC_SHADOW_COLUMNS = {
+    'THK': 'thk_num',
+    'WIDT': 'widt_num',
+    'LNGT': 'lngt_num',
+    'PWT': 'pwt_num',
+    'NICKEL': 'nickel_num',
+}
+
+INSERT_COLUMNS = STOCK_COLUMNS + [ROW_HASH_COLUMN] + list(NUMERIC_SHADOW_COLUMNS.values())
+
+DEFAULT_CHUNKSIZE = 50000
+
+# Rows per INSERT statement, bounded by the engine's bound-parameter limit
+MYSQL_ROWS_PER_STATEMENT = 1000
+SQLITE_MAX_VARIABLES = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+DEFAULT_CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Sail - Copy', 'data', 'stock-data.csv')
+
+
+def read_stock_chunks(csv_path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield DataFrames of at most ``chunksize`` rows in STOCK_COLUMNS order."""
+    reader = pd.read_csv(
+        csv_path,
+        dtype=STOCK_DTYPES,
+        usecols=lambda column: column in STOCK_COLUMNS,
+        keep_default_na=False,
+        chunksize=chunksize,
+    )
+    for chunk in reader:
+        # Columns missing from the export are stored as empty strings
+        yield chunk.reindex(columns=STOCK_COLUMNS, fill_value='')
+
+
+def bump_stock_version(cursor):
+    """Advance the stock_version counter; call in every stock_data write transaction."""
+    cursor.execute("UPDATE stock_meta SET value = value + 1 WHERE name = 'stock_version'")
+
+
+def read_stock_version(cursor):
+    """Return the current stock_version counter (0 if it does not exist yet)."""
+    cursor.execute("SELECT value FROM stock_meta WHERE name = 'stock_version'")
+    row = cursor.fetchone()
+    if row is None:
+        return 0
+    return row['value'] if isinstance(row, dict) else row[0]
+
+
+def stock_row_hashes(frame):
+    """Return a signed 64-bit content hash per row of the export columns."""
+    hashes = pd.util.hash_pandas_object(frame[STOCK_COLUMNS], index=False)
+    # Both engines store signed 64-bit integers
+    return hashes.to_numpy().view('int64')
+
+
+def parse_numeric(values):
+    """Float array of text values such as '1,250' or ' 0.4'; NaN where not a number."""
+    text = pd.Series(values, dtype=object).astype(str).str.replace(',', '', regex=False).str.strip()
+    return pd.to_numeric(text, errors='coerce').to_numpy(dtype=float)
+
+
+def stock_numeric_values(frame):
+    """Object array of the NUMERIC_SHADOW_COLUMNS values (floats, None for NULL)."""
+    numeric = np.column_stack([parse_numeric(frame[column]) for column in NUMERIC_SHADOW_COLUMNS])
+    values = numeric.astype(object)
+    values[np.isnan(numeric)] = None
+    return values
+
+
+def stock_insert_values(frame):
+    """Return an object array of INSERT_COLUMNS values with native Python types."""
+    values = np.empty((len(frame), len(INSERT_COLUMNS)), dtype=object)
+    values[:, :len(STOCK_COLUMNS)] = frame[STOCK_COLUMNS].to_numpy(dtype=object)
+    # tolist() turns numpy int64 into int, which both DB drivers can bind
+    values[:, len(STOCK_COLUMNS)] = stock_row_hashes(frame).tolist()
+    values[:, len(STOCK_COLUMNS) + 1:] = stock_numeric_values(frame)
+    return values
+
+
+def backfill_numeric_columns(cursor, placeholder='?'):
+    """Fill NUMERIC_SHADOW_COLUMNS of every stock_data row from its text columns.
+
+    Uses the same parsing as ingest. Does not commit. Returns the row count.
+    """
+    text_columns = list(NUMERIC_SHADOW_COLUMNS)
+    cursor.execute(f"SELECT id, {', '.join(text_columns)} FROM stock_data")
+    frame = pd.DataFrame(cursor.fetchall(), columns=['id'] + text_columns)
+    if not len(frame):
+        return 0
+
+    assignments = ', '.join(f"{column} = {placeholder}" for column in NUMERIC_SHADOW_COLUMNS.values())
+    ids = frame['id'].astype(int).tolist()
+    cursor.executemany(
+        f"UPDATE stock_data SET {assignments} WHERE id = {placeholder}",
+        [row + [stock_id] for row, stock_id in zip(stock_numeric_values(frame).tolist(), ids)]
+    )
+    return len(frame)
+
+
+def _rows_per_statement(placeholder):
+    if placeholder == '?':
+        return SQLITE_MAX_VARIABLES // len(INSERT_COLUMNS)
+    return MYSQL_ROWS_PER_STATEMENT
+
+
+def _insert_statement(row_count, placeholder):
+    row = '(' + ', '.join([placeholder] * len(INSERT_COLUMNS)) + ')'
+    return (
+        f"INSERT INTO stock_data ({', '.join(INSERT_COLUMNS)}) VALUES "
+        + ', '.join([row] * row_count)
+    )
+
+
+def insert_stock_frame(cursor, frame, placeholder='?', rows_per_statement=None):
+    """Insert a DataFrame in STOCK_COLUMNS order with multi-row INSERTs.
+
+    The rows are added to stock_summary too. Does not commit; the caller
+    owns the transaction. Returns the row count.
+    """
+    rows_per_statement = rows_per_statement or _rows_per_statement(placeholder)
+    values = stock_insert_values(frame)
+    statements = {}
+
+    for start in range(0, len(values), rows_per_statement):
+        batch = values[start:start + rows_per_statement]
+        if len(batch) not in statements:
+            statements[len(batch)] = _insert_statement(len(batch), placeholder)
+        cursor.execute(statements[len(batch)], batch.ravel().tolist())
+
+    # Parsed dimensions as just inserted
+    summary = frame[['GRD', 'FIN', 'SAL']].assign(**{
+        column: values[:, INSERT_COLUMNS.index(column)] for column in ('thk_num', 'pwt_num')
+    })
+    adjust_stock_summary(cursor, placeholder, summary)
+    return len(values)
+
+
+def bulk_load_stock(conn, csv_path, placeholder='?', chunksize=DEFAULT_CHUNKSIZE, truncate=False, on_chunk=None):
+    """Load ``csv_path`` into stock_data in one transaction.
+
+    ``placeholder`` is ``'?'`` for sqlite3 and ``'%s'`` for mysql-connector.
+    ``on_chunk(rows_so_far)`` is called after each chunk is written. The
+    transaction is committed on success and rolled back on any error.
+    """
+    cursor = conn.cursor()
+    total = 0
+    grades = set()
+    try:
+        if truncate:
+            cursor.execute("DELETE FROM stock_data")
+            release_reservations(cursor, placeholder)
+            clear_stock_summary(cursor)
+
+        for chunk in read_stock_chunks(csv_path, chunksize):
+            total += insert_stock_frame(cursor, chunk, placeholder)
+            grades.update(chunk['GRD'].unique())
+            if on_chunk:
+                on_chunk(total)
+
+        # Derived tables and the stock version change in the same transaction
+        refresh_lead_time_profile(cursor, placeholder, None if truncate else grades)
+        bump_stock_version(cursor)
+        conn.commit()
+        return total
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def connect_backend(backend, db_path):
+    """Open a connection for the CLI tools and return it with its placeholder."""
+    if backend == 'sqlite':
+        return sqlite3.connect(db_path), '?'
+
+    import mysql.connector
+    conn = mysql.connector.connect(
+        host=os.environ.get('MYSQL_HOST', 'localhost'),
+        user=os.environ.get('MYSQL_USER', 'root'),
+        password=os.environ.get('MYSQL_PASSWORD', '6562'),
+        database=os.environ.get('MYSQL_DATABASE', 'my_app_db'),
+    )
+    return conn, '%s'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk load a stock export CSV into stock_data")
+    parser.add_argument('csv_path', nargs='?', default=DEFAULT_CSV_PATH)
+    parser.add_argument('--backend', choices=['sqlite', 'mysql'], default='sqlite')
+    parser.add_argument('--db', default=os.environ.get('SQLITE_DB_PATH', 'sail.db'), help="SQLite database path")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--truncate', action='store_true', help="Delete existing stock rows first (same transaction)")
+    args = parser.parse_args(argv)
+
+    conn, placeholder = connect_backend(args.backend, args.db)
+    started = time.perf_counter()
+
+    def report(rows):
+        elapsed = time.perf_counter() - started
+        print(f"  {rows} rows, {rows / elapsed if elapsed else 0:,.0f} rows/sec")
+
+    try:
+        total = bulk_load_stock(conn, args.csv_path, placeholder, args.chunksize, args.truncate, report)
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {total} rows in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f} rows/sec)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+"""Filters of /api/stock/check.
+
+Grade and finish match their text columns exactly. The dimensions use the
+typed shadow columns added in migration 8 (see NUMERIC_SHADOW_COLUMNS in
+stock_ingest), so ``thickness=2`` matches a coil stored as '2.0'. The
+supported parameters are:
+
+* ``thickness``, ``width``, ``length``: the target size. A value that is not
+  a number falls back to text equality.
+* ``thk_tol``, ``width_tol``, ``length_tol``: accept the target +/- the
+  tolerance. Results are ordered nearest fit first.
+* ``<dim>_min`` / ``<dim>_max`` for thk, width, length, pwt and nickel:
+  inclusive bounds.
+
+Matching rows come back with the columns of STOCK_RESULT_COLUMNS: the id
+and the export columns, never the row hash or the typed shadow columns.
+
+Every condition is a range on an indexed REAL/DOUBLE column, so the
+filtering, and the nearest-fit ordering, run inside the database. The same
+search is described engine-independently by stock_search_terms, which the
+in-memory StockSnapshot (stock_snapshot.py) evaluates with NumPy masks.
+"""
+import math
+from collections import OrderedDict
+
+from stock_ingest import STOCK_COLUMNS
+
+# Columns of a search result, in this order, for both the SQL path and
+# StockSnapshot
+STOCK_RESULT_COLUMNS = ['id'] + STOCK_COLUMNS
+
+# Exact-match text filters: parameter -> column
+TEXT_FILTERS = OrderedDict([
+    ('grade', 'GRD'),
+    ('finish', 'FIN'),
+])
+
+# Numeric dimensions: parameter prefix -> (numeric column, text column, target parameter)
+NUMERIC_FILTERS = OrderedDict([
+    ('thk', ('thk_num', 'THK', 'thickness')),
+    ('width', ('widt_num', 'WIDT', 'width')),
+    ('length', ('lngt_num', 'LNGT', 'length')),
+    ('pwt', ('pwt_num', 'PWT', None)),
+    ('nickel', ('nickel_num', 'NICKEL', None)),
+])
+
+# Every query parameter /api/stock/check understands
+STOCK_FILTER_PARAMS = list(TEXT_FILTERS) + [
+    name
+    for prefix, (_, _, target) in NUMERIC_FILTERS.items()
+    for name in ([target, f'{prefix}_tol'] if target else []) + [f'{prefix}_min', f'{prefix}_max']
+]
+
+
+# Slack on tolerance bounds, so 0.35 +/- 0.05 still includes a stored 0.4
+TOLERANCE_EPSILON = 1e-9
+
+
+class StockFilterError(ValueError):
+    """Raised for a malformed or inconsistent /api/stock/check parameter."""
+
+
+def _parse_number(value):
+    """Float of a text value such as '1,250' (as ingest parses it); None if not a finite number."""
+    try:
+        number = float(str(value).replace(',', '').strip())
+    except ValueError:
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _number(name, value):
+    number = _parse_number(value)
+    if number is None:
+        raise StockFilterError(f"{name} must be a finite number")
+    return number
+
+
+def parse_stock_filters(args):
+    """Normalized filters from request args; empty values are ignored.
+
+    The result is a dict of parameter -> value, where numeric values are
+    floats. Equal searches produce equal dicts, so it doubles as a cache
+    key (see filters_key).
+    """
+    filters = {}
+    for name in TEXT_FILTERS:
+        if args.get(name):
+            filters[name] = args.get(name)
+
+    for prefix, (_, _, target) in NUMERIC_FILTERS.items():
+        if target and args.get(target):
+            # Non-numeric targets keep their old exact text match
+            number = _parse_number(args.get(target))
+            filters[target] = args.get(target) if number is None else number
+
+        tolerance_name = f'{prefix}_tol'
+        if target and args.get(tolerance_name):
+            tolerance = _number(tolerance_name, args.get(tolerance_name))
+            if tolerance < 0:
+                raise StockFilterError(f"{tolerance_name} must not be negative")
+            if not isinstance(filters.get(target), float):
+                raise StockFilterError(f"{tolerance_name} needs a numeric {target}")
+            filters[tolerance_name] = tolerance
+
+        for bound in ('min', 'max'):
+            name = f'{prefix}_{bound}'
+            if args.get(name):
+                filters[name] = _number(name, args.get(name))
+        if filters.get(f'{prefix}_min', -math.inf) > filters.get(f'{prefix}_max', math.inf):
+            raise StockFilterError(f"{prefix}_min must not exceed {prefix}_max")
+
+    return filters
+
+
+def filters_key(filters):
+    return tuple(sorted(filters.items()))
+
+
+def stock_search_terms(filters):
+    """Conditions and nearest-fit ordering of ``filters``, independent of the engine.
+
+    Returns ``(conditions, nearest)``: conditions are ``(column, op, values)``
+    with op one of '=', 'BETWEEN', '>=', '<='; ``nearest`` lists
+    ``(numeric column, target)`` pairs, ordered by distance to the target.
+    stock_search_query renders them as SQL, StockSnapshot as array masks.
+    """
+    conditions = []
+    nearest = []
+
+    for name, column in TEXT_FILTERS.items():
+        if name in filters:
+            conditions.append((column, '=', (filters[name],)))
+
+    for prefix, (numeric_column, text_column, target) in NUMERIC_FILTERS.items():
+        value = filters.get(target) if target else None
+        if isinstance(value, str):
+            conditions.append((text_column, '=', (value,)))
+        elif value is not None:
+            tolerance = filters.get(f'{prefix}_tol', 0.0)
+            if tolerance:
+                slack = TOLERANCE_EPSILON * max(1.0, abs(value))
+                conditions.append((numeric_column, 'BETWEEN', (value - tolerance - slack, value + tolerance + slack)))
+                nearest.append((numeric_column, value))
+            else:
+                conditions.append((numeric_column, '=', (value,)))
+
+        if f'{prefix}_min' in filters:
+            conditions.append((numeric_column, '>=', (filters[f'{prefix}_min'],)))
+        if f'{prefix}_max' in filters:
+            conditions.append((numeric_column, '<=', (filters[f'{prefix}_max'],)))
+
+    return conditions, nearest
+
+
+def stock_search_query(filters, placeholder='?'):
+    """Build (sql, params) selecting the stock_data rows matching ``filters``."""
+    conditions, nearest = stock_search_terms(filters)
+    clauses = []
+    params = []
+    for column, op, values in conditions:
+        if op == 'BETWEEN':
+            clauses.append(f"{column} BETWEEN {placeholder} AND {placeholder}")
+        else:
+            clauses.append(f"{column} {op} {placeholder}")
+        params += values
+
+    sql = f"SELECT {', '.join(STOCK_RESULT_COLUMNS)} FROM stock_data"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if nearest:
+        # Nearest fit first, thickness before width before length
+        sql += " ORDER BY " + ", ".join(f"ABS({column} - {placeholder})" for column, _ in nearest) + ", id"
+        params += [target for _, target in nearest]
+    return sql, params
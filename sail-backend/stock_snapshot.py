@@ -0,0 +1,258 @@
+"""In-process columnar snapshot of stock_data.
+
+stock_data is read-mostly: it only changes on import, and every write bumps
+stock_version. StockSnapshot holds the whole table as NumPy arrays:
+
+* ``id`` as int64,
+* the typed dimension columns (thk_num, widt_num, ...) as float64, with NaN
+  for NULL,
+* every other column dictionary-encoded: an integer code per row plus one
+  array of distinct values. Codes use the narrowest integer type that fits.
+  GRD, FIN, SAL, QLY and EDGE have a handful of values each, so they cost
+  one byte per row.
+
+Searches take the same parsed filters as the SQL path (see
+stock_search.stock_search_terms). A text match compares codes against one
+dictionary lookup, and ranges compare the float arrays. Each condition is a
+vectorized boolean mask over all rows, and the masks are ANDed together.
+Only the matching rows are decoded into dicts. Dashboard aggregates are
+not computed here: they read the maintained stock_summary table.
+
+Results carry STOCK_RESULT_COLUMNS only, as the SQL path returns them;
+the typed columns are there for filtering.
+
+StockSnapshotStore keeps the current snapshot. When a request sees a newer
+stock_version, the store rebuilds the snapshot in a background thread and
+swaps it in with a single reference assignment. Readers therefore see
+either the old snapshot or the new one, never a mix. Until the rebuild is
+done, ``get()`` returns None and callers answer from SQL.
+
+Text filters match exactly, as SQLite's default BINARY collation does.
+"""
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from serialization import layout_for
+from stock_ingest import NUMERIC_SHADOW_COLUMNS
+from stock_search import STOCK_RESULT_COLUMNS, stock_search_terms
+
+# Float columns; the other non-id columns are dictionary-encoded
+NUMERIC_COLUMNS = frozenset(NUMERIC_SHADOW_COLUMNS.values())
+
+
+def _dictionary(values):
+    """Distinct values as a compact array: fixed-width str or int64 when possible."""
+    values = np.asarray(values)
+    if values.dtype == object:
+        kinds = {type(value) for value in values}
+        if kinds <= {str}:
+            return values.astype(str)
+        if kinds <= {int}:
+            return values.astype(np.int64)
+    return values
+
+
+def _code_dtype(cardinality):
+    """Narrowest signed integer type holding codes 0..cardinality-1 and -1 (NULL)."""
+    for dtype in (np.int8, np.int16, np.int32):
+        if cardinality <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def _decode(dictionary, codes):
+    """Values of ``codes`` as Python objects; code -1 is NULL."""
+    if not len(dictionary):
+        return [None] * len(codes)
+    values = dictionary.take(codes)
+    nulls = codes < 0
+    if nulls.any():
+        values = values.astype(object)
+        values[nulls] = None
+    return values.tolist()
+
+
+def _floats(values):
+    nulls = np.isnan(values)
+    if not nulls.any():
+        return values.tolist()
+    values = values.astype(object)
+    values[nulls] = None
+    return values.tolist()
+
+
+class StockSnapshot:
+    def __init__(self, version, columns, ids, codes, dictionaries, numbers):
+        self.version = version
+        # Result columns, in STOCK_RESULT_COLUMNS order; any other loaded
+        # column is only searched
+        self.columns = tuple(column for column in STOCK_RESULT_COLUMNS if column in columns)
+        self.ids = ids
+        self.codes = codes
+        self.dictionaries = dictionaries
+        self.numbers = numbers
+        self.rows = len(ids)
+        self._lookups = {}
+
+    @classmethod
+    def from_frame(cls, frame, version):
+        """Encode a DataFrame of stock_data rows (see StockRepo.snapshot for its columns)."""
+        ids = frame['id'].to_numpy(dtype=np.int64)
+        codes = {}
+        dictionaries = {}
+        numbers = {}
+        for column in frame.columns:
+            if column == 'id':
+                continue
+            if column in NUMERIC_COLUMNS:
+                numbers[column] = pd.to_numeric(frame[column], errors='coerce').to_numpy(dtype=np.float64)
+            else:
+                column_codes, uniques = pd.factorize(frame[column])
+                codes[column] = column_codes.astype(_code_dtype(len(uniques)))
+                dictionaries[column] = _dictionary(uniques)
+        return cls(version, frame.columns, ids, codes, dictionaries, numbers)
+
+    @property
+    def nbytes(self):
+        arrays = [self.ids, *self.codes.values(), *self.dictionaries.values(), *self.numbers.values()]
+        return sum(array.nbytes for array in arrays)
+
+    def code(self, column, value):
+        """Dictionary code of ``value`` in ``column``, or None if no row has it."""
+        lookup = self._lookups.get(column)
+        if lookup is None:
+            lookup = self._lookups[column] = {value: code for code, value in enumerate(self.dictionaries[column].tolist())}
+        return lookup.get(value)
+
+    def _condition(self, column, op, values):
+        if column in self.numbers:
+            data = self.numbers[column]
+            if op == '=':
+                return data == values[0]
+            if op == 'BETWEEN':
+                return (data >= values[0]) & (data <= values[1])
+            if op == '>=':
+                return data >= values[0]
+            if op == '<=':
+                return data <= values[0]
+            raise ValueError(f"Unsupported operator {op!r}")
+
+        if op != '=':
+            raise ValueError(f"{column} only supports equality")
+        code = self.code(column, values[0])
+        if code is None:
+            return np.zeros(self.rows, dtype=bool)
+        return self.codes[column] == code
+
+    def select(self, filters):
+        """Row positions matching ``filters``, in id order or nearest fit first."""
+        conditions, nearest = stock_search_terms(filters)
+        mask = None
+        for column, op, values in conditions:
+            condition = self._condition(column, op, values)
+            mask = condition if mask is None else np.logical_and(mask, condition, out=mask)
+        # One flatnonzero over the combined mask beats narrowing row by row
+        index = np.arange(self.rows) if mask is None else np.flatnonzero(mask)
+
+        if nearest and len(index):
+            # Same order as the SQL path: distance per dimension, then id
+            keys = [np.abs(self.numbers[column][index] - target) for column, target in nearest]
+            index = index[np.lexsort([self.ids[index]] + keys[::-1])]
+        return index
+
+    def to_dicts(self, index):
+        """Rows at positions ``index`` as dicts, with the types SQL returns."""
+        values = []
+        for column in self.columns:
+            if column == 'id':
+                values.append(self.ids[index].tolist())
+            elif column in self.numbers:
+                values.append(_floats(self.numbers[column][index]))
+            else:
+                values.append(_decode(self.dictionaries[column], self.codes[column][index]))
+        return layout_for(self.columns).to_dicts(zip(*values))
+
+    def search(self, filters):
+        """Stock rows matching parsed /api/stock/check filters (see StockRepo.search)."""
+        return self.to_dicts(self.select(filters))
+
+
+class StockSnapshotStore:
+    """The current StockSnapshot, rebuilt from ``load()`` when stock_version moves."""
+
+    def __init__(self, load, retry_after=30.0):
+        self.load = load
+        self.retry_after = retry_after
+        self.snapshot = None
+
+        # Held for the duration of a build; at most one runs at a time
+        self._building = threading.Lock()
+        self._failed_at = None
+        self.builds = 0
+        self.build_seconds = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def get(self, version):
+        """The snapshot at ``version``, or None (answer from SQL) while it is rebuilt."""
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version == version:
+            self.hits += 1
+            return snapshot
+        self.misses += 1
+        self.refresh()
+        return None
+
+    def refresh(self, wait=False):
+        """Rebuild the snapshot, in the background unless ``wait``.
+
+        Does nothing if a build is already running, or if the last one
+        failed less than ``retry_after`` seconds ago.
+        """
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry_after:
+            return
+        if not self._building.acquire(blocking=wait):
+            return
+        if wait:
+            self._build(wait)
+        else:
+            threading.Thread(target=self._build, args=(wait,), name='stock-snapshot', daemon=True).start()
+
+    def _build(self, wait):
+        try:
+            snapshot = self._rebuild(wait)
+            if snapshot is not None:
+                # Readers pick up the new generation with one reference swap
+                self.snapshot = snapshot
+            self._failed_at = None
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            self.errors += 1
+            print(f"Stock snapshot build error: {e}")
+        finally:
+            self._building.release()
+
+    def _rebuild(self, wait):
+        """The next snapshot to swap in, or None to keep the current one."""
+        started = time.perf_counter()
+        snapshot = self.load()
+        self.builds += 1
+        self.build_seconds = round(time.perf_counter() - started, 3)
+        return snapshot
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            'version': snapshot.version if snapshot else None,
+            'rows': snapshot.rows if snapshot else 0,
+            'bytes': snapshot.nbytes if snapshot else 0,
+            'builds': self.builds,
+            'build_seconds': self.build_seconds,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+        }
@@ -0,0 +1,151 @@
+"""Materialized stock totals per grade, finish, thickness band and SAL category.
+
+Dashboards read coil counts and PWT totals from stock_summary. It holds one
+row per (grade, finish, thk_band, sal_category), with the coils and weight
+in stock and the part of them reserved for orders. The table grows with
+the number of distinct groups, not with the inventory, so reading it costs
+the same however many coils stock_data holds.
+
+The table is never recomputed from stock_data. Every writer adds the
+difference it makes, inside its own transaction:
+
+* inserted stock rows are added (insert_stock_frame),
+* deleted and updated rows are subtracted as stored before the write, and
+  updated rows added back after it, with their reservations released or
+  reweighed to match (apply_delta),
+* a truncating bulk load clears it along with stock_data,
+* a reservation moves its coil into reserved_coils and reserved_pwt
+  (AllocationsRepo.allocate).
+
+Thickness bands are those of the lead-time profile; a non-numeric thickness
+falls in band '*'. SAL categories follow the lead-time SAL rules.
+"""
+import numpy as np
+import pandas as pd
+
+from lead_time import sal_rule_conditions, thickness_bands
+
+# SAL category per lead_time.sal_rule_conditions entry ('TRUE', then SAL_RULES)
+SAL_CATEGORIES = ['AVAILABLE', 'SLAB', 'HRC', 'WIP']
+OTHER_SAL_CATEGORY = 'OTHER'
+
+SUMMARY_KEY = ['grade', 'finish', 'thk_band', 'sal_category']
+SUMMARY_VALUES = ['coils', 'total_pwt', 'reserved_coils', 'reserved_pwt']
+
+# Ids per IN (...) list when reading stored rows
+ID_BATCH_SIZE = 500
+
+
+def sal_categories(sal):
+    """Vectorized SAL category labels."""
+    return np.select(sal_rule_conditions(sal), SAL_CATEGORIES, OTHER_SAL_CATEGORY).astype(object)
+
+
+def summary_deltas(stock, sign=1):
+    """Per-group changes from adding (``sign`` 1) or removing (-1) ``stock`` rows.
+
+    ``stock`` is a DataFrame with GRD, FIN, SAL, thk_num and pwt_num
+    columns, plus an optional boolean ``reserved``.
+    """
+    weights = pd.to_numeric(stock['pwt_num'], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+    if 'reserved' in stock:
+        reserved = stock['reserved'].fillna(False).to_numpy(dtype=bool)
+    else:
+        reserved = np.zeros(len(stock), dtype=bool)
+
+    rows = pd.DataFrame({
+        'grade': stock['GRD'].fillna('').to_numpy(dtype=object),
+        'finish': stock['FIN'].fillna('').to_numpy(dtype=object),
+        'thk_band': thickness_bands(stock['thk_num']),
+        'sal_category': sal_categories(stock['SAL']),
+        'coils': 1,
+        'total_pwt': weights,
+        'reserved_coils': reserved.astype(int),
+        'reserved_pwt': np.where(reserved, weights, 0.0),
+    })
+    # Sorted groups, so concurrent writers lock summary rows in the same order
+    deltas = rows.groupby(SUMMARY_KEY, sort=True)[SUMMARY_VALUES].sum()
+    return (deltas * sign).reset_index()
+
+
+def apply_summary_deltas(cursor, placeholder, deltas):
+    """Add ``deltas`` (see summary_deltas) to stock_summary; does not commit."""
+    if not len(deltas):
+        return 0
+    if placeholder == '?':
+        upsert = f"ON CONFLICT ({', '.join(SUMMARY_KEY)}) DO UPDATE SET " + ', '.join(
+            f"{column} = {column} + excluded.{column}" for column in SUMMARY_VALUES
+        )
+    else:
+        # Row alias instead of the deprecated VALUES(column) (MySQL 8.0.19+)
+        upsert = "AS new ON DUPLICATE KEY UPDATE " + ', '.join(
+            f"{column} = {column} + new.{column}" for column in SUMMARY_VALUES
+        )
+    columns = SUMMARY_KEY + SUMMARY_VALUES
+    cursor.executemany(
+        f"INSERT INTO stock_summary ({', '.join(columns)}, updated_at) "
+        f"VALUES ({', '.join([placeholder] * len(columns))}, CURRENT_TIMESTAMP) "
+        f"{upsert}, updated_at = CURRENT_TIMESTAMP",
+        deltas[columns].astype(object).to_numpy().tolist()
+    )
+    if (deltas['coils'] < 0).any():
+        # Groups whose last coil went; also drops rounding residue in total_pwt
+        cursor.execute("DELETE FROM stock_summary WHERE coils <= 0")
+    return len(deltas)
+
+
+def adjust_stock_summary(cursor, placeholder, stock, sign=1):
+    """Add (``sign`` 1) or subtract (-1) the rows of a ``stock`` DataFrame."""
+    return apply_summary_deltas(cursor, placeholder, summary_deltas(stock, sign))
+
+
+def _stored_rows(cursor, placeholder, stock_ids=None):
+    columns = ['GRD', 'FIN', 'SAL', 'thk_num', 'pwt_num', 'reserved']
+    sql = (
+        "SELECT s.GRD, s.FIN, s.SAL, s.thk_num, s.pwt_num, r.stock_id IS NOT NULL FROM stock_data s "
+        "LEFT JOIN stock_reservations r ON r.stock_id = s.id"
+    )
+    if stock_ids is None:
+        cursor.execute(sql)
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    stock_ids = [int(stock_id) for stock_id in stock_ids]
+    frames = []
+    for start in range(0, len(stock_ids), ID_BATCH_SIZE):
+        batch = stock_ids[start:start + ID_BATCH_SIZE]
+        cursor.execute(f"{sql} WHERE s.id IN ({', '.join([placeholder] * len(batch))})", batch)
+        frames.append(pd.DataFrame(cursor.fetchall(), columns=columns))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def adjust_stock_summary_by_id(cursor, placeholder, stock_ids, sign=1):
+    """Add or subtract stored stock rows, as they are now, by id.
+
+    Subtract rows before deleting or updating them, and add updated rows
+    back afterwards.
+    """
+    return adjust_stock_summary(cursor, placeholder, _stored_rows(cursor, placeholder, stock_ids), sign)
+
+
+def reserve_in_stock_summary(cursor, placeholder, stock_ids):
+    """Count stored coils ``stock_ids`` as reserved; call in the reserving transaction."""
+    deltas = summary_deltas(_stored_rows(cursor, placeholder, stock_ids).assign(reserved=True))
+    deltas[['coils', 'total_pwt']] = 0
+    return apply_summary_deltas(cursor, placeholder, deltas)
+
+
+def clear_stock_summary(cursor):
+    cursor.execute("DELETE FROM stock_summary")
+
+
+def backfill_stock_summary(cursor, placeholder='?'):
+    """Fill an empty stock_summary from every stored stock row, e.g. after clear_stock_summary."""
+    return adjust_stock_summary(cursor, placeholder, _stored_rows(cursor, placeholder))
+
+
+def summary_totals(groups):
+    """Coils and weights summed over summary ``groups`` (dicts as StockRepo.summary returns)."""
+    totals = {column: sum(group[column] for group in groups) for column in SUMMARY_VALUES + ['available_pwt']}
+    for column in ('total_pwt', 'reserved_pwt', 'available_pwt'):
+        totals[column] = round(totals[column], 3)
+    return totals
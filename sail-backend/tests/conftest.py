@@ -0,0 +1,170 @@
+import importlib.util
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+import jwt
+import pandas as pd
+import pytest
+
+# The backend modules are flat files in sail-backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from cache import LRUCache  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from mysql_pool import MySQLPool  # noqa: E402
+from repositories import SQLiteDriver  # noqa: E402
+from sqlite_pool import SQLiteConnectionManager  # noqa: E402
+from stock_ingest import STOCK_COLUMNS, bulk_load_stock  # noqa: E402
+from sqlite_mysql import Connector  # noqa: E402
+
+MYSQL_APP_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'Sail - Copy', 'sail-backend', 'app.py'
+)
+
+ADMIN_TOKEN = 'admin-secret'
+
+# The MySQL backend's users table, without its MySQL-only ON UPDATE clause
+USERS_TABLE = """
+    CREATE TABLE users (
+        id VARCHAR(36) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        password VARCHAR(255) NOT NULL,
+        created_at DATETIME NOT NULL,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """Connection manager of a fresh database at the latest schema version."""
+    manager = SQLiteConnectionManager(str(tmp_path / 'sail.db'), busy_timeout_ms=10000)
+    run_migrations(manager.get_connection(), 'sqlite')
+    yield manager
+    manager.close_all()
+
+
+@pytest.fixture
+def driver(db_manager):
+    return SQLiteDriver(db_manager.get_connection)
+
+
+def stock_row(pkt, coil='1', grade='304', finish='2B', thickness='1', width='1250', weight='5', sal='TRUE'):
+    return {
+        'TYP': 'C', 'PKT': pkt, 'COILNO': coil, 'GRD': grade, 'FIN': finish,
+        'THK': thickness, 'WIDT': width, 'PWT': weight, 'SAL': sal,
+    }
+
+
+def stock_frame(rows):
+    """DataFrame of stock_row dicts in STOCK_COLUMNS order, other columns empty."""
+    return pd.DataFrame(rows).reindex(columns=STOCK_COLUMNS, fill_value='')
+
+
+@pytest.fixture
+def make_stock():
+    return stock_row
+
+
+@pytest.fixture
+def write_csv(tmp_path):
+    """Write stock rows as a stock export CSV; returns its path."""
+    def write(rows, name='stock.csv'):
+        path = tmp_path / name
+        stock_frame(rows).to_csv(path, index=False)
+        return str(path)
+    return write
+
+
+@pytest.fixture(scope='session')
+def sqlite_app(tmp_path_factory):
+    """The SQLite backend module (app.py) on a fresh database, imported once."""
+    directory = tmp_path_factory.mktemp('sqlite-app')
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('SQLITE_DB_PATH', str(directory / 'sail.db'))
+        # No stock export is loaded on startup
+        patch.setenv('STOCK_CSV_PATH', str(directory / 'missing.csv'))
+        patch.setenv('ADMIN_TOKEN', ADMIN_TOKEN)
+        return importlib.import_module('app')
+
+
+@pytest.fixture
+def sqlite_client(sqlite_app):
+    """Test client of the SQLite backend, with no orders stored."""
+    with sqlite_app.db.transaction() as conn:
+        for table in ('stock_reservations', 'orders'):
+            conn.execute(f"DELETE FROM {table}")
+    return sqlite_app.app.test_client()
+
+
+@pytest.fixture(scope='session')
+def mysql_app():
+    """The MySQL backend module (Sail - Copy/sail-backend/app.py), imported once without a server."""
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('MYSQL_POOL_MIN_SIZE', '0')
+        patch.setenv('PASSWORD_POOL_WORKERS', '0')
+        patch.setenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:1000')
+        patch.setenv('SLOW_QUERY_LOG', 'false')
+        patch.setenv('ADMIN_TOKEN', ADMIN_TOKEN)
+        spec = importlib.util.spec_from_file_location('mysql_app', MYSQL_APP_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+
+@pytest.fixture
+def mysql_db(mysql_app, tmp_path, monkeypatch):
+    """Path of a fresh database the MySQL backend reads through the sqlite_mysql stand-in.
+
+    Only statements valid in both dialects run on it, so routes relying on
+    MySQL-only upserts (order writes) cannot be exercised this way.
+    """
+    path = str(tmp_path / 'mysql.db')
+    conn = sqlite3.connect(path)
+    run_migrations(conn, 'sqlite')
+    conn.execute(USERS_TABLE)
+    conn.commit()
+    conn.close()
+
+    pool = MySQLPool(Connector(path), min_size=0, reap_interval=0, name='test-pool')
+    monkeypatch.setattr(mysql_app, 'connection_pool', pool)
+    # Fresh caches, so counters and entries do not carry over between tests
+    monkeypatch.setattr(mysql_app, 'stock_query_cache', LRUCache(maxsize=64))
+    monkeypatch.setattr(mysql_app, 'user_cache', LRUCache(maxsize=64))
+    yield path
+    pool.close_all()
+
+
+@pytest.fixture
+def load_stock(write_csv):
+    """Load stock rows into a database file as the stock import does."""
+    def load(db_path, rows):
+        conn = sqlite3.connect(db_path)
+        try:
+            bulk_load_stock(conn, write_csv(rows, 'loaded.csv'), truncate=True)
+        finally:
+            conn.close()
+    return load
+
+
+def auth_token(user_id, secret):
+    return jwt.encode({'id': user_id, 'exp': datetime.utcnow() + timedelta(days=1)}, secret)
+
+
+@pytest.fixture
+def mysql_client(mysql_app, mysql_db):
+    """Test client of the MySQL backend, signed in as user 'u1'."""
+    conn = sqlite3.connect(mysql_db)
+    conn.execute(
+        "INSERT INTO users (id, name, email, password, created_at) VALUES (?, ?, ?, ?, ?)",
+        ('u1', 'Asha', 'asha@example.com', '', '2024-01-01 00:00:00')
+    )
+    conn.commit()
+    conn.close()
+
+    client = mysql_app.app.test_client()
+    client.set_cookie('auth_token', auth_token('u1', mysql_app.JWT_SECRET))
+    return client
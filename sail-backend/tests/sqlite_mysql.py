@@ -0,0 +1,145 @@
+"""SQLite-backed stand-in for a mysql.connector connection.
+
+Implements the part of the connection API that MySQLPool and the
+MySQL-side helpers use: cursor(), commit(), rollback(), close(),
+in_transaction and ping(reconnect=False). ``kill()`` simulates the
+server dropping the connection (e.g. after wait_timeout).
+
+Statements use mysql.connector's ``%s`` placeholders. Cursors are
+unbuffered as mysql.connector's default ones: until a
+statement's rows have all been fetched, any other statement on the
+connection raises UnreadResult.
+"""
+import itertools
+import sqlite3
+
+
+class ServerGone(Exception):
+    """Raised like mysql.connector's OperationalError for a dropped connection."""
+
+
+class UnreadResult(Exception):
+    """Raised like mysql.connector's InternalError("Unread result found")."""
+
+
+class UnbufferedCursor:
+    # Like mysql.connector's, reads one row ahead, so fetching the last row
+    # also reads the end of the result
+    def __init__(self, conn):
+        self._conn = conn
+        self._cursor = conn._conn.cursor()
+        self._next = None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _read_ahead(self):
+        self._next = self._cursor.fetchone()
+        if self._next is None and self._conn.unread is self:
+            self._conn.unread = None
+
+    def _start(self, sql):
+        self._conn._check()
+        if self._conn.unread is not None:
+            raise UnreadResult("Unread result found")
+        return sql.replace('%s', '?')
+
+    def execute(self, sql, params=()):
+        self._cursor.execute(self._start(sql), params)
+        if self._cursor.description is not None:
+            self._conn.unread = self
+            self._read_ahead()
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(self._start(sql), seq_of_params)
+
+    def fetchone(self):
+        row = self._next
+        if row is not None:
+            self._read_ahead()
+        return row
+
+    def fetchmany(self, size=1):
+        rows = []
+        while len(rows) < size and self._next is not None:
+            rows.append(self.fetchone())
+        return rows
+
+    def fetchall(self):
+        rows = []
+        while self._next is not None:
+            rows.append(self.fetchone())
+        return rows
+
+    def close(self):
+        if self._conn.unread is self:
+            raise UnreadResult("Unread result found")
+        self._cursor.close()
+
+
+class SQLiteMySQLConnection:
+    _ids = itertools.count(1)
+
+    def __init__(self, db_path=':memory:'):
+        self.connection_id = next(self._ids)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.closed = False
+        self.killed = False
+        # Cursor whose rows are not all fetched yet
+        self.unread = None
+        self.pings = 0
+        self.rollbacks = 0
+
+    def _check(self):
+        if self.closed or self.killed:
+            raise ServerGone(f"Lost connection {self.connection_id} to MySQL server")
+
+    @property
+    def in_transaction(self):
+        return not self.closed and self._conn.in_transaction
+
+    def kill(self):
+        self.killed = True
+
+    def ping(self, reconnect=False):
+        self.pings += 1
+        self._check()
+
+    def cursor(self, *args, **kwargs):
+        self._check()
+        return UnbufferedCursor(self)
+
+    def commit(self):
+        self._check()
+        self._conn.commit()
+
+    def rollback(self):
+        self._check()
+        self.rollbacks += 1
+        self._conn.rollback()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._conn.close()
+
+
+class Connector:
+    """``connect`` callable for MySQLPool that remembers every connection it opened."""
+
+    def __init__(self, db_path=':memory:'):
+        self.db_path = db_path
+        self.opened = []
+
+    def __call__(self):
+        conn = SQLiteMySQLConnection(self.db_path)
+        self.opened.append(conn)
+        return conn
+
+    def open_connections(self):
+        return [conn for conn in self.opened if not conn.closed]
@@ -0,0 +1,181 @@
+import sqlite3
+import threading
+
+import pytest
+
+import repositories
+from allocation import ALLOCATED, INVALID, UNAVAILABLE, AllocationConflict, best_fit, reserve_coils
+from repositories import AllocationsRepo
+from stock_delta import import_stock_delta
+from stock_ingest import bulk_load_stock
+
+
+def coils(*weights):
+    return [{'stock_id': index, 'weight': weight} for index, weight in enumerate(sorted(weights))]
+
+
+def weights(chosen):
+    return sorted(coil['weight'] for coil in chosen)
+
+
+def test_best_fit_takes_lightest_single_coil_that_covers():
+    assert weights(best_fit(coils(1, 3, 5, 8), 4)) == [5]
+
+
+def test_best_fit_exact_match():
+    assert weights(best_fit(coils(1, 3, 5, 8), 3)) == [3]
+
+
+def test_best_fit_combines_heaviest_first_when_no_coil_covers():
+    # 8 leaves 2, which the 3 covers
+    assert weights(best_fit(coils(1, 3, 5, 8), 10)) == [3, 8]
+
+
+def test_best_fit_uses_every_coil_when_needed():
+    assert weights(best_fit(coils(1, 3, 5), 9)) == [1, 3, 5]
+
+
+def test_best_fit_shortfall_reserves_nothing():
+    assert best_fit(coils(1, 3, 5), 9.5) is None
+    assert best_fit([], 1) is None
+
+
+def test_best_fit_tolerates_float_rounding():
+    assert weights(best_fit(coils(0.1, 0.2), 0.3)) == [0.1, 0.2]
+
+
+def stock_rows(make_stock, **changes):
+    """P0..P5 weighing 1..6, plus one coil that is not available; ``changes`` replace rows by PKT."""
+    rows = {f'P{index}': make_stock(f'P{index}', weight=str(weight)) for index, weight in enumerate([1, 2, 3, 4, 5, 6])}
+    rows['HELD'] = make_stock('HELD', sal='HRCS', weight='50')
+    rows.update(changes)
+    return [row for row in rows.values() if row is not None]
+
+
+@pytest.fixture
+def stocked(db_manager, driver, make_stock, write_csv):
+    bulk_load_stock(db_manager.get_connection(), write_csv(stock_rows(make_stock)))
+    return driver
+
+
+def stock_id(driver, pkt):
+    return driver.fetch_value("SELECT id FROM stock_data WHERE PKT = ?", (pkt,))
+
+
+def reservations(driver):
+    return driver.fetch_all("SELECT stock_id, order_id, weight FROM stock_reservations ORDER BY stock_id")
+
+
+def test_reserve_coils_refuses_a_reserved_coil(stocked):
+    conn = stocked.get_connection()
+    cursor = conn.cursor()
+    reserve_coils(cursor, '?', 'first', [{'stock_id': 1}], 'now')
+    conn.commit()
+
+    with pytest.raises(AllocationConflict):
+        reserve_coils(cursor, '?', 'second', [{'stock_id': 1}], 'now')
+    conn.rollback()
+    assert [row['order_id'] for row in reservations(stocked)] == ['first']
+
+
+def test_reserve_coils_refuses_unavailable_stock(stocked):
+    held = stock_id(stocked, 'HELD')
+    conn = stocked.get_connection()
+    with pytest.raises(AllocationConflict):
+        reserve_coils(conn.cursor(), '?', 'order', [{'stock_id': held}], 'now')
+    conn.rollback()
+    assert reservations(stocked) == []
+
+
+def test_allocate_reserves_best_fit(stocked):
+    result = AllocationsRepo(stocked).allocate('order', '304', '1', '1250', '2B', '4.5', 'now')
+    assert result['status'] == ALLOCATED
+    assert result['allocated'] == 5
+    assert [row['weight'] for row in reservations(stocked)] == [5]
+
+
+def test_allocate_unavailable_and_invalid(stocked):
+    repo = AllocationsRepo(stocked)
+    assert repo.allocate('big', '304', '1', '1250', '2B', '100', 'now')['status'] == UNAVAILABLE
+    assert repo.allocate('bad', '304', 'thin', '1250', '2B', '1', 'now')['status'] == INVALID
+    assert reservations(stocked) == []
+
+
+def test_allocate_retries_after_a_conflict(db_manager, stocked, monkeypatch):
+    # The first attempt sees a coil that a concurrent order takes before the claim
+    stolen = stock_id(stocked, 'P4')
+    load_candidates = repositories.load_candidates
+    calls = []
+
+    def racing_load_candidates(cursor, *args, **kwargs):
+        candidates = load_candidates(cursor, *args, **kwargs)
+        if not calls:
+            rival = sqlite3.connect(db_manager.db_path)
+            with rival:
+                rival.execute(
+                    "INSERT INTO stock_reservations (stock_id, order_id, weight, created_at) VALUES (?, 'rival', 5, 'now')",
+                    (stolen,)
+                )
+            rival.close()
+        calls.append(len(candidates))
+        return candidates
+
+    monkeypatch.setattr(repositories, 'load_candidates', racing_load_candidates)
+    repo = AllocationsRepo(stocked)
+    result = repo.allocate('order', '304', '1', '1250', '2B', '4.5', 'now')
+
+    assert repo.conflicts == 1
+    assert len(calls) == 2
+    assert result['status'] == ALLOCATED
+    assert result['allocated'] == 6
+    assert {row['order_id']: row['weight'] for row in reservations(stocked)} == {'rival': 5, 'order': 6}
+
+
+def test_concurrent_allocations_never_share_a_coil(stocked):
+    repo = AllocationsRepo(stocked, attempts=20)
+    start = threading.Barrier(8)
+    results = {}
+
+    def allocate(index):
+        start.wait()
+        results[index] = repo.allocate(f'order-{index}', '304', '1', '1250', '2B', '2.5', 'now')
+
+    threads = [threading.Thread(target=allocate, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = reservations(stocked)
+    # One coil, one reservation
+    assert len({row['stock_id'] for row in rows}) == len(rows)
+    allocated = [result for result in results.values() if result['status'] == ALLOCATED]
+    assert sum(len(result['coils']) for result in allocated) == len(rows)
+    for index, result in results.items():
+        reserved = sorted(row['stock_id'] for row in rows if row['order_id'] == f'order-{index}')
+        assert reserved == sorted(coil['stock_id'] for coil in result['coils'])
+    # Whatever the interleaving: 3, 4, 5 and 6 alone, then 2 + 1
+    assert len(allocated) == 5
+
+
+def test_delta_releases_reservations_of_deleted_coils(db_manager, stocked, make_stock, write_csv):
+    conn = stocked.get_connection()
+    reserve_coils(conn.cursor(), '?', 'order', [{'stock_id': stock_id(stocked, 'P0')}], 'now')
+    conn.commit()
+
+    import_stock_delta(db_manager.get_connection(), write_csv(stock_rows(make_stock, P0=None), 'snapshot.csv'))
+    assert reservations(stocked) == []
+
+
+def test_delta_revalidates_reservations_of_updated_coils(db_manager, stocked, make_stock, write_csv):
+    conn = stocked.get_connection()
+    coils = [{'stock_id': stock_id(stocked, pkt)} for pkt in ('P0', 'P1')]
+    reserve_coils(conn.cursor(), '?', 'order', coils, 'now')
+    conn.commit()
+
+    snapshot = stock_rows(make_stock, P0=make_stock('P0', weight='1', sal='HRCS'), P1=make_stock('P1', weight='2,500'))
+    import_stock_delta(db_manager.get_connection(), write_csv(snapshot, 'snapshot.csv'))
+
+    # P0 is no longer available; P1 stays reserved at its new weight
+    rows = reservations(stocked)
+    assert [(row['stock_id'], row['weight']) for row in rows] == [(coils[1]['stock_id'], 2500.0)]
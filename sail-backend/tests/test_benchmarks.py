@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+import bench_indexes  # noqa: E402
+import bench_stock_snapshot  # noqa: E402
+
+
+def test_index_benchmark_runs_across_the_migrations(capsys):
+    bench_indexes.main(['--stock-rows', '200', '--orders', '100', '--users', '5', '--repeat', '1'])
+    output = capsys.readouterr().out
+    assert all(name in output for name in bench_indexes.QUERIES)
+
+
+def test_snapshot_benchmark_finds_the_same_rows(capsys):
+    bench_stock_snapshot.main(['--stock-rows', '300', '--repeat', '1'])
+    assert 'RESULTS DIFFER' not in capsys.readouterr().out
@@ -0,0 +1,72 @@
+import pytest
+
+import cache
+from cache import MISSING, LRUCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_least_recently_used_entry_is_evicted():
+    lru = LRUCache(maxsize=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+
+    assert lru.get('b') is MISSING
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+    assert lru.evictions == 1
+
+
+def test_entries_expire_after_the_ttl(clock):
+    lru = LRUCache(maxsize=4, ttl=30)
+    lru.set('a', 1)
+
+    clock[0] += 29
+    assert lru.get('a') == 1
+    clock[0] += 1
+    assert lru.get('a') is MISSING
+    assert lru.expirations == 1
+
+
+def test_no_ttl_never_expires(clock):
+    lru = LRUCache(maxsize=4)
+    lru.set('a', 1)
+    clock[0] += 10 ** 6
+    assert lru.get('a') == 1
+
+
+def test_other_version_is_a_miss_and_drops_the_entry():
+    lru = LRUCache()
+    lru.set('a', 1, version=7)
+
+    assert lru.get('a', version=7) == 1
+    assert lru.get('a', version=8) is MISSING
+    assert lru.invalidations == 1
+    # Gone, even for the version it was stored with
+    assert lru.get('a', version=7) is MISSING
+
+
+def test_explicit_invalidation():
+    lru = LRUCache()
+    for key in [('u1', 'x'), ('u1', 'y'), ('u2', 'x')]:
+        lru.set(key, key)
+
+    lru.invalidate_where(lambda key: key[0] == 'u1')
+    assert lru.get(('u1', 'x')) is MISSING
+    assert lru.get(('u2', 'x')) == ('u2', 'x')
+    lru.invalidate(('u2', 'x'))
+    assert lru.get(('u2', 'x')) is MISSING
+    assert lru.invalidations == 3
+
+
+def test_stored_none_is_a_hit():
+    lru = LRUCache()
+    lru.set('a', None)
+    assert lru.get('a') is None
+    assert (lru.hits, lru.misses) == (1, 0)
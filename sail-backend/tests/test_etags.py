@@ -0,0 +1,48 @@
+import pytest
+from flask import Flask
+
+from etags import make_etag, not_modified, set_validators
+from serialization import JSONSerializer
+
+ETAG = make_etag('stock', 7)
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    serializer = JSONSerializer(compress_min_bytes=16)
+
+    @app.route('/stock')
+    def stock():
+        unchanged = not_modified(ETAG)
+        if unchanged:
+            return unchanged
+        return set_validators(serializer.response([{'PKT': f'P{index}'} for index in range(50)]), ETAG)
+
+    return app.test_client()
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate'])
+def test_each_encoding_has_its_own_etag(client, encoding):
+    identity = client.get('/stock')
+    encoded = client.get('/stock', headers={'Accept-Encoding': encoding})
+
+    assert identity.headers['ETag'] == f'"{ETAG}"'
+    assert encoded.headers['Content-Encoding'] == encoding
+    assert encoded.headers['ETag'] == f'"{ETAG}-{encoding}"'
+    assert 'Accept-Encoding' in encoded.headers['Vary']
+
+
+@pytest.mark.parametrize('etag', [ETAG, f'{ETAG}-gzip', f'{ETAG}-deflate'])
+def test_every_form_revalidates(client, etag):
+    response = client.get('/stock', headers={'If-None-Match': f'"{etag}"', 'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 304
+    assert response.headers['ETag'] == f'"{etag}"'
+    assert response.data == b''
+
+
+def test_other_etag_gets_the_body(client):
+    response = client.get('/stock', headers={'If-None-Match': f'"{make_etag("stock", 6)}-gzip"'})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{ETAG}"'
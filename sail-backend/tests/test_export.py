@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from export import encode_ndjson, iter_export
+
+
+class Connections:
+    """get_connection for iter_export, counting what it opened and closed."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.opened = []
+
+    def __call__(self):
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE t (id INTEGER, name TEXT)")
+        conn.executemany("INSERT INTO t VALUES (?, ?)", self.rows)
+        closed = []
+        self.opened.append(closed)
+
+        class Connection:
+            def cursor(self):
+                return conn.cursor()
+
+            def close(self):
+                closed.append(True)
+                conn.close()
+
+        return Connection()
+
+
+def test_rows_stream_in_chunks():
+    connections = Connections([(index, f'n{index}') for index in range(5)])
+    blocks = list(iter_export(connections, "SELECT id, name FROM t ORDER BY id", chunk_size=2))
+
+    assert len(blocks) == 3
+    assert [json.loads(line) for line in ''.join(blocks).splitlines()][-1] == {'id': 4, 'name': 'n4'}
+    assert connections.opened == [[True]]
+
+
+def test_csv_starts_with_a_header_and_quotes_values():
+    connections = Connections([(1, 'a,b'), (2, 'say "hi"')])
+    text = ''.join(iter_export(connections, "SELECT id, name FROM t ORDER BY id", export_format='csv'))
+    assert list(csv.reader(io.StringIO(text))) == [['id', 'name'], ['1', 'a,b'], ['2', 'say "hi"']]
+
+
+def test_connection_is_taken_lazily_and_released_on_disconnect():
+    connections = Connections([(index, 'x') for index in range(10)])
+    blocks = iter_export(connections, "SELECT id, name FROM t", chunk_size=1)
+    assert connections.opened == []
+
+    next(blocks)
+    blocks.close()
+    assert connections.opened == [[True]]
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        iter_export(Connections([]), "SELECT 1", export_format='xml')
+
+
+def test_ndjson_encodes_database_types():
+    line = encode_ndjson(['at', 'amount', 'raw'], [(datetime(2024, 5, 1, 10, 0), Decimal('1.50'), b'x')])
+    assert json.loads(line) == {'at': '2024-05-01 10:00:00', 'amount': '1.50', 'raw': 'x'}
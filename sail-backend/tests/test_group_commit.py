@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pytest
+
+from group_commit import GroupCommitTimeout, GroupCommitWriter, synchronous_full
+
+
+@pytest.fixture
+def table(db_manager):
+    conn = db_manager.get_connection()
+    conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT NOT NULL CHECK (name != 'bad'))")
+    conn.execute("CREATE TABLE item_batches (rows INTEGER NOT NULL)")
+    conn.commit()
+    return db_manager
+
+
+def stored(db_manager):
+    return [row[0] for row in db_manager.get_connection().execute("SELECT id FROM items ORDER BY id")]
+
+
+def writer(db_manager, **kwargs):
+    return GroupCommitWriter(
+        db_manager.get_connection, "INSERT INTO items (id, name) VALUES (?, ?)", max_delay_ms=200, **kwargs
+    )
+
+
+def test_rows_are_written_in_one_batch(table):
+    group = writer(table)
+    futures = [group.submit((index, f'item-{index}')) for index in range(5)]
+    for future in futures:
+        assert future.result(timeout=5) is None
+    group.stop()
+
+    assert stored(table) == [0, 1, 2, 3, 4]
+    assert group.stats()['batches'] == 1
+    assert group.stats()['rows'] == 5
+
+
+def test_failed_batch_falls_back_to_one_row_at_a_time(table):
+    def count_rows(cursor, params_list):
+        cursor.execute("INSERT INTO item_batches (rows) VALUES (?)", (len(params_list),))
+
+    group = writer(table, on_batch=count_rows)
+    futures = {index: group.submit((index, 'bad' if index == 2 else f'item-{index}')) for index in range(5)}
+
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[2].result(timeout=5)
+    for index in (0, 1, 3, 4):
+        assert futures[index].result(timeout=5) is None
+    group.stop()
+
+    # Only the bad row is missing, and on_batch ran with each good row
+    assert stored(table) == [0, 1, 3, 4]
+    conn = table.get_connection()
+    assert conn.execute("SELECT rows FROM item_batches").fetchall() == [(1,)] * 4
+    assert group.stats()['rows'] == 4
+
+
+def test_concurrent_submitters_are_all_acknowledged(table):
+    group = writer(table, max_batch=8)
+    errors = []
+
+    def submit(start):
+        for index in range(start, start + 10):
+            try:
+                group.submit((index, 'item')).result(timeout=5)
+            except Exception as e:
+                errors.append(e)
+
+    threads = [threading.Thread(target=submit, args=(start,)) for start in range(0, 40, 10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    group.stop()
+
+    assert errors == []
+    assert stored(table) == list(range(40))
+
+
+def test_write_times_out_and_withdraws_the_row(table):
+    release = threading.Event()
+
+    def stalled_connection():
+        release.wait(5)
+        return table.get_connection()
+
+    group = GroupCommitWriter(stalled_connection, "INSERT INTO items (id, name) VALUES (?, ?)", max_delay_ms=0)
+    first = group.submit((1, 'first'))
+    # Queued behind the stalled batch, so still withdrawable
+    with pytest.raises(GroupCommitTimeout):
+        group.write((2, 'second'), timeout=0.1)
+    release.set()
+    first.result(timeout=5)
+    group.stop()
+
+    assert stored(table) == [1]
+    assert group.stats()['timeouts'] == 1
+
+
+def test_synchronous_full_connection(table):
+    conn = synchronous_full(table.get_connection)()
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2
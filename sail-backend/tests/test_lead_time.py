@@ -0,0 +1,87 @@
+import pandas as pd
+
+from conftest import stock_frame
+from lead_time import (
+    ANY, NO_STOCK_DELIVERY_RANGE, build_profile, classify_sal, classify_sal_series, lead_time_range, load_profiles,
+    load_width_profiles, quote_lead_time, refresh_lead_time_profile, thickness_band,
+)
+from stock_ingest import insert_stock_frame
+
+
+def test_vectorized_classification_matches_classify_sal():
+    sal = ['TRUE', 'KICKBACK SLAB STK', 'HRCS JOBWORK', 'HRC CRM', 'FALSE', None]
+    min_days, max_days = classify_sal_series(sal)
+    assert list(zip(min_days, max_days)) == [classify_sal(value) for value in sal]
+
+
+def test_thickness_bands_parse_like_ingest():
+    assert thickness_band(' 0.4') == '0-0.5'
+    assert thickness_band('1.5') == '1-2'
+    assert thickness_band('n/a') == ANY
+
+
+def test_profile_keeps_the_best_lead_time_per_level():
+    stock = pd.DataFrame({
+        'GRD': ['304', '304', '304'],
+        'FIN': ['2B', '2B', 'BA'],
+        'thk_num': [0.4, 1.5, None],
+        'SAL': ['HRCS', 'TRUE', 'HRC CRM'],
+    })
+    profile = build_profile(stock).set_index(['grade', 'finish', 'thk_band'])
+
+    assert tuple(profile.loc[('304', '2B', '0-0.5'), ['min_days', 'max_days']]) == (45, 60)
+    assert tuple(profile.loc[('304', '2B', ANY), ['min_days', 'max_days']]) == (0, 0)
+    assert tuple(profile.loc[('304', ANY, ANY), ['coil_count', 'available_count']]) == (3, 1)
+    # A non-numeric thickness only counts at the coarser levels
+    assert ('304', 'BA', ANY) in profile.index
+    assert [key for key in profile.index if key[1] == 'BA'] == [('304', 'BA', ANY)]
+
+
+def test_lead_time_range_falls_back_to_coarser_levels():
+    profiles = {('304', '2B', '1-2'): (0, 0), ('304', '2B', ANY): (30, 30), ('304', ANY, ANY): (45, 60)}
+    assert lead_time_range(profiles, '304', '2B', '1.5') == (0, 0)
+    assert lead_time_range(profiles, '304', '2B', '4') == (30, 30)
+    assert lead_time_range(profiles, '304', 'BA') == (45, 60)
+    assert lead_time_range(profiles, '430') == NO_STOCK_DELIVERY_RANGE
+
+
+def load_stock_rows(db_manager, rows):
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    insert_stock_frame(cursor, stock_frame(rows))
+    conn.commit()
+    return cursor
+
+
+def test_width_profiles_match_parsed_widths(db_manager, make_stock):
+    cursor = load_stock_rows(db_manager, [
+        make_stock('P1', finish='2B', thickness='1.5', width='1,250', sal='HRCS'),
+        make_stock('P2', finish='2B', thickness='1.5', width='1000', sal='TRUE'),
+    ])
+    profiles = load_width_profiles(cursor, '?', [('304', 1250.0), ('316', 1250.0)])
+
+    assert profiles[('304', 1250.0, '2B', '1-2')] == (45, 60)
+    assert ('304', 1000.0, ANY, ANY) not in profiles
+    assert not any(key[0] == '316' for key in profiles)
+
+
+def test_quote_reports_exact_and_grade_matches(db_manager, make_stock):
+    cursor = load_stock_rows(db_manager, [
+        make_stock('P1', finish='2B', thickness='1.5', width='1250', sal='HRCS'),
+        make_stock('P2', finish='BA', thickness='0.4', width='1000', sal='TRUE'),
+    ])
+    refresh_lead_time_profile(cursor)
+    profiles = load_profiles(cursor, '?', ['304', '430'])
+    width_profiles = load_width_profiles(cursor, '?', [('304', 1250.0)])
+
+    def quote(grade, finish=None, thickness=None, width=None):
+        return quote_lead_time(profiles, width_profiles, grade, finish, thickness, width)
+
+    assert quote('304') == ((0, 0), 'exact')
+    assert quote('304', '2B', '1.5', '1,250') == ((45, 60), 'exact')
+    assert quote('304', width='1250') == ((45, 60), 'exact')
+    # The 1250 coil is 2B, so a BA line falls back to the grade's stock
+    assert quote('304', 'BA', '0.4', '1250') == ((0, 0), 'grade')
+    assert quote('304', '2B', '4') == ((45, 60), 'grade')
+    assert quote('304', thickness='1.5') == ((0, 0), 'grade')
+    assert quote('430', '2B') == (NO_STOCK_DELIVERY_RANGE, None)
@@ -0,0 +1,64 @@
+import math
+
+import pytest
+from flask import Flask
+
+from cache import LRUCache
+from metrics import Histogram, RequestMetrics
+
+
+def test_quantiles_interpolate_inside_buckets():
+    histogram = Histogram((0.1, 0.2, 0.4))
+    for value in (0.05, 0.15, 0.15, 0.3):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == pytest.approx(0.15)
+    assert histogram.quantile(1.0) == pytest.approx(0.4)
+    assert math.isnan(Histogram((1.0,)).quantile(0.5))
+    histogram.observe(9)
+    assert histogram.quantile(0.99) == 0.4
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    metrics = RequestMetrics(buckets=(0.5, 1.0))
+    metrics.init_app(app)
+    cache = LRUCache(maxsize=4)
+    cache.get('missing')
+    metrics.register_cache('stock_query', cache)
+    metrics.register_stats('pool', lambda: {'checkouts': 3, 'in_use': 1, 'name': 'x'}, counters=('checkouts',))
+
+    @app.route('/orders')
+    def orders():
+        metrics.observe_query('SELECT 1', (), 0.25)
+        return 'ok'
+
+    return app
+
+
+def test_requests_are_counted_per_route_and_status(app):
+    client = app.test_client()
+    client.get('/orders')
+    client.get('/orders')
+    client.get('/nowhere')
+
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'sail_http_requests_total{route="orders",method="GET",status="200"} 2' in text
+    assert 'sail_http_requests_total{route="unmatched",method="GET",status="404"} 1' in text
+    assert 'sail_http_request_db_seconds_bucket{route="orders",le="0.5"} 2' in text
+    assert 'sail_http_request_db_queries_total{route="orders"} 2' in text
+
+
+def test_caches_and_stats_are_exported(app):
+    text = app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'sail_cache_misses_total{cache="stock_query"} 1' in text
+    assert '# TYPE sail_pool_checkouts_total counter' in text
+    assert 'sail_pool_in_use 1' in text
+    assert 'sail_pool_name' not in text
+
+
+def test_without_a_path_no_route_is_added():
+    app = Flask(__name__)
+    RequestMetrics().init_app(app, path=None)
+    assert app.test_client().get('/metrics').status_code == 404
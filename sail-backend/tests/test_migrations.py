@@ -0,0 +1,123 @@
+import sqlite3
+
+import pytest
+
+from lead_time import refresh_lead_time_profile
+from migrations import LATEST_VERSION, MIGRATIONS, current_version, run_migrations
+from sqlite_mysql import SQLiteMySQLConnection
+from stock_ingest import backfill_numeric_columns
+from stock_summary import backfill_stock_summary, clear_stock_summary
+
+
+def schema(conn):
+    return conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+
+
+def test_fresh_database_reaches_the_latest_version(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'fresh.db'))
+    applied = run_migrations(conn, 'sqlite')
+
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    assert current_version(conn.cursor()) == LATEST_VERSION
+    conn.close()
+
+
+def test_second_run_applies_nothing(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'twice.db'))
+    run_migrations(conn, 'sqlite')
+    before = schema(conn)
+
+    assert run_migrations(conn, 'sqlite') == []
+    assert schema(conn) == before
+    assert conn.execute("SELECT COUNT(*) FROM schema_migrations").fetchone()[0] == len(MIGRATIONS)
+    conn.close()
+
+
+def test_stepwise_upgrade_matches_a_fresh_run(tmp_path):
+    stepwise = sqlite3.connect(str(tmp_path / 'stepwise.db'))
+    assert run_migrations(stepwise, 'sqlite', target=5) == [1, 2, 3, 4, 5]
+    assert run_migrations(stepwise, 'sqlite') == list(range(6, LATEST_VERSION + 1))
+
+    fresh = sqlite3.connect(str(tmp_path / 'fresh.db'))
+    run_migrations(fresh, 'sqlite')
+    assert schema(stepwise) == schema(fresh)
+    stepwise.close()
+    fresh.close()
+
+
+def test_pre_migration_database_is_adopted(tmp_path):
+    # A database created by init_database() before migrations existed
+    conn = sqlite3.connect(str(tmp_path / 'legacy.db'))
+    conn.execute("CREATE TABLE stock_data (id INTEGER PRIMARY KEY AUTOINCREMENT, PKT TEXT, GRD TEXT, THK TEXT)")
+    conn.execute("INSERT INTO stock_data (PKT, GRD, THK) VALUES ('P1', '304', '1,5')")
+    conn.commit()
+
+    run_migrations(conn, 'sqlite')
+    assert run_migrations(conn, 'sqlite') == []
+    assert conn.execute("SELECT thk_num FROM stock_data WHERE PKT = 'P1'").fetchone()[0] == 15.0
+    conn.close()
+
+
+def test_backfills_match_the_live_code(tmp_path):
+    # Stock loaded before the lead-time, numeric and summary migrations
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    run_migrations(conn, 'sqlite', target=3)
+    conn.executemany(
+        "INSERT INTO stock_data (PKT, GRD, FIN, THK, WIDT, PWT, SAL) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            ('P1', '304', '2B', '0.4', '1,250', '2.5', 'TRUE'),
+            ('P2', '304', '2B', '1', '1250', '3', 'HRCS'),
+            ('P3', '316', 'NO1', '4', '1500', '1,200', 'KICKBACK SLAB STK'),
+            ('P4', '316', 'NO1', 'n/a', 'wide', '', 'PACKET OPEN WIP'),
+        ]
+    )
+    conn.commit()
+    run_migrations(conn, 'sqlite')
+
+    def table(sql):
+        return conn.execute(sql).fetchall()
+
+    migrated = {
+        'numbers': table("SELECT id, thk_num, widt_num, pwt_num FROM stock_data ORDER BY id"),
+        'profile': table("SELECT grade, finish, thk_band, min_days, max_days, coil_count, available_count "
+                         "FROM lead_time_profile ORDER BY grade, finish, thk_band"),
+        'summary': table("SELECT grade, finish, thk_band, sal_category, coils, total_pwt, reserved_coils, reserved_pwt "
+                         "FROM stock_summary ORDER BY grade, finish, thk_band, sal_category"),
+    }
+    assert migrated['numbers'][0][1:] == (0.4, 1250.0, 2.5)
+
+    cursor = conn.cursor()
+    cursor.execute("UPDATE stock_data SET thk_num = NULL, widt_num = NULL, pwt_num = NULL")
+    backfill_numeric_columns(cursor)
+    refresh_lead_time_profile(cursor)
+    clear_stock_summary(cursor)
+    backfill_stock_summary(cursor)
+    assert table("SELECT id, thk_num, widt_num, pwt_num FROM stock_data ORDER BY id") == migrated['numbers']
+    assert table("SELECT grade, finish, thk_band, min_days, max_days, coil_count, available_count "
+                 "FROM lead_time_profile ORDER BY grade, finish, thk_band") == migrated['profile']
+    assert table("SELECT grade, finish, thk_band, sal_category, coils, total_pwt, reserved_coils, reserved_pwt "
+                 "FROM stock_summary ORDER BY grade, finish, thk_band, sal_category") == migrated['summary']
+    conn.close()
+
+
+def test_mysql_run_refuses_to_migrate_without_the_lock():
+    conn = SQLiteMySQLConnection()
+    released = []
+    # GET_LOCK timed out: another worker is still migrating
+    conn._conn.create_function('GET_LOCK', 2, lambda name, timeout: 0)
+    conn._conn.create_function('RELEASE_LOCK', 1, lambda name: released.append(name) or 1)
+
+    with pytest.raises(RuntimeError, match='lock'):
+        run_migrations(conn, 'mysql')
+    assert released == []
+    assert current_version(conn._conn.cursor()) == 0
+
+
+def test_each_database_gets_its_own_id(tmp_path):
+    ids = []
+    for name in ('a.db', 'b.db'):
+        conn = sqlite3.connect(str(tmp_path / name))
+        run_migrations(conn, 'sqlite')
+        ids.append(conn.execute("SELECT value FROM stock_meta WHERE name = 'database_id'").fetchone()[0])
+    assert ids[0] != ids[1]
+    assert all(isinstance(value, int) for value in ids)
@@ -0,0 +1,147 @@
+import runpy
+
+import pytest
+
+from conftest import ADMIN_TOKEN, MYSQL_APP_PATH, auth_token
+from stock_ingest import STOCK_COLUMNS
+
+
+@pytest.fixture
+def stocked(mysql_db, load_stock, make_stock):
+    load_stock(mysql_db, [
+        make_stock('P1', grade='304', finish='2B', thickness='1', sal='TRUE'),
+        make_stock('P2', grade='316', finish='2D', thickness='0.4', sal='HRCS'),
+    ])
+
+
+def test_check_stock_batch_quotes_every_item(mysql_client, stocked):
+    response = mysql_client.post('/api/stock/check/batch', json={'items': [
+        {'grade': '304', 'finish': '2B', 'thickness': '1'},
+        {'grade': '316'},
+        {'grade': '430'},
+    ]})
+
+    assert response.status_code == 200
+    results = response.json['results']
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert results[0]['deliveryDays'] == 0
+    assert (results[0]['thickness'], results[0]['matched']) == ('1', 'exact')
+    assert 45 <= results[1]['deliveryDays'] <= 60
+    assert 75 <= results[2]['deliveryDays'] <= 100
+    assert results[2]['matched'] is None
+
+
+def test_check_stock_batch_matches_widths(mysql_client, mysql_db, load_stock, make_stock):
+    load_stock(mysql_db, [
+        make_stock('P1', finish='2B', width='1250', sal='HRCS'),
+        make_stock('P2', finish='2B', width='1000', sal='TRUE'),
+    ])
+    response = mysql_client.post('/api/stock/check/batch', json=[
+        {'grade': '304', 'finish': '2B', 'width': '1,250'},
+        {'grade': '304', 'finish': '2B', 'width': '1500'},
+    ])
+
+    exact, fallback = response.json['results']
+    assert (exact['matched'], exact['width']) == ('exact', '1,250')
+    assert 45 <= exact['deliveryDays'] <= 60
+    # No 1500 coil: the grade's best stock answers
+    assert (fallback['matched'], fallback['deliveryDays']) == ('grade', 0)
+
+
+def test_check_stock_batch_validates_items(mysql_app, mysql_client, monkeypatch):
+    assert mysql_client.post('/api/stock/check/batch', json={'items': []}).status_code == 400
+
+    response = mysql_client.post('/api/stock/check/batch', json=[{'grade': '304'}, {'finish': '2B'}])
+    assert response.status_code == 400
+    assert response.json['message'] == 'Item 1: grade is required'
+
+    monkeypatch.setattr(mysql_app, 'MAX_BATCH_QUOTES', 1)
+    assert mysql_client.post('/api/stock/check/batch', json=[{'grade': '304'}] * 2).status_code == 413
+
+
+def test_check_stock_batch_requires_a_token(mysql_app, mysql_db):
+    response = mysql_app.app.test_client().post('/api/stock/check/batch', json=[{'grade': '304'}])
+    assert response.status_code == 401
+
+
+def test_check_stock_is_cached_until_the_stock_version_changes(mysql_app, mysql_client, mysql_db, load_stock, make_stock):
+    load_stock(mysql_db, [make_stock('P1', sal='HRCS')])
+    for _ in range(2):
+        assert 45 <= mysql_client.get('/api/stock/check?grade=304').json['deliveryDays'] <= 60
+    assert (mysql_app.stock_query_cache.hits, mysql_app.stock_query_cache.misses) == (1, 1)
+
+    # Reloading the stock bumps stock_version, so the cached profiles are stale
+    load_stock(mysql_db, [make_stock('P2', sal='TRUE')])
+    assert mysql_client.get('/api/stock/check?grade=304').json['deliveryDays'] == 0
+    assert mysql_app.stock_query_cache.misses == 2
+
+
+def test_token_user_is_cached_and_invalidated_on_profile_update(mysql_app, mysql_client):
+    for _ in range(3):
+        assert mysql_client.get('/api/auth/me').json['user']['name'] == 'Asha'
+    assert (mysql_app.user_cache.hits, mysql_app.user_cache.misses) == (2, 1)
+
+    response = mysql_client.put('/api/profile', json={'name': 'Asha K', 'email': 'asha@example.com'})
+    assert response.status_code == 200
+    assert mysql_app.user_cache.invalidations == 1
+    assert mysql_client.get('/api/auth/me').json['user']['name'] == 'Asha K'
+
+
+def test_signup_and_login_tokens_resolve_through_the_cache(mysql_app, mysql_db):
+    client = mysql_app.app.test_client()
+    credentials = {'email': 'ravi@example.com', 'password': 'correct horse'}
+    assert client.post('/api/auth/signup', json={'name': 'Ravi', **credentials}).status_code == 201
+    assert client.get('/api/auth/me').json['user']['email'] == 'ravi@example.com'
+
+    assert client.post('/api/auth/login', json={**credentials, 'password': 'wrong'}).status_code == 401
+    assert client.post('/api/auth/login', json=credentials).status_code == 200
+    assert client.get('/api/auth/me').json['user']['name'] == 'Ravi'
+    assert mysql_app.user_cache.misses == 1
+
+
+def test_unknown_token_user_is_rejected(mysql_app, mysql_client):
+    mysql_client.set_cookie('auth_token', auth_token('nobody', mysql_app.JWT_SECRET))
+    assert mysql_client.get('/api/profile').status_code == 401
+    assert mysql_app.user_cache.stats()['size'] == 0
+
+
+def test_stock_export_uses_the_stock_csv_layout(mysql_client, mysql_db, load_stock, make_stock):
+    load_stock(mysql_db, [make_stock('P1'), make_stock('P2')])
+
+    lines = mysql_client.get('/api/stock/export').get_data(as_text=True).splitlines()
+    assert lines[0].split(',') == STOCK_COLUMNS
+    assert [line.split(',')[STOCK_COLUMNS.index('PKT')] for line in lines[1:]] == ['P1', 'P2']
+
+
+def test_pool_worker_import_starts_no_services(monkeypatch):
+    # What a forkserver/spawn password worker runs when it imports the script
+    monkeypatch.setenv('MYSQL_POOL_MIN_SIZE', '0')
+    monkeypatch.setenv('ORDER_GROUP_COMMIT', 'true')
+    monkeypatch.setenv('SLOW_QUERY_LOG', 'false')
+    namespace = runpy.run_path(MYSQL_APP_PATH, run_name='__mp_main__')
+
+    assert 'connection_pool' not in namespace
+    assert namespace['order_writer'] is None
+
+
+def test_metrics_require_the_admin_token(mysql_app, mysql_client, monkeypatch):
+    assert mysql_client.get('/metrics').status_code == 403
+    assert mysql_client.get('/metrics', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    assert 'sail_db_pool_checkouts_total' in mysql_client.get('/metrics', headers={'X-Admin-Token': ADMIN_TOKEN}).get_data(as_text=True)
+
+    monkeypatch.setattr(mysql_app, 'ADMIN_TOKEN', None)
+    assert mysql_client.get('/metrics').status_code == 404
+
+
+def test_stock_summary_reads_the_maintained_groups(mysql_client, mysql_db, load_stock, make_stock):
+    load_stock(mysql_db, [
+        make_stock('P1', grade='304', weight='2.5', sal='TRUE'),
+        make_stock('P2', grade='304', weight='1,000', sal='TRUE'),
+        make_stock('P3', grade='316', weight='4', sal='HRCS'),
+    ])
+
+    everything = mysql_client.get('/api/stock/summary').json
+    assert (everything['totals']['coils'], everything['totals']['totalWeight']) == (3, 1006.5)
+
+    grade = mysql_client.get('/api/stock/summary?grade=304').json
+    assert [(group['grade'], group['coils'], group['availableWeight']) for group in grade['groups']] == [('304', 2, 1002.5)]
@@ -0,0 +1,140 @@
+import gc
+import threading
+import time
+
+import pytest
+
+from mysql_pool import MySQLPool, PoolExhausted
+from sqlite_mysql import Connector
+
+
+@pytest.fixture
+def connector(tmp_path):
+    return Connector(str(tmp_path / 'pool.db'))
+
+
+@pytest.fixture
+def make_pool(connector):
+    pools = []
+
+    def make(**kwargs):
+        # The reaper thread stays off; tests call reap_idle() themselves
+        kwargs.setdefault('reap_interval', 0)
+        pool = MySQLPool(connector, **kwargs)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close_all()
+
+
+def test_min_size_is_opened_up_front(connector, make_pool):
+    pool = make_pool(min_size=2, max_size=4)
+    assert len(connector.opened) == 2
+    assert pool.stats()['idle'] == 2
+
+
+def test_grows_to_max_size_then_blocks_until_a_return(make_pool):
+    pool = make_pool(min_size=1, max_size=2, checkout_timeout=5)
+    first, second = pool.get_connection(), pool.get_connection()
+    assert pool.stats()['size'] == 2
+
+    checked_out = []
+    waiter = threading.Thread(target=lambda: checked_out.append(pool.get_connection()))
+    waiter.start()
+    time.sleep(0.1)
+    assert checked_out == []
+
+    first.close()
+    waiter.join(5)
+    assert len(checked_out) == 1
+    assert pool.stats()['size'] == 2
+    assert pool.stats()['waits'] == 1
+    second.close()
+    checked_out[0].close()
+
+
+def test_exhausted_after_the_checkout_timeout(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+    held = pool.get_connection()
+
+    started = time.monotonic()
+    with pytest.raises(PoolExhausted):
+        pool.get_connection(timeout=0.2)
+    assert time.monotonic() - started >= 0.2
+    assert pool.stats()['exhausted'] == 1
+    held.close()
+
+
+def test_return_rolls_back_and_reuses(connector, make_pool):
+    pool = make_pool(min_size=0, max_size=2)
+    conn = pool.get_connection()
+    raw = conn._raw
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE IF NOT EXISTS t (x INTEGER)")
+    cursor.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+
+    assert raw.rollbacks == 1
+    with pytest.raises(AttributeError):
+        conn.cursor()
+    assert pool.get_connection()._raw is raw
+    assert len(connector.opened) == 1
+
+
+def test_dead_connection_is_discarded_after_idle(connector, make_pool):
+    pool = make_pool(min_size=1, max_size=2, ping_after=0)
+    dead = connector.opened[0]
+    dead.kill()
+    time.sleep(0.01)
+
+    conn = pool.get_connection()
+    assert conn._raw is not dead
+    assert dead.closed
+    stats = pool.stats()
+    assert (stats['ping_failures'], stats['closed'], stats['size']) == (1, 1, 1)
+    conn.close()
+
+
+def test_recently_returned_connection_is_not_pinged(connector, make_pool):
+    pool = make_pool(min_size=1, max_size=2, ping_after=60)
+    pool.get_connection().close()
+    assert connector.opened[0].pings == 0
+
+
+def test_reaps_idle_connections_down_to_min_size(connector, make_pool):
+    pool = make_pool(min_size=1, max_size=4, idle_timeout=0.05)
+    conns = [pool.get_connection() for _ in range(4)]
+    for conn in conns:
+        conn.close()
+    assert pool.reap_idle() == 0
+
+    time.sleep(0.1)
+    assert pool.reap_idle() == 3
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['reaped']) == (1, 1, 3)
+    assert len(connector.open_connections()) == 1
+
+
+def test_unclosed_connection_returns_when_collected(make_pool):
+    pool = make_pool(min_size=0, max_size=1)
+
+    def leaky_handler():
+        pool.get_connection().cursor()
+
+    leaky_handler()
+    gc.collect()
+    assert pool.stats()['in_use'] == 0
+    pool.get_connection(timeout=0.1).close()
+
+
+def test_close_all_refuses_checkouts_and_closes_returns(connector, make_pool):
+    pool = make_pool(min_size=1, max_size=2)
+    held = pool.get_connection()
+    pool.close_all()
+
+    with pytest.raises(PoolExhausted):
+        pool.get_connection()
+    held.close()
+    assert connector.open_connections() == []
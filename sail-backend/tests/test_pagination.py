@@ -0,0 +1,83 @@
+import base64
+import json
+
+import pytest
+
+from pagination import (
+    KEY_COLUMNS, ORDER_COLUMNS, PaginationError, decode_cursor, encode_cursor, next_cursor, orders_page_query,
+    page_limit, parse_fields, parse_limit,
+)
+
+
+def raw_cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip('=')
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('2024-05-01 10:00:00', 'b6c1e2f4-0000-4000-8000-000000000001')
+    assert '=' not in cursor
+    assert decode_cursor(cursor) == ('2024-05-01 10:00:00', 'b6c1e2f4-0000-4000-8000-000000000001')
+
+
+def test_empty_cursor_is_the_first_page():
+    assert decode_cursor(None) is None
+    assert decode_cursor('') is None
+
+
+@pytest.mark.parametrize('cursor', [
+    'not base64 at all!',
+    base64.urlsafe_b64encode(b'{not json').decode(),
+    raw_cursor({'created_at': 'x', 'id': 'y'}),
+    raw_cursor(['2024-05-01 10:00:00']),
+    raw_cursor(['2024-05-01 10:00:00', 'id', 'extra']),
+    raw_cursor(['2024-05-01 10:00:00', 7]),
+    raw_cursor('2024-05-01 10:00:00'),
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(PaginationError):
+        decode_cursor(cursor)
+
+
+def test_next_cursor_points_at_the_last_row_of_the_page():
+    rows = [{'created_at': f'2024-05-0{day}', 'id': f'o{day}'} for day in (5, 4, 3)]
+
+    page, cursor = next_cursor(rows, 2)
+    assert page == rows[:2]
+    assert decode_cursor(cursor) == ('2024-05-04', 'o4')
+    assert next_cursor(rows, 3) == (rows, None)
+
+
+def test_page_query_starts_after_the_cursor():
+    sql, params = orders_page_query(['id', 'created_at'], '?', 10, ('2024-05-04', 'o4'), user_id='u1')
+
+    assert sql == (
+        "SELECT id, created_at FROM orders WHERE user_id = ? AND created_at <= ? AND (created_at < ? OR id < ?) "
+        "ORDER BY created_at DESC, id DESC LIMIT ?"
+    )
+    assert params == ['u1', '2024-05-04', '2024-05-04', 'o4', 11]
+
+
+def test_fields_and_limit():
+    assert parse_fields('status, grade') == ['id', 'grade', 'status', 'created_at']
+    assert parse_fields('') == ORDER_COLUMNS
+    assert set(KEY_COLUMNS) <= set(parse_fields('grade'))
+    with pytest.raises(PaginationError):
+        parse_fields('grade,password')
+
+    assert parse_limit(None) == 50
+    assert parse_limit('10000') == 500
+    for bad in ('0', 'ten'):
+        with pytest.raises(PaginationError):
+            parse_limit(bad)
+
+
+def test_paging_is_opt_in():
+    assert page_limit(None, None) is None
+    assert page_limit('20', None) == 20
+    assert page_limit(None, ('2024-05-04', 'o4')) == 50
+
+    sql, params = orders_page_query(['id', 'created_at'], '?', None)
+    assert sql == "SELECT id, created_at FROM orders ORDER BY created_at DESC, id DESC"
+    assert params == []
+    rows = [{'created_at': '2024-05-01', 'id': 'o1'}]
+    assert next_cursor(rows, None) == (rows, None)
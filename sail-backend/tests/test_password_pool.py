@@ -0,0 +1,66 @@
+import os
+
+import pytest
+
+from password_pool import HasherBusy, PasswordHasher, _hash_password
+
+# Cheap parameters; the KDF's cost is not under test
+METHOD = 'pbkdf2:sha256:1000'
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(max_workers=1, max_pending=4, timeout=30, method=METHOD)
+    yield hasher
+    hasher.shutdown()
+
+
+def test_hash_and_verify_on_the_pool(hasher):
+    pwhash = hasher.hash('secret')
+    assert pwhash.startswith(METHOD + '$')
+    assert hasher.verify(pwhash, 'secret')
+    assert not hasher.verify(pwhash, 'wrong')
+    assert hasher.stats()['completed'] == 3
+
+
+def test_workers_are_not_forked(hasher):
+    hasher.hash('secret')
+    assert hasher._executor._mp_context.get_start_method() in ('forkserver', 'spawn')
+
+
+def test_current_params_are_known_up_front(hasher):
+    assert hasher.current_params() == METHOD
+    assert not hasher.needs_rehash(f'{METHOD}$salt$hash')
+    assert hasher.needs_rehash('pbkdf2:sha256:600000$salt$hash')
+
+
+def test_broken_pool_is_replaced(hasher):
+    pwhash = hasher.hash('secret')
+    broken = hasher._executor
+
+    # A worker dying mid-call breaks the whole executor
+    with pytest.raises(HasherBusy):
+        hasher._run(os._exit, 1)
+    assert hasher._executor is None
+    assert hasher.stats()['restarts'] == 1
+
+    assert hasher.verify(pwhash, 'secret')
+    assert hasher._executor is not broken
+
+
+def test_inline_without_workers():
+    hasher = PasswordHasher(max_workers=0, method=METHOD)
+    assert hasher.verify(hasher.hash('secret'), 'secret')
+    assert hasher._executor is None
+
+
+@pytest.mark.parametrize('method', [None, 'scrypt', 'scrypt:16384:8:2', 'pbkdf2', 'pbkdf2:sha512', METHOD])
+def test_current_params_match_generated_hashes(method):
+    hasher = PasswordHasher(max_workers=0, method=method)
+    assert hasher.current_params() == _hash_password('', method).split('$', 1)[0]
+
+
+@pytest.mark.parametrize('method', ['md5', 'scrypt:1:2', 'pbkdf2:sha256:1:2'])
+def test_invalid_methods_are_rejected_up_front(method):
+    with pytest.raises(ValueError):
+        PasswordHasher(max_workers=0, method=method)
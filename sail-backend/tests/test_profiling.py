@@ -0,0 +1,82 @@
+import cProfile
+import os
+import pstats
+import time
+
+import pytest
+from flask import Flask
+
+from profiling import PROFILE_SUFFIX, RequestProfiler, collapsed_stacks
+
+
+def leaf():
+    time.sleep(0.02)
+
+
+def branch():
+    leaf()
+    leaf()
+
+
+def root():
+    branch()
+    leaf()
+
+
+def parse(text):
+    return {line.rsplit(' ', 1)[0]: int(line.rsplit(' ', 1)[1]) for line in text.splitlines()}
+
+
+def test_collapsed_stacks_split_time_by_call_path():
+    profile = cProfile.Profile()
+    profile.runcall(root)
+    stacks = parse(collapsed_stacks(pstats.Stats(profile)))
+
+    def frames(*names):
+        return [key for key in stacks if [frame.split(' ')[0] for frame in key.split(';')][-len(names):] == list(names)]
+
+    # leaf ran twice under branch and once directly under root
+    (via_branch,) = frames('root', 'branch', 'leaf', '<built-in')
+    (direct,) = frames('root', 'leaf', '<built-in')
+    assert stacks[via_branch] == pytest.approx(2 * stacks[direct], rel=0.3)
+    assert sum(stacks.values()) == pytest.approx(60000, rel=0.3)
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    app = Flask(__name__)
+    profiler = RequestProfiler(str(tmp_path), authorize=lambda: True).init_app(app)
+
+    @app.route('/work')
+    def work():
+        root()
+        return 'ok'
+
+    return app, profiler
+
+
+def test_profiles_are_aggregated_per_route_with_collapsed_stacks(profiled_app, tmp_path):
+    app, profiler = profiled_app
+    client = app.test_client()
+    client.get('/work')
+    client.get('/work', headers={'X-Profile': '1'})
+    client.get('/work', headers={'X-Profile': '1'})
+
+    assert profiler.stats()['profiled'] == 2
+    assert [profile['route'] for profile in profiler.profiles()] == ['work']
+    assert 'root' in profiler.report('work')
+    assert any('branch' in line and 'leaf' in line for line in profiler.collapsed('work').splitlines())
+
+    # Profiles from before collapsed output are converted on demand
+    os.remove(profiler.path('work', '.collapsed'))
+    assert 'branch' in profiler.collapsed('work')
+
+    profiler.clear()
+    assert os.listdir(tmp_path) == []
+
+
+def test_unsafe_route_names_are_rejected(profiled_app):
+    _, profiler = profiled_app
+    with pytest.raises(ValueError):
+        profiler.path('../etc/passwd')
+    assert profiler.path('work').endswith('work' + PROFILE_SUFFIX)
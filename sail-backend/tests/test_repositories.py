@@ -0,0 +1,50 @@
+import pytest
+
+from repositories import ORDER_INSERT_COLUMNS, MySQLDriver, OrdersRepo, format_placeholders
+
+
+def test_placeholders_outside_literals_are_rewritten():
+    assert format_placeholders(
+        "SELECT * FROM t WHERE a = ? AND b = 'x?y' AND `odd?name` = ? AND c = 'it''s ?' AND d = \"?\" AND e = ?"
+    ) == (
+        "SELECT * FROM t WHERE a = %s AND b = 'x?y' AND `odd?name` = %s AND c = 'it''s ?' AND d = \"?\" AND e = %s"
+    )
+    assert format_placeholders(r"SELECT 'a\'?' , ?") == r"SELECT 'a\'?' , %s"
+
+
+def test_other_percent_signs_are_left_alone():
+    assert format_placeholders("SELECT id FROM t WHERE GRD LIKE '30%' AND id % 2 = ?") == (
+        "SELECT id FROM t WHERE GRD LIKE '30%' AND id % 2 = %s"
+    )
+
+
+@pytest.mark.parametrize('statement', [
+    "SELECT * FROM t WHERE a = %s",
+    "SELECT * FROM t WHERE a LIKE 'x%s'",
+    "SELECT * FROM t WHERE a = '%(name)s'",
+])
+def test_statements_the_connector_would_substitute_are_rejected(statement):
+    with pytest.raises(ValueError):
+        format_placeholders(statement)
+
+
+def test_repo_statements_render_for_mysql():
+    driver = MySQLDriver(get_connection=None)
+    insert = driver.sql(OrdersRepo.INSERT)
+    assert '?' not in insert
+    assert insert.count('%s') == OrdersRepo.INSERT.count('?')
+    assert driver.sql(OrdersRepo.INSERT) is insert
+
+
+def test_insert_each_retries_rows_one_at_a_time(driver):
+    repo = OrdersRepo(driver)
+
+    def row(order_id, customer):
+        values = dict.fromkeys(ORDER_INSERT_COLUMNS, '')
+        values.update(id=order_id, customer=customer, delivery_days=1)
+        return tuple(values[column] for column in ORDER_INSERT_COLUMNS)
+
+    errors = repo.insert_each([row('o1', 'A'), row('o1', 'B'), row('o2', 'C')], lambda rows: ['orders:all'])
+
+    assert [error is None for error in errors] == [True, False, True]
+    assert [order['customer'] for order in driver.fetch_all("SELECT customer FROM orders ORDER BY id")] == ['A', 'C']
@@ -0,0 +1,69 @@
+import gzip
+import json
+import sqlite3
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from flask import Flask, jsonify
+
+from serialization import ENCODERS, JSONSerializer, get_encoder, layout_for, use_layout
+
+PAYLOAD = {
+    'orders': [{'id': 'o1', 'created_at': datetime(2024, 5, 1, 10, 30), 'due': date(2024, 6, 1),
+                'weight': Decimal('2.159'), 'note': 'Stahl ü'}],
+}
+
+
+@pytest.mark.parametrize('name', sorted(ENCODERS))
+def test_encoders_match_jsonify(name):
+    app = Flask(__name__)
+    with app.app_context():
+        expected = jsonify(PAYLOAD).get_json()
+    assert json.loads(get_encoder(name)(PAYLOAD)) == expected
+
+
+def test_unknown_encoder_is_rejected():
+    with pytest.raises(ValueError):
+        get_encoder('yaml')
+    assert get_encoder('auto') is ENCODERS.get('orjson', ENCODERS['json'])
+
+
+def test_layouts_are_shared_and_make_sqlite_rows_dicts():
+    assert layout_for(('id', 'name')) is layout_for(('id', 'name'))
+
+    cursor = sqlite3.connect(':memory:').execute("SELECT 1 AS id, 'x' AS name")
+    use_layout(cursor)
+    assert cursor.fetchall() == [{'id': 1, 'name': 'x'}]
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    serializer = JSONSerializer(compress_min_bytes=64)
+    app.config['encoded'] = []
+    serializer.observers.append(app.config['encoded'].append)
+
+    @app.route('/rows/<int:count>')
+    def rows(count):
+        return serializer.response([{'PKT': f'P{index}'} for index in range(count)])
+
+    return app.test_client()
+
+
+@pytest.mark.parametrize('encoding, decompress', [('gzip', gzip.decompress), ('deflate', zlib.decompress)])
+def test_large_bodies_are_compressed_when_accepted(client, encoding, decompress):
+    response = client.get('/rows/50', headers={'Accept-Encoding': f'{encoding}, br;q=0.5'})
+    assert response.headers['Content-Encoding'] == encoding
+    assert len(json.loads(decompress(response.data))) == 50
+    # One encode and one compression observed
+    assert len(client.application.config['encoded']) == 2
+
+
+def test_small_or_unaccepted_bodies_are_sent_as_is(client):
+    assert 'Content-Encoding' not in client.get('/rows/1', headers={'Accept-Encoding': 'gzip'}).headers
+    response = client.get('/rows/50', headers={'Accept-Encoding': 'br'})
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert len(response.get_json()) == 50
@@ -0,0 +1,80 @@
+import os
+
+import pandas as pd
+import pytest
+
+from shared_snapshot import SharedStockSnapshotStore, attach_snapshot, write_snapshot
+from stock_snapshot import StockSnapshot
+
+
+def snapshot(values, version=1):
+    return StockSnapshot.from_frame(pd.DataFrame({'id': range(1, len(values) + 1), 'PKT': values}), version)
+
+
+def test_mixed_type_dictionary_keeps_its_types(tmp_path):
+    path = str(tmp_path / 'stock.snap')
+    write_snapshot(snapshot(['P1', 7, 2.5, 'P1', True]), path)
+    shared = attach_snapshot(path)
+
+    assert shared.dictionaries['PKT'].tolist() == ['P1', 7, 2.5, True]
+    assert [type(value) for value in shared.dictionaries['PKT'].tolist()] == [str, int, float, bool]
+    assert shared.code('PKT', 7) == 1
+    assert shared.code('PKT', '7') is None
+
+
+def test_unsupported_dictionary_is_not_shared(tmp_path):
+    path = str(tmp_path / 'stock.snap')
+    with pytest.raises(ValueError):
+        write_snapshot(snapshot(['P1', b'P2']), path)
+
+    store = SharedStockSnapshotStore(lambda: snapshot(['P1', b'P2']), str(tmp_path / 'shared'))
+    store.refresh(wait=True)
+    # Served from the building worker's own copy, nothing published
+    assert store.snapshot.dictionaries['PKT'].tolist() == ['P1', b'P2']
+    assert store.publishes == 0
+
+
+def test_older_layout_is_rebuilt(tmp_path):
+    directory = tmp_path / 'shared'
+    directory.mkdir()
+    (directory / 'stock-1.snap').write_bytes(b'SAILSTK1' + b'\0' * 64)
+    (directory / 'current').write_text('stock-1.snap')
+
+    store = SharedStockSnapshotStore(lambda: snapshot(['P1'], version=2), str(directory))
+    assert store.snapshot is None
+    store.refresh(wait=True)
+    assert store.snapshot.version == 2
+    assert store.publishes == 1
+
+
+def test_files_of_another_database_are_not_attached(tmp_path):
+    path = str(tmp_path / 'stock.snap')
+    write_snapshot(snapshot(['P1']), path, database_id=7)
+    assert attach_snapshot(path, database_id=7).rows == 1
+    with pytest.raises(ValueError):
+        attach_snapshot(path, database_id=8)
+
+
+def test_stores_of_different_databases_keep_apart(tmp_path):
+    first = SharedStockSnapshotStore(lambda: snapshot(['A1'], version=1), str(tmp_path), database_id=1)
+    first.refresh(wait=True)
+    second = SharedStockSnapshotStore(lambda: snapshot(['B1', 'B2'], version=1), str(tmp_path), database_id=2)
+    # Same stock_version, other database: nothing to attach, so it builds its own
+    assert second.snapshot is None
+    second.refresh(wait=True)
+
+    assert first.get(1).rows == 1
+    assert second.get(1).rows == 2
+    assert sorted(os.listdir(tmp_path)) == ['1', '2']
+
+
+def test_a_foreign_generation_is_rebuilt(tmp_path):
+    directory = tmp_path / '5'
+    directory.mkdir()
+    write_snapshot(snapshot(['X1'], version=3), str(directory / 'stock-3.snap'), database_id=6)
+    (directory / 'current').write_text('stock-3.snap')
+
+    store = SharedStockSnapshotStore(lambda: snapshot(['P1', 'P2'], version=3), str(tmp_path), database_id=5)
+    assert store.snapshot is None
+    store.refresh(wait=True)
+    assert store.snapshot.rows == 2
@@ -0,0 +1,88 @@
+import logging
+
+import pytest
+
+from repositories import SQLiteDriver
+from slow_queries import SlowQueryLog, params_shape, query_shape
+from sqlite_mysql import SQLiteMySQLConnection
+
+
+@pytest.fixture
+def conn():
+    conn = SQLiteMySQLConnection()
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE stock_data (id INTEGER PRIMARY KEY, GRD TEXT)")
+    cursor.executemany("INSERT INTO stock_data (GRD) VALUES (?)", [('304',), ('316',), ('304',)])
+    conn.commit()
+    return conn
+
+
+@pytest.fixture
+def observed(conn):
+    # Every statement counts as slow
+    log = SlowQueryLog('sqlite', threshold_ms=0)
+    driver = SQLiteDriver(lambda: conn)
+    driver.observers.append(log.observe)
+    return log, driver
+
+
+def entry(log, prefix):
+    return next(entry for entry in log.entries() if entry['query'].startswith(prefix))
+
+
+def test_plan_is_captured_after_the_rows_are_read(conn, observed):
+    log, driver = observed
+    cursor = driver.cursor(conn)
+    cursor.execute("SELECT id FROM stock_data WHERE GRD = ?", ('304',))
+    # Not reported while the unbuffered result is unread
+    assert log.entries() == []
+    assert len(cursor.fetchall()) == 2
+    cursor.close()
+
+    logged = entry(log, 'SELECT id')
+    assert logged['plan_error'] is None
+    assert logged['plan']
+    assert logged['param_shapes'] == ['str']
+
+
+@pytest.mark.parametrize('read', [
+    lambda cursor: list(cursor),
+    lambda cursor: cursor.fetchmany(10) + cursor.fetchmany(10),
+    lambda cursor: [cursor.fetchone(), cursor.fetchone(), cursor.fetchone(), cursor.fetchone()],
+])
+def test_every_way_of_reading_reports_once(conn, observed, read):
+    log, driver = observed
+    cursor = driver.cursor(conn)
+    cursor.execute("SELECT id FROM stock_data")
+    read(cursor)
+    cursor.close()
+
+    logged = entry(log, 'SELECT id')
+    assert logged['count'] == 1
+    assert logged['plan_error'] is None
+
+
+def test_writes_are_reported_at_once(conn, observed):
+    log, driver = observed
+    cursor = driver.cursor(conn)
+    cursor.execute("UPDATE stock_data SET GRD = ? WHERE id IN (?, ?)", ('430', 1, 2))
+    assert entry(log, 'UPDATE')['query'] == 'UPDATE stock_data SET GRD = ? WHERE id IN (...)'
+
+
+def test_driver_fetches_are_explained(observed):
+    log, driver = observed
+    assert driver.fetch_value("SELECT COUNT(*) FROM stock_data WHERE GRD = ?", ('316',)) == 1
+    assert entry(log, 'SELECT COUNT(*)')['plan_error'] is None
+
+
+def test_slow_queries_are_logged_and_counted(observed, caplog):
+    log, driver = observed
+    with caplog.at_level(logging.WARNING, logger='slow_queries'):
+        driver.fetch_all("SELECT * FROM stock_data")
+    assert 'Slow query' in caplog.text
+    assert log.stats() == {'shapes': 1, 'slow': 1, 'dropped': 0}
+
+
+def test_shapes():
+    assert query_shape("SELECT *\n  FROM t WHERE id IN (%s, %s,%s)") == "SELECT * FROM t WHERE id IN (...)"
+    assert params_shape(('a', 1, None)) == 'str, int, NoneType'
@@ -0,0 +1,93 @@
+import json
+
+from conftest import ADMIN_TOKEN
+
+
+def order(**fields):
+    return {
+        'grade': '304', 'thickness': '1', 'width': '1250', 'customer': 'ACME',
+        'required_quantity': '2', 'delivery_days': 5, **fields,
+    }
+
+
+def stored_customers(sqlite_app):
+    return sorted(row['customer'] for row in sqlite_app.db.fetch_all("SELECT customer FROM orders"))
+
+
+def test_create_order(sqlite_app, sqlite_client):
+    response = sqlite_client.post('/api/orders', json=order())
+    assert response.status_code == 201
+    assert sqlite_app.orders_repo.get(response.json['order_id'])['customer'] == 'ACME'
+
+
+def test_create_order_rejects_a_null_required_value(sqlite_app, sqlite_client):
+    response = sqlite_client.post('/api/orders', json=order(customer=None))
+    assert response.status_code == 400
+    assert 'customer' in response.json['error']
+    assert stored_customers(sqlite_app) == []
+
+
+def test_batch_reports_each_invalid_order(sqlite_app, sqlite_client):
+    response = sqlite_client.post('/api/orders/batch', json={'orders': [
+        order(customer='A'), order(customer='B'), order(customer=None), 'x', order(delivery_days='soon'),
+    ]})
+
+    assert response.status_code == 207
+    assert (response.json['created'], response.json['failed']) == (2, 3)
+    assert [result['status'] for result in response.json['results']] == ['created', 'created', 'error', 'error', 'error']
+    assert stored_customers(sqlite_app) == ['A', 'B']
+
+
+def test_batch_insert_failure_only_fails_the_rejected_orders(sqlite_app, sqlite_client, monkeypatch):
+    # The second order reuses the first one's id, which the database refuses
+    ids = iter(['order-1', 'order-1', 'order-3'])
+    monkeypatch.setattr(sqlite_app, 'generate_id', lambda: next(ids))
+    response = sqlite_client.post('/api/orders/batch', json=[order(customer='A'), order(customer='B'), order(customer='C')])
+
+    assert response.status_code == 207
+    assert [result['status'] for result in response.json['results']] == ['created', 'error', 'created']
+    assert 'UNIQUE' in response.json['results'][1]['error']
+    assert stored_customers(sqlite_app) == ['A', 'C']
+
+
+def test_batch_limits(sqlite_app, sqlite_client, monkeypatch):
+    assert sqlite_client.post('/api/orders/batch', json=[]).status_code == 400
+    monkeypatch.setattr(sqlite_app, 'MAX_BATCH_ORDERS', 2)
+    assert sqlite_client.post('/api/orders/batch', json=[order()] * 3).status_code == 413
+
+
+def test_orders_are_listed_whole_unless_paged(sqlite_client):
+    sqlite_client.post('/api/orders/batch', json=[order(customer=name) for name in 'ABC'])
+
+    everything = sqlite_client.get('/api/orders')
+    assert len(everything.json) == 3
+    assert 'X-Next-Cursor' not in everything.headers
+
+    first = sqlite_client.get('/api/orders?limit=2&fields=customer')
+    assert [sorted(row) for row in first.json] == [['created_at', 'customer', 'id']] * 2
+    rest = sqlite_client.get('/api/orders', query_string={'cursor': first.headers['X-Next-Cursor']})
+    assert {row['id'] for row in first.json + rest.json} == {row['id'] for row in everything.json}
+    assert sqlite_client.get('/api/orders?limit=0').status_code == 400
+
+
+def test_orders_export_streams_the_requested_format(sqlite_client):
+    sqlite_client.post('/api/orders/batch', json=[order(customer=name) for name in 'AB'])
+
+    response = sqlite_client.get('/api/orders/export?fields=customer')
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'] == 'attachment; filename="orders.ndjson"'
+    assert sorted(json.loads(line)['customer'] for line in response.get_data(as_text=True).splitlines()) == ['A', 'B']
+
+    csv_lines = sqlite_client.get('/api/orders/export?format=csv&fields=customer').get_data(as_text=True).splitlines()
+    assert csv_lines[0] == 'id,customer,created_at'
+    assert len(csv_lines) == 3
+    assert sqlite_client.get('/api/orders/export?format=xml').status_code == 400
+
+
+def test_metrics_require_the_admin_token(sqlite_client):
+    sqlite_client.get('/api/orders')
+    assert sqlite_client.get('/metrics').status_code == 403
+
+    response = sqlite_client.get('/metrics', headers={'X-Admin-Token': ADMIN_TOKEN})
+    assert response.status_code == 200
+    assert 'sail_http_requests_total{route="get_orders",method="GET",status="200"}' in response.get_data(as_text=True)
@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from sqlite_pool import SQLiteConnectionManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = SQLiteConnectionManager(str(tmp_path / 'pool.db'), busy_timeout_ms=1, busy_retries=5, retry_backoff=0.05)
+    conn = manager.get_connection()
+    conn.execute("CREATE TABLE t (x INTEGER)")
+    conn.commit()
+    yield manager
+    manager.close_all()
+
+
+def in_thread(function):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_one_connection_per_thread_reused_after_exit(manager):
+    main = manager.get_connection()
+    assert manager.get_connection() is main
+
+    first = in_thread(manager.get_connection)
+    assert first is not main
+    # The exited thread's connection went back to the idle list
+    assert in_thread(manager.get_connection) is first
+    assert manager.stats()['open'] == 2
+
+
+def test_close_hands_back_and_rolls_back(manager):
+    conn = manager.get_connection()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.close()
+
+    assert not conn.in_transaction
+    assert manager.get_connection() is conn
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+
+
+def hold_write_lock(manager, seconds):
+    blocker = sqlite3.connect(manager.db_path, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    timer = threading.Timer(seconds, blocker.rollback)
+    timer.start()
+    return timer
+
+
+def test_autocommit_statement_is_retried_while_locked(manager):
+    timer = hold_write_lock(manager, 0.1)
+    conn = manager.get_connection()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+    timer.join()
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 1
+
+
+def test_statement_inside_a_transaction_is_not_retried(manager):
+    conn = manager.get_connection()
+    conn.execute("BEGIN")
+    conn.execute("SELECT COUNT(*) FROM t").fetchone()
+    timer = hold_write_lock(manager, 0.5)
+
+    started = time.monotonic()
+    with pytest.raises(sqlite3.OperationalError, match='locked'):
+        conn.execute("INSERT INTO t VALUES (1)")
+    # Raised at once, not after the retry backoff
+    assert time.monotonic() - started < 0.2
+    conn.rollback()
+    timer.join()
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_forked_child_opens_its_own_connection(manager):
+    parent = manager.get_connection()
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            conn = manager.get_connection()
+            conn.execute("INSERT INTO t VALUES (2)")
+            conn.commit()
+            ok = conn is not parent and conn.pid == os.getpid() and manager.stats()['open'] == 1
+            manager.close_all()
+            os.write(write_end, b'ok' if ok else b'no')
+        finally:
+            os._exit(0)
+
+    os.close(write_end)
+    os.waitpid(pid, 0)
+    assert os.read(read_end, 2) == b'ok'
+    os.close(read_end)
+    # The parent's connection was left alone by the child
+    assert manager.get_connection() is parent
+    assert parent.execute("SELECT x FROM t").fetchall() == [(2,)]
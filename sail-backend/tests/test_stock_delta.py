@@ -0,0 +1,89 @@
+import pytest
+
+from stock_delta import import_stock_delta
+from stock_ingest import bulk_load_stock
+
+
+@pytest.fixture
+def loaded(db_manager, driver, make_stock, write_csv):
+    rows = [
+        make_stock('KEEP', weight='1'),
+        make_stock('CHANGE', weight='2'),
+        make_stock('GONE', weight='3'),
+    ]
+    bulk_load_stock(db_manager.get_connection(), write_csv(rows, 'initial.csv'))
+    return driver
+
+
+def stock(driver):
+    rows = driver.fetch_all("SELECT id, PKT, PWT, pwt_num FROM stock_data ORDER BY PKT")
+    return {row['PKT']: row for row in rows}
+
+
+def test_delta_inserts_updates_and_deletes(db_manager, loaded, make_stock, write_csv):
+    before = stock(loaded)
+    version = loaded.fetch_value("SELECT value FROM stock_meta WHERE name = 'stock_version'")
+
+    snapshot = write_csv([
+        make_stock('KEEP', weight='1'),
+        make_stock('CHANGE', weight='2,500'),
+        make_stock('NEW', weight='4'),
+    ], 'snapshot.csv')
+    report = import_stock_delta(db_manager.get_connection(), snapshot)
+
+    assert (report['inserted'], report['updated'], report['deleted'], report['unchanged']) == (1, 1, 1, 1)
+    after = stock(loaded)
+    assert sorted(after) == ['CHANGE', 'KEEP', 'NEW']
+    # Updated in place, with the numeric shadow column parsed again
+    assert after['CHANGE']['id'] == before['CHANGE']['id']
+    assert (after['CHANGE']['PWT'], after['CHANGE']['pwt_num']) == ('2,500', 2500.0)
+    assert after['KEEP']['id'] == before['KEEP']['id']
+    assert loaded.fetch_value("SELECT value FROM stock_meta WHERE name = 'stock_version'") == version + 1
+
+
+def test_delta_of_an_identical_snapshot_writes_nothing(db_manager, loaded, make_stock, write_csv):
+    version = loaded.fetch_value("SELECT value FROM stock_meta WHERE name = 'stock_version'")
+    snapshot = write_csv([
+        make_stock('KEEP', weight='1'),
+        make_stock('CHANGE', weight='2'),
+        make_stock('GONE', weight='3'),
+    ], 'snapshot.csv')
+    report = import_stock_delta(db_manager.get_connection(), snapshot)
+
+    assert (report['inserted'], report['updated'], report['deleted'], report['unchanged']) == (0, 0, 0, 3)
+    assert loaded.fetch_value("SELECT value FROM stock_meta WHERE name = 'stock_version'") == version
+
+
+def test_repeated_and_empty_keys_keep_a_row_each(db_manager, driver, make_stock, write_csv):
+    # The stock export repeats some (PKT, COILNO) pairs, e.g. FC22581/219930
+    rows = [
+        make_stock('FC22581', coil='219930', grade='204CU'),
+        make_stock('FC22581', coil='219930', grade='316'),
+        make_stock('', coil=''),
+        make_stock('', coil='', weight='7'),
+    ]
+    bulk_load_stock(db_manager.get_connection(), write_csv(rows, 'initial.csv'))
+    stored_ids = [row['id'] for row in driver.fetch_all("SELECT id FROM stock_data ORDER BY id")]
+
+    # Read one row per chunk, so occurrences are counted across chunks
+    report = import_stock_delta(db_manager.get_connection(), write_csv(rows, 'snapshot.csv'), chunksize=1)
+    assert (report['inserted'], report['updated'], report['deleted'], report['unchanged']) == (0, 0, 0, 4)
+    assert (report['duplicates'], report['empty_keys']) == (4, 2)
+
+    report = import_stock_delta(db_manager.get_connection(), write_csv(rows[1:] + [rows[1]], 'snapshot.csv'))
+    grades = driver.fetch_all("SELECT id, GRD FROM stock_data WHERE PKT = 'FC22581' ORDER BY id")
+    # The first occurrence is overwritten in place, the second is unchanged
+    assert [(row['id'], row['GRD']) for row in grades] == [(stored_ids[0], '316'), (stored_ids[1], '316')]
+    assert (report['inserted'], report['updated'], report['deleted']) == (0, 1, 0)
+
+    report = import_stock_delta(db_manager.get_connection(), write_csv(rows[:3], 'snapshot.csv'))
+    assert (report['inserted'], report['updated'], report['deleted']) == (0, 1, 1)
+    assert [row['id'] for row in driver.fetch_all("SELECT id FROM stock_data ORDER BY id")] == stored_ids[:3]
+
+
+def test_dry_run_reports_without_writing(db_manager, loaded, make_stock, write_csv):
+    snapshot = write_csv([make_stock('NEW', weight='4')], 'snapshot.csv')
+    report = import_stock_delta(db_manager.get_connection(), snapshot, dry_run=True)
+
+    assert (report['inserted'], report['deleted']) == (1, 3)
+    assert sorted(stock(loaded)) == ['CHANGE', 'GONE', 'KEEP']
@@ -0,0 +1,58 @@
+import pytest
+
+from conftest import stock_frame
+from stock_ingest import STOCK_COLUMNS, bulk_load_stock, insert_stock_frame
+
+
+def stored(driver):
+    return driver.fetch_all(f"SELECT {', '.join(STOCK_COLUMNS)} FROM stock_data ORDER BY id")
+
+
+def test_chunks_load_every_row_as_text(db_manager, driver, make_stock, write_csv):
+    rows = [make_stock(f'P{index}', thickness='2', weight=f'{index},000', sal='FALSE') for index in range(7)]
+    progress = []
+    loaded = bulk_load_stock(db_manager.get_connection(), write_csv(rows), chunksize=3, on_chunk=progress.append)
+
+    assert loaded == 7
+    assert progress == [3, 6, 7]
+    stock = stored(driver)
+    assert [row['PKT'] for row in stock] == [f'P{index}' for index in range(7)]
+    # Read as str: no '2.0', no booleans, no NaN for empty cells
+    assert {(row['THK'], row['SAL'], row['DTP']) for row in stock} == {('2', 'FALSE', '')}
+
+
+def test_multi_row_statements_split_at_any_size(db_manager, driver, make_stock):
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    frame = stock_frame([make_stock(f'P{index}') for index in range(5)])
+    assert insert_stock_frame(cursor, frame, rows_per_statement=2) == 5
+    conn.commit()
+    assert len(stored(driver)) == 5
+
+
+def test_a_failed_load_leaves_the_table_unchanged(db_manager, driver, make_stock, write_csv, monkeypatch):
+    bulk_load_stock(db_manager.get_connection(), write_csv([make_stock('KEEP')], 'first.csv'))
+
+    def fail(total):
+        raise RuntimeError("disk full")
+
+    rows = [make_stock(f'P{index}') for index in range(4)]
+    with pytest.raises(RuntimeError):
+        bulk_load_stock(db_manager.get_connection(), write_csv(rows), chunksize=2, truncate=True, on_chunk=fail)
+    assert [row['PKT'] for row in stored(driver)] == ['KEEP']
+
+
+def test_truncate_replaces_the_stock(db_manager, driver, make_stock, write_csv):
+    bulk_load_stock(db_manager.get_connection(), write_csv([make_stock('OLD')], 'first.csv'))
+    bulk_load_stock(db_manager.get_connection(), write_csv([make_stock('NEW')]), truncate=True)
+    assert [row['PKT'] for row in stored(driver)] == ['NEW']
+
+
+def test_missing_export_columns_are_stored_empty(db_manager, driver, tmp_path):
+    path = tmp_path / 'partial.csv'
+    path.write_text("PKT,GRD,THK\nP1,304,1.5\n")
+    bulk_load_stock(db_manager.get_connection(), str(path))
+
+    row = stored(driver)[0]
+    assert (row['PKT'], row['GRD'], row['THK'], row['SAL']) == ('P1', '304', '1.5', '')
+
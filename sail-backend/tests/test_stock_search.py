@@ -0,0 +1,67 @@
+import pytest
+
+from repositories import StockRepo
+from shared_snapshot import attach_snapshot, write_snapshot
+from stock_ingest import bulk_load_stock
+from stock_search import STOCK_RESULT_COLUMNS, StockFilterError, parse_stock_filters
+
+
+@pytest.fixture
+def stock_repo(db_manager, driver, make_stock, write_csv):
+    rows = [
+        make_stock('P1', thickness='0.4', width='1,000', weight='2'),
+        make_stock('P2', thickness='0.45', width='1,250', weight='3'),
+        make_stock('P3', thickness='2.0', width='1250', weight='4', finish='NO1'),
+        make_stock('P4', grade='316', thickness='thin', width='1500', weight='5'),
+    ]
+    bulk_load_stock(db_manager.get_connection(), write_csv(rows))
+    return StockRepo(driver)
+
+
+def pkts(rows):
+    return [row['PKT'] for row in rows]
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({'grade': '304'}, ['P1', 'P2', 'P3']),
+    ({'thickness': '2'}, ['P3']),
+    ({'thickness': 'thin'}, ['P4']),
+    ({'thickness': '0.42', 'thk_tol': '0.05'}, ['P1', 'P2']),
+    ({'width_min': '1,250'}, ['P2', 'P3', 'P4']),
+    ({'width': '1250', 'finish': '2B'}, ['P2']),
+    ({'pwt_min': '3', 'pwt_max': '4'}, ['P2', 'P3']),
+])
+def test_sql_and_snapshot_agree(stock_repo, args, expected):
+    filters = parse_stock_filters(args)
+    snapshot = stock_repo.snapshot()
+
+    assert pkts(stock_repo.search(filters)) == expected
+    assert snapshot.search(filters) == stock_repo.search(filters)
+
+
+def test_results_carry_the_public_columns_only(stock_repo, tmp_path):
+    filters = parse_stock_filters({'grade': '304'})
+    snapshot = stock_repo.snapshot()
+    write_snapshot(snapshot, str(tmp_path / 'stock.snap'))
+    shared = attach_snapshot(str(tmp_path / 'stock.snap'))
+
+    for rows in (stock_repo.search(filters), snapshot.search(filters), shared.search(filters)):
+        assert [list(row) for row in rows] == [STOCK_RESULT_COLUMNS] * 3
+    assert shared.search(filters) == stock_repo.search(filters)
+
+
+def test_bounds_accept_thousands_separators():
+    filters = parse_stock_filters({'width_min': '1,250', 'width_max': ' 1,500 '})
+    assert (filters['width_min'], filters['width_max']) == (1250.0, 1500.0)
+
+
+@pytest.mark.parametrize('args', [
+    {'width_min': 'wide'},
+    {'pwt_max': 'inf'},
+    {'thickness': 'thin', 'thk_tol': '0.1'},
+    {'thickness': '1', 'thk_tol': '-0.1'},
+    {'thk_min': '2', 'thk_max': '1'},
+])
+def test_invalid_filters(args):
+    with pytest.raises(StockFilterError):
+        parse_stock_filters(args)
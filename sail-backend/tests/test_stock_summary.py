@@ -0,0 +1,112 @@
+import pytest
+
+from lead_time import lead_time_range, load_profiles
+from repositories import AllocationsRepo
+from stock_delta import import_stock_delta
+from stock_ingest import bulk_load_stock
+from stock_summary import backfill_stock_summary, clear_stock_summary
+
+
+def summary(driver):
+    rows = driver.fetch_all(
+        "SELECT grade, finish, thk_band, sal_category, coils, total_pwt, reserved_coils, reserved_pwt "
+        "FROM stock_summary ORDER BY grade, finish, thk_band, sal_category"
+    )
+    return [
+        {**row, 'total_pwt': round(row['total_pwt'], 6), 'reserved_pwt': round(row['reserved_pwt'], 6)}
+        for row in rows
+    ]
+
+
+def rebuilt(db_manager, driver):
+    """stock_summary as a full backfill computes it; leaves the table unchanged."""
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    clear_stock_summary(cursor)
+    backfill_stock_summary(cursor)
+    rows = summary(driver)
+    conn.rollback()
+    return rows
+
+
+@pytest.fixture
+def initial_rows(make_stock):
+    return [
+        make_stock('A1', grade='304', thickness='0.4', weight='1.5'),
+        make_stock('A2', grade='304', thickness='1', weight='2'),
+        make_stock('A3', grade='304', thickness='1', weight='2.25', sal='HRCS'),
+        make_stock('B1', grade='316', thickness='3', weight='1,200', finish='NO1'),
+        make_stock('B2', grade='316', thickness='n/a', weight='4', sal='WIP-X'),
+        make_stock('C1', grade='430', thickness='6', weight='7', sal='SLAB'),
+    ]
+
+
+def test_bulk_load_summary_equals_backfill(db_manager, driver, initial_rows, write_csv):
+    bulk_load_stock(db_manager.get_connection(), write_csv(initial_rows))
+
+    assert summary(driver)
+    assert summary(driver) == rebuilt(db_manager, driver)
+
+
+def test_incremental_summary_equals_backfill(db_manager, driver, initial_rows, make_stock, write_csv):
+    bulk_load_stock(db_manager.get_connection(), write_csv(initial_rows))
+    result = AllocationsRepo(driver).allocate('order', '304', '1', '1250', '2B', '1.8', 'now')
+    assert result['status'] == 'allocated'
+
+    # Updates (one of them of the reserved coil), deletes and inserts
+    snapshot = write_csv([
+        make_stock('A1', grade='304', thickness='0.4', weight='1.5'),
+        make_stock('A2', grade='304', thickness='1', weight='2.75'),
+        make_stock('A3', grade='304', thickness='2', weight='2.25', sal='TRUE'),
+        make_stock('B2', grade='316', thickness='n/a', weight='4', sal='WIP-X'),
+        make_stock('D1', grade='409', thickness='1.2', weight='3'),
+        make_stock('D2', grade='409', thickness='1.2', weight='3'),
+    ], 'snapshot.csv')
+    import_stock_delta(db_manager.get_connection(), snapshot)
+
+    assert summary(driver) == rebuilt(db_manager, driver)
+    grades = {row['grade'] for row in summary(driver)}
+    assert grades == {'304', '316', '409'}
+
+
+def test_updated_reserved_coils_leave_the_summary_consistent(db_manager, driver, initial_rows, make_stock, write_csv):
+    bulk_load_stock(db_manager.get_connection(), write_csv(initial_rows))
+    repo = AllocationsRepo(driver)
+    assert repo.allocate('first', '304', '1', '1250', '2B', '1.8', 'now')['status'] == 'allocated'
+    assert repo.allocate('second', '304', '0.4', '1250', '2B', '1', 'now')['status'] == 'allocated'
+
+    # A2 is withdrawn, A1 reweighed
+    snapshot = write_csv(
+        [make_stock('A1', grade='304', thickness='0.4', weight='1.75'),
+         make_stock('A2', grade='304', thickness='1', weight='2', sal='HRCS')] + initial_rows[2:],
+        'snapshot.csv'
+    )
+    import_stock_delta(db_manager.get_connection(), snapshot)
+
+    assert summary(driver) == rebuilt(db_manager, driver)
+    reserved = [(row['thk_band'], row['reserved_coils'], row['reserved_pwt']) for row in summary(driver)
+                if row['reserved_coils']]
+    assert len(reserved) == 1 and reserved[0][1:] == (1, 1.75)
+
+
+def test_truncating_reload_resets_the_summary(db_manager, driver, initial_rows, make_stock, write_csv):
+    bulk_load_stock(db_manager.get_connection(), write_csv(initial_rows))
+    bulk_load_stock(db_manager.get_connection(), write_csv([make_stock('Z1', weight='9')], 'reload.csv'), truncate=True)
+
+    rows = summary(driver)
+    assert [(row['grade'], row['coils'], row['total_pwt']) for row in rows] == [('304', 1, 9.0)]
+    assert rows == rebuilt(db_manager, driver)
+
+
+def test_profile_and_summary_band_the_same_thickness(db_manager, driver, make_stock, write_csv):
+    # Thicknesses only the ingest parser reads as numbers
+    bulk_load_stock(db_manager.get_connection(), write_csv([
+        make_stock('A1', thickness='0,4'),
+        make_stock('A2', thickness=' 1.5 ', finish='NO1'),
+    ]))
+    profiles = load_profiles(db_manager.get_connection().cursor(), '?', ['304'])
+
+    bands = {(row['finish'], row['thk_band']) for row in summary(driver)}
+    assert bands == {('2B', '3-6'), ('NO1', '1-2')}
+    assert bands <= {(finish, band) for _, finish, band in profiles}
+    assert lead_time_range(profiles, '304', 'NO1', '1.5') == (0, 0)